@@ -0,0 +1,87 @@
+"""Helpers shared by the benchmarks: building synthetic directory trees under a
+temporary root, timing operations, and printing results side by side."""
+
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def generate_tree(
+    size: int, depth: int, fanout: int, seed: int = 0
+) -> List[Tuple[str, bool]]:
+    """Returns the API paths of `size` entries of a synthetic tree and whether
+    each is a directory, parents first. Directories form a tree with `fanout`
+    subdirectories each, at most `depth` levels deep, and make up at most a
+    tenth of all entries. The remaining entries are files assigned to random
+    directories, seeded by `seed` such that the tree is deterministic."""
+    rng = random.Random(seed)
+    max_dirs = max(1, size // 10)
+    dirs: List[str] = []
+    level = [""]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fanout):
+                if len(dirs) == max_dirs:
+                    break
+                path = f"{parent}/d{i}" if parent else f"d{i}"
+                dirs.append(path)
+                next_level.append(path)
+        level = next_level
+
+    entries = [(path, True) for path in dirs]
+    for i in range(size - len(dirs)):
+        parent = rng.choice(dirs) if dirs else ""
+        entries.append((f"{parent}/f{i}" if parent else f"f{i}", False))
+    return entries
+
+
+def write_tree(root_dir: str, entries: List[Tuple[str, bool]]) -> None:
+    """Creates the entries returned by `generate_tree()` under `root_dir`."""
+    for path, is_dir in entries:
+        abs_path = os.path.join(root_dir, *path.split("/"))
+        if is_dir:
+            os.mkdir(abs_path)
+        else:
+            with open(abs_path, "w"):
+                pass
+
+
+def build_tree(root_dir: str, dirs: int, files_per_dir: int) -> List[str]:
+    """Creates `dirs` directories containing `files_per_dir` files each under
+    `root_dir`. Returns the API paths of all files and directories."""
+    entries = []
+    for i in range(dirs):
+        entries.append((f"dir{i}", True))
+        entries.extend((f"dir{i}/file{j}", False) for j in range(files_per_dir))
+    write_tree(root_dir, entries)
+    return [path for path, _ in entries]
+
+
+def timed(fn: Callable[[], object], count: int = 1) -> float:
+    """Returns the mean duration of `fn` in microseconds over `count` calls."""
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def timed_each(fn: Callable[[Any], object], args: List[Any]) -> float:
+    """Returns the mean duration of `fn` in microseconds over each of `args`."""
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / max(1, len(args)) * 1e6
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    """Prints the duration of each operation in microseconds, with a column
+    for each configuration in `results`."""
+    operations = list(next(iter(results.values())))
+    print(f"{'operation (us)':<16}" + "".join(f"{name:>18}" for name in results))
+    for operation in operations:
+        print(
+            f"{operation:<16}"
+            + "".join(f"{results[name][operation]:>18.1f}" for name in results)
+        )
@@ -0,0 +1,96 @@
+"""Compares the latency of File ID manager operations across implementations
+and storage backends.
+
+Builds a directory tree under a temporary root, indexes every entry with each
+manager, and then times lookups and directory moves, copies, and deletes.
+Usage::
+
+    python benchmarks/bench_managers.py --dirs 100 --files-per-dir 100
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from functools import partial
+from typing import Any, Dict, Tuple, Type
+
+from bench_common import build_tree, print_table, timed, timed_each
+
+from jupyter_server_fileid.manager import (
+    ArbitraryFileIdManager,
+    BaseFileIdManager,
+    HashMapFileIdManager,
+    LocalFileIdManager,
+)
+from jupyter_server_fileid.storage import (
+    DbmFileIdStore,
+    ShardedSqliteFileIdStore,
+    SqliteFileIdStore,
+)
+
+MANAGERS: Dict[str, Tuple[Type[BaseFileIdManager], Dict[str, Any]]] = {
+    "local": (LocalFileIdManager, {"store_class": SqliteFileIdStore}),
+    "local-dbm": (LocalFileIdManager, {"store_class": DbmFileIdStore}),
+    "local-sharded": (LocalFileIdManager, {"store_class": ShardedSqliteFileIdStore}),
+    "arbitrary": (ArbitraryFileIdManager, {"store_class": SqliteFileIdStore}),
+    "arbitrary-dbm": (ArbitraryFileIdManager, {"store_class": DbmFileIdStore}),
+    "arbitrary-sharded": (
+        ArbitraryFileIdManager,
+        {"store_class": ShardedSqliteFileIdStore},
+    ),
+    "hashmap": (HashMapFileIdManager, {}),
+}
+
+
+def run(name: str, dirs: int, files_per_dir: int) -> Dict[str, float]:
+    tmp_dir = tempfile.mkdtemp()
+    root_dir = os.path.join(tmp_dir, "root")
+    os.mkdir(root_dir)
+    try:
+        paths = build_tree(root_dir, dirs, files_per_dir)
+        manager_class, kwargs = MANAGERS[name]
+        manager = manager_class(
+            root_dir=root_dir, db_path=os.path.join(tmp_dir, "fileid.db"), **kwargs
+        )
+        results = {}
+
+        start = time.perf_counter()
+        ids = [manager.index(path) for path in paths]
+        results["index"] = (time.perf_counter() - start) / len(paths) * 1e6
+
+        results["get_id"] = timed_each(manager.get_id, paths)
+        results["get_path"] = timed_each(manager.get_path, ids)
+        results["get_id (miss)"] = timed_each(manager.get_id, ["missing"] * 1000)
+
+        os.rename(os.path.join(root_dir, "dir0"), os.path.join(root_dir, "moved"))
+        results["move dir"] = timed(partial(manager.move, "dir0", "moved"))
+        shutil.copytree(
+            os.path.join(root_dir, "moved"), os.path.join(root_dir, "copied")
+        )
+        results["copy dir"] = timed(partial(manager.copy, "moved", "copied"))
+        shutil.rmtree(os.path.join(root_dir, "copied"))
+        results["delete dir"] = timed(partial(manager.delete, "copied"))
+
+        del manager
+        return results
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument(
+        "--managers", nargs="+", choices=list(MANAGERS), default=list(MANAGERS)
+    )
+    args = parser.parse_args()
+
+    results = {name: run(name, args.dirs, args.files_per_dir) for name in args.managers}
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compares the latency of File ID manager operations across the performance
+profiles of the SQLite storage backend.
+
+Builds a directory tree under a temporary root, indexes every entry with a
+`LocalFileIdManager` using each profile, committing after every file, and then
+times lookups and directory moves. Usage::
+
+    python benchmarks/bench_profiles.py --dirs 20 --files-per-dir 100 --journal-mode WAL
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from bench_common import build_tree, print_table, timed_each
+from traitlets.config import Config
+
+from jupyter_server_fileid.manager import BaseFileIdManager, LocalFileIdManager
+from jupyter_server_fileid.storage import SqliteFileIdStore
+
+# what may be lost on power loss with each profile, by journal mode
+DURABILITY = {
+    "durable": {"WAL": "nothing", "other": "nothing"},
+    "balanced": {"WAL": "last commits", "other": "database (rare)"},
+    "fast": {"WAL": "database", "other": "database"},
+}
+
+
+def run(
+    profile: str, dirs: int, files_per_dir: int, journal_mode: str
+) -> Dict[str, float]:
+    tmp_dir = tempfile.mkdtemp()
+    root_dir = os.path.join(tmp_dir, "root")
+    os.mkdir(root_dir)
+    try:
+        paths = build_tree(root_dir, dirs, files_per_dir)
+        config = Config({"SqliteFileIdStore": {"profile": profile}})
+        manager = LocalFileIdManager(
+            root_dir=root_dir,
+            db_path=os.path.join(tmp_dir, "fileid.db"),
+            db_journal_mode=journal_mode,
+            store_class=SqliteFileIdStore,
+            config=config,
+        )
+        results = {}
+
+        # each index() commits its own transaction, and hence syncs to disk
+        # as often as the profile allows
+        start = time.perf_counter()
+        ids = [manager.index(path) for path in paths]
+        results["index"] = (time.perf_counter() - start) / len(paths) * 1e6
+
+        results["get_id"] = timed_each(manager.get_id, paths)
+        results["get_path"] = timed_each(manager.get_path, ids)
+
+        start = time.perf_counter()
+        for i in range(dirs):
+            old_path, new_path = f"dir{i}", f"moved{i}"
+            os.rename(
+                os.path.join(root_dir, old_path), os.path.join(root_dir, new_path)
+            )
+            manager.move(old_path, new_path)
+        results["move dir"] = (time.perf_counter() - start) / dirs * 1e6
+
+        del manager
+        return results
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dirs", type=int, default=20)
+    parser.add_argument("--files-per-dir", type=int, default=100)
+    parser.add_argument(
+        "--journal-mode",
+        type=str.upper,
+        choices=BaseFileIdManager.JOURNAL_MODES,
+        default="DELETE",
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=list(SqliteFileIdStore.PROFILES),
+        default=list(SqliteFileIdStore.PROFILES),
+    )
+    args = parser.parse_args()
+
+    results = {
+        profile: run(profile, args.dirs, args.files_per_dir, args.journal_mode)
+        for profile in args.profiles
+    }
+    print_table(results)
+    journal_mode = "WAL" if args.journal_mode == "WAL" else "other"
+    print(
+        f"{'power loss':<16}"
+        + "".join(f"{DURABILITY[name][journal_mode]:>18}" for name in results)
+    )
+
+
+if __name__ == "__main__":
+    main()
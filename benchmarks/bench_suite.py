@@ -0,0 +1,239 @@
+"""Measures File ID manager operations on large synthetic trees and stores the
+results as JSON, such that regressions can be compared between commits.
+
+Generates a deterministic directory tree of each requested size, with
+configurable depth and fan-out, and times indexing, syncing, lookups, and
+moves, copies, and deletes of a large directory with `LocalFileIdManager` and
+`ArbitraryFileIdManager`. `ArbitraryFileIdManager` never touches the
+filesystem, so the tree is only written to disk for `LocalFileIdManager`.
+Usage::
+
+    python benchmarks/bench_suite.py --sizes 10000 100000 --output after.json
+    python benchmarks/bench_suite.py --sizes 10000 100000 --output after.json \\
+        --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from bench_common import generate_tree, timed, timed_each, write_tree
+
+from jupyter_server_fileid.manager import (
+    ArbitraryFileIdManager,
+    BaseFileIdManager,
+    LocalFileIdManager,
+)
+from jupyter_server_fileid.storage import (
+    BaseFileIdStore,
+    DbmFileIdStore,
+    ShardedSqliteFileIdStore,
+    SqliteFileIdStore,
+)
+
+MANAGERS: Dict[str, Type[BaseFileIdManager]] = {
+    "local": LocalFileIdManager,
+    "arbitrary": ArbitraryFileIdManager,
+}
+
+STORES: Dict[str, Type[BaseFileIdStore]] = {
+    "sqlite": SqliteFileIdStore,
+    "dbm": DbmFileIdStore,
+    "sharded": ShardedSqliteFileIdStore,
+}
+
+# number of paths sampled for point lookups, which bounds the run time of the
+# lookup benchmarks on large trees.
+SAMPLE_SIZE = 10000
+
+
+def run(
+    manager_name: str,
+    store_name: str,
+    size: int,
+    depth: int,
+    fanout: int,
+    seed: int,
+) -> Dict[str, float]:
+    """Runs all benchmarks against a single manager and tree. Returns the
+    duration of each operation in microseconds."""
+    entries = generate_tree(size, depth, fanout, seed)
+    paths = [path for path, _ in entries]
+    is_local = manager_name == "local"
+
+    tmp_dir = tempfile.mkdtemp()
+    root_dir = os.path.join(tmp_dir, "root")
+    os.mkdir(root_dir)
+    try:
+        if is_local:
+            write_tree(root_dir, entries)
+
+        results: Dict[str, float] = {}
+        start = time.perf_counter()
+        manager = MANAGERS[manager_name](
+            root_dir=root_dir,
+            db_path=os.path.join(tmp_dir, "fileid.db"),
+            store_class=STORES[store_name],
+        )
+        if is_local:
+            # the constructor indexes all directories via `_index_all()`
+            results["_index_all"] = (time.perf_counter() - start) * 1e6
+
+        results["index"] = timed_each(manager.index, paths)
+
+        if is_local:
+            assert isinstance(manager, LocalFileIdManager)
+            results["_sync_all"] = timed(manager._sync_all)
+            # bump the mtime of 1% of directories, which are then synced
+            dirs = [path for path, is_dir in entries if is_dir]
+            for path in random.Random(seed).sample(dirs, max(1, len(dirs) // 100)):
+                abs_path = os.path.join(root_dir, *path.split("/"))
+                mtime = os.stat(abs_path).st_mtime + 1
+                os.utime(abs_path, (mtime, mtime))
+            results["_sync_all (1% dirty)"] = timed(manager._sync_all)
+
+        sample = random.Random(seed).sample(paths, min(SAMPLE_SIZE, len(paths)))
+        ids = [manager.get_id(path) for path in sample]
+        results["get_id"] = timed_each(manager.get_id, sample)
+        results["get_id (miss)"] = timed_each(
+            manager.get_id, [path + ".missing" for path in sample]
+        )
+        results["get_path"] = timed_each(manager.get_path, ids)
+        results["get_path (miss)"] = timed_each(
+            manager.get_path, [f"missing-{i}" for i in range(len(sample))]
+        )
+
+        def fs(op: Callable[..., object], *args: str) -> None:
+            if is_local:
+                op(*(os.path.join(root_dir, arg) for arg in args))
+
+        # the first top-level directory holds about 1/fanout of all entries
+        fs(os.rename, "d0", "moved")
+        results["move dir"] = timed(partial(manager.move, "d0", "moved"))
+        fs(shutil.copytree, "moved", "copied")
+        results["copy dir"] = timed(partial(manager.copy, "moved", "copied"))
+        fs(shutil.rmtree, "copied")
+        results["delete dir"] = timed(partial(manager.delete, "copied"))
+
+        del manager
+        return results
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def metadata() -> Dict[str, Any]:
+    """Returns metadata identifying the environment of a benchmark run."""
+    try:
+        commit: Optional[str] = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def result_key(result: Dict[str, Any]) -> Tuple[Any, ...]:
+    return tuple(
+        result[field]
+        for field in ("manager", "store", "size", "depth", "fanout", "operation")
+    )
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> bool:
+    """Prints the ratio of each duration in `current` to that in `baseline`.
+    Returns True if any operation is slower than `threshold` times its
+    duration in `baseline`."""
+    baseline_results = {result_key(r): r["us"] for r in baseline["results"]}
+    regressed = False
+    print(f"\nCompared to {baseline['metadata'].get('commit')}:")
+    for result in current["results"]:
+        before = baseline_results.get(result_key(result))
+        if not before:
+            continue
+        ratio = result["us"] / before
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        name = " ".join(str(field) for field in result_key(result))
+        print(f"{name:<60}{ratio:>8.2f}x{flag}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--managers", nargs="+", choices=list(MANAGERS), default=list(MANAGERS)
+    )
+    parser.add_argument("--stores", nargs="+", choices=list(STORES), default=["sqlite"])
+    parser.add_argument("--output", help="Path of the JSON file to write results to.")
+    parser.add_argument("--compare", help="Path of a JSON file of earlier results.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Ratio to the earlier duration above which an operation regressed.",
+    )
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for manager_name in args.managers:
+            for store_name in args.stores:
+                durations = run(
+                    manager_name, store_name, size, args.depth, args.fanout, args.seed
+                )
+                print(f"\n{manager_name} ({store_name}), {size} entries")
+                for operation, us in durations.items():
+                    print(f"  {operation:<24}{us:>16.1f} us")
+                    results.append(
+                        {
+                            "manager": manager_name,
+                            "store": store_name,
+                            "size": size,
+                            "depth": args.depth,
+                            "fanout": args.fanout,
+                            "operation": operation,
+                            "us": us,
+                        }
+                    )
+
+    output = {"metadata": metadata(), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, output, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict
+
+import pytest
+
+load_report_key = pytest.StashKey[Dict[str, Dict[str, Any]]]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("fileid load test")
+    group.addoption(
+        "--load-managers",
+        nargs="+",
+        default=["local", "arbitrary"],
+        help="File ID managers to load test.",
+    )
+    group.addoption(
+        "--load-tree-size",
+        type=int,
+        default=10000,
+        help="Number of entries in the synthetic tree under the server root.",
+    )
+    group.addoption(
+        "--load-clients",
+        type=int,
+        default=16,
+        help="Number of concurrent clients.",
+    )
+    group.addoption(
+        "--load-requests",
+        type=int,
+        default=200,
+        help="Number of requests sent by each client.",
+    )
+    group.addoption(
+        "--load-write-ratio",
+        type=float,
+        default=0.1,
+        help="Fraction of requests that rename a file through the contents API.",
+    )
+    group.addoption(
+        "--load-output",
+        default=None,
+        help="Path of the JSON file to write results to.",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "load_manager" in metafunc.fixturenames:
+        metafunc.parametrize("load_manager", metafunc.config.getoption("load_managers"))
+
+
+def pytest_configure(config):
+    config.stash[load_report_key] = {}
+
+
+@pytest.fixture
+def load_report(pytestconfig):
+    """Returns a dict to which each scenario adds its results by name."""
+    return pytestconfig.stash[load_report_key]
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Prints the results of each scenario, compared against the baseline
+    scenario of the same manager, and saves them if requested."""
+    report = config.stash[load_report_key]
+    if not report:
+        return
+
+    terminalreporter.section("fileid load test")
+    for name, results in report.items():
+        baseline = report.get(name.split("-")[0] + "-baseline")
+        terminalreporter.write_line(name)
+        for kind, summary in results.items():
+            if not summary["count"]:
+                continue
+            line = (
+                f"  {kind:<10}{summary['count']:>8}"
+                f"  p50 {summary['p50']:>8.2f} ms  p99 {summary['p99']:>8.2f} ms"
+            )
+            if baseline and baseline is not results and baseline[kind]["count"]:
+                line += (
+                    f"  p99 x{summary['p99'] / max(baseline[kind]['p99'], 1e-3):.1f}"
+                )
+            terminalreporter.write_line(line)
+
+    output = config.getoption("load_output")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,215 @@
+"""Load tests the File ID endpoints of a real Jupyter server.
+
+Concurrent clients look up file IDs and paths through `/api/fileid/id` and
+`/api/fileid/path`, interleaved with renames through the contents API, which
+emit the contents events handled by the File ID manager. Each scenario reports
+latency percentiles and histograms for each kind of request, along with the lag
+of the event loop, and is compared against the baseline scenario without
+background work. Usage::
+
+    pytest benchmarks/test_load.py --load-clients 32 --load-output load.json
+
+See `benchmarks/conftest.py` for all options. Not collected by the default
+test run.
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import random
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+from bench_common import generate_tree, write_tree
+from bench_suite import MANAGERS
+from tornado.escape import json_decode
+
+from jupyter_server_fileid.manager import LocalFileIdManager
+
+# upper bounds in milliseconds of the buckets of latency histograms.
+HISTOGRAM_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+# interval in seconds at which event loop lag is sampled.
+LAG_INTERVAL = 0.01
+
+# the directory renamed back and forth by the `move_dir` scenario, which holds
+# about 1/fanout of all entries of the synthetic tree.
+MOVED_DIR = "d0"
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Returns percentiles and a histogram of `samples`, in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    samples = sorted(sample * 1e3 for sample in samples)
+    histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+    for sample in samples:
+        histogram[bisect_left(HISTOGRAM_BUCKETS, sample)] += 1
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p99": percentile(99),
+        "max": samples[-1],
+        "histogram": dict(zip([*map(str, HISTOGRAM_BUCKETS), "inf"], histogram)),
+    }
+
+
+@pytest.fixture
+def load_tree(jp_root_dir, pytestconfig):
+    """Writes a synthetic tree under the server root. Returns the API path of
+    each entry and whether it is a directory."""
+    entries = generate_tree(pytestconfig.getoption("load_tree_size"), 4, 10)
+    write_tree(str(jp_root_dir), entries)
+    return entries
+
+
+@pytest.fixture
+def client_paths(jp_root_dir, pytestconfig):
+    """Writes a file for each client to rename. Returns their API paths."""
+    paths = [f"client{i}.txt" for i in range(pytestconfig.getoption("load_clients"))]
+    write_tree(str(jp_root_dir), [(path, False) for path in paths])
+    return paths
+
+
+@pytest.fixture
+def jp_server_config(load_manager, load_tree, fid_db_path):
+    # depends on `load_tree` so that the tree exists when the server starts
+    return {
+        "ServerApp": {"jpserver_extensions": {"jupyter_server_fileid": True}},
+        "FileIdExtension": {"file_id_manager_class": MANAGERS[load_manager]},
+        "BaseFileIdManager": {"db_path": fid_db_path},
+    }
+
+
+async def monitor_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    """Samples the lag of the event loop until `stop` is set."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(max(0.0, loop.time() - start - LAG_INTERVAL))
+
+
+async def repeat(stop: asyncio.Event, interval: float, fn: Callable[[], Any]) -> None:
+    """Calls `fn` every `interval` seconds until `stop` is set, awaiting its
+    result if it returns an awaitable."""
+    while not stop.is_set():
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        await asyncio.sleep(interval)
+
+
+@pytest.mark.parametrize("scenario", ["baseline", "sync_all", "move_dir"])
+async def test_load(
+    scenario,
+    load_manager,
+    load_tree,
+    client_paths,
+    load_report,
+    jp_fetch,
+    jp_root_dir,
+    jp_serverapp,
+    http_server_client,
+    pytestconfig,
+):
+    fid_manager = jp_serverapp.web_app.settings["file_id_manager"]
+    if scenario == "sync_all" and not isinstance(fid_manager, LocalFileIdManager):
+        pytest.skip("Only LocalFileIdManager syncs with the filesystem.")
+
+    clients = pytestconfig.getoption("load_clients")
+    n_requests = pytestconfig.getoption("load_requests")
+    write_ratio = pytestconfig.getoption("load_write_ratio")
+    http_server_client.max_clients = clients
+    rng = random.Random(0)
+
+    # paths outside of the moved directory, which always exist
+    read_entries = [
+        (path, is_dir)
+        for path, is_dir in load_tree
+        if path != MOVED_DIR and not path.startswith(MOVED_DIR + "/")
+    ]
+    read_paths = [path for path, _ in read_entries]
+    ids = [fid_manager.index(path) for path in read_paths]
+    # each client renames only its own file, back and forth
+    writable_paths = client_paths
+    for path in writable_paths:
+        fid_manager.index(path)
+
+    latencies: Dict[str, List[float]] = {"get_id": [], "get_path": [], "rename": []}
+
+    async def timed_fetch(kind: str, *args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        response = await jp_fetch(*args, **kwargs)
+        latencies[kind].append(time.perf_counter() - start)
+        return response
+
+    async def rename(old_path: str, new_path: str, kind: Optional[str] = None) -> None:
+        body = json.dumps({"path": new_path})
+        if kind is None:
+            await jp_fetch("api/contents", old_path, method="PATCH", body=body)
+        else:
+            await timed_fetch(kind, "api/contents", old_path, method="PATCH", body=body)
+
+    async def client(i: int) -> None:
+        path, renamed_path = writable_paths[i], writable_paths[i] + ".renamed"
+        for _ in range(n_requests):
+            roll = rng.random()
+            if roll < write_ratio:
+                await rename(path, renamed_path, "rename")
+                path, renamed_path = renamed_path, path
+            elif roll < write_ratio + (1 - write_ratio) / 2:
+                response = await timed_fetch(
+                    "get_id", "api/fileid/id", params={"path": rng.choice(read_paths)}
+                )
+                assert json_decode(response.body)["id"] is not None
+            else:
+                response = await timed_fetch(
+                    "get_path", "api/fileid/path", params={"id": rng.choice(ids)}
+                )
+                assert json_decode(response.body)["path"] is not None
+
+    moved = False
+
+    async def move_dir() -> None:
+        nonlocal moved
+        src, dst = (MOVED_DIR, MOVED_DIR + "_moved")[:: -1 if moved else 1]
+        await rename(src, dst)
+        moved = not moved
+
+    dirs = [
+        os.path.join(jp_root_dir, *path.split("/"))
+        for path, is_dir in read_entries
+        if is_dir
+    ]
+
+    def sync_all() -> None:
+        # dirty a few directories such that the sync has work to do
+        for path in rng.sample(dirs, min(len(dirs), 10)):
+            mtime = os.stat(path).st_mtime + 1
+            os.utime(path, (mtime, mtime))
+        fid_manager._sync_all()
+
+    stop = asyncio.Event()
+    lags: List[float] = []
+    background = [asyncio.create_task(monitor_lag(stop, lags))]
+    if scenario == "sync_all":
+        background.append(asyncio.create_task(repeat(stop, 0.05, sync_all)))
+    elif scenario == "move_dir":
+        background.append(asyncio.create_task(repeat(stop, 0.05, move_dir)))
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    stop.set()
+    await asyncio.gather(*background)
+
+    results = {kind: summarize(samples) for kind, samples in latencies.items()}
+    results["loop_lag"] = summarize(lags)
+    load_report[f"{load_manager}-{scenario}"] = results
@@ -0,0 +1,82 @@
+import math
+from typing import Iterator
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(key: int) -> int:
+    """Returns a 64-bit hash of the integer `key`, mixed with the finalizer of
+    SplitMix64 such that nearby keys, like consecutive inode numbers, hash to
+    unrelated values."""
+    key = (key + 0x9E3779B97F4A7C15) & _MASK
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & _MASK
+    return key ^ (key >> 31)
+
+
+class BloomFilter:
+    """
+    Set of integers that supports adding integers and testing membership, but
+    not removing them. Membership tests may return false positives, at a rate
+    of about `fp_rate` while at most `capacity` integers are added, and never
+    return false negatives.
+
+    Notes
+    -----
+    - Uses `hashes` bit positions per integer, derived from a single 64-bit
+    hash by double hashing.
+
+    - The rate of false positives grows past `fp_rate` once more than
+    `capacity` integers are added, so callers should rebuild the filter with a
+    larger capacity by then.
+
+    - `count` only counts integers that set at least one bit, such that adding
+    an integer again does not count it twice. Integers that are false
+    positives when added are not counted either, so `count` slightly
+    underestimates the number of distinct integers added.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.capacity = max(capacity, 1)
+        bits = -self.capacity * math.log(fp_rate) / math.log(2) ** 2
+        self._bits = bytearray(max(math.ceil(bits / 8), 1))
+        self.size = len(self._bits) * 8
+        self.hashes = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.count = 0
+
+    def _positions(self, key: int) -> Iterator[int]:
+        hash = _mix(key)
+        low, high = hash & 0xFFFFFFFF, (hash >> 32) | 1
+        for i in range(self.hashes):
+            yield (low + i * high) % self.size
+
+    def add(self, key: int) -> bool:
+        """Adds `key`, returning False if it was already a member."""
+        bits = self._bits
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key: int) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the bit array in bytes."""
+        return len(self._bits)
+
+    @property
+    def estimated_fp_rate(self) -> float:
+        """Expected rate of false positives given the number of integers
+        counted."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
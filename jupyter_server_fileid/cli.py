@@ -1,8 +1,19 @@
+import json
+import os
+import shutil
 import sqlite3
+import sys
+import tempfile
+import time
+from typing import IO, Callable, Optional
 
 import click
+from traitlets.config import Config
+from traitlets.utils.importstring import import_item
 
-from .manager import default_db_path
+from .manager import BaseFileIdManager, LocalFileIdManager, default_db_path
+from .replay import read_events, replay
+from .transfer import FORMATS
 
 
 @click.group()
@@ -20,3 +31,373 @@ def drop() -> None:
     con.commit()
     con.close()
     click.echo(f"Successfully dropped file ID table at path {default_db_path}")
+
+
+@main.command("replay")
+@click.argument("events_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--manager",
+    "manager_class",
+    default="jupyter_server_fileid.manager.ArbitraryFileIdManager",
+    show_default=True,
+    help="Import path of the File ID manager class to replay events against.",
+)
+@click.option(
+    "--root-dir",
+    default=".",
+    show_default=True,
+    help="Root directory of the File ID manager.",
+)
+@click.option(
+    "--db-path",
+    default=None,
+    help="Database path of the File ID manager. Defaults to a temporary file.",
+)
+@click.option(
+    "--original-speed",
+    is_flag=True,
+    help="Keep the original intervals between events instead of replaying "
+    "them as fast as possible.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print statistics as JSON.")
+def replay_command(
+    events_path: str,
+    manager_class: str,
+    root_dir: str,
+    db_path: Optional[str],
+    original_speed: bool,
+    as_json: bool,
+) -> None:
+    """Replays contents events recorded with `FileIdExtension.record_events_path`
+    against a File ID manager, and reports throughput, per-action latency, and
+    the final number of records."""
+    tmp_dir = None
+    if db_path is None:
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, "file_id_manager.db")
+
+    try:
+        manager = import_item(manager_class)(
+            root_dir=os.path.abspath(root_dir), db_path=db_path
+        )
+        stats = replay(manager, read_events(events_path), original_speed)
+        del manager
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if as_json:
+        output = stats._asdict()
+        output["throughput"] = stats.throughput
+        output["actions"] = {
+            action: action_stats._asdict()
+            for action, action_stats in stats.actions.items()
+        }
+        click.echo(json.dumps(output, indent=2))
+        return
+
+    click.echo(
+        f"Replayed {stats.events - stats.skipped} of {stats.events} events in "
+        f"{stats.duration:.3f}s ({stats.throughput:.0f} events/s)."
+    )
+    click.echo(f"{'action':<10}{'events':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for action, action_stats in stats.actions.items():
+        click.echo(
+            f"{action:<10}{action_stats.events:>8}{action_stats.errors:>8}"
+            f"{action_stats.p50 * 1e3:>10.3f}{action_stats.p99 * 1e3:>10.3f}"
+        )
+    click.echo(f"Final number of records: {stats.records}")
+
+
+@main.command("reindex")
+@click.option(
+    "--root",
+    "root_dir",
+    default=".",
+    show_default=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Root directory of the server, i.e. `ServerApp.root_dir`.",
+)
+@click.option(
+    "--db",
+    "db_path",
+    default=default_db_path,
+    show_default=True,
+    help="Database path, i.e. `BaseFileIdManager.db_path`.",
+)
+@click.option(
+    "--store",
+    "store_class",
+    default="jupyter_server_fileid.storage.SqliteFileIdStore",
+    show_default=True,
+    help="Import path of the storage backend class, i.e. "
+    "`BaseFileIdManager.store_class`.",
+)
+@click.option(
+    "--workers",
+    default=min(32, (os.cpu_count() or 1) + 4),
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of threads reading directories.",
+)
+@click.option(
+    "--batch-size",
+    default=1000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of entries indexed per transaction.",
+)
+def reindex(
+    root_dir: str, db_path: str, store_class: str, workers: int, batch_size: int
+) -> None:
+    """Indexes all files and directories under a root directory with
+    `LocalFileIdManager`, e.g. before the server starts, such that the server
+    starts against a complete index."""
+    # the serial indexing on startup is redundant with reindex()
+    manager = LocalFileIdManager(
+        root_dir=os.path.abspath(root_dir),
+        db_path=db_path,
+        store_class=import_item(store_class),
+        index_on_startup=False,
+    )
+    start = time.perf_counter()
+    interactive = sys.stderr.isatty()
+    last_report = 0.0
+
+    def report(files: int, dirs: int) -> None:
+        nonlocal last_report
+        now = time.perf_counter()
+        if not interactive or now - last_report < 0.1:
+            return
+        last_report = now
+        throughput = files / (now - start) if now > start else 0.0
+        click.echo(
+            f"\rIndexed {files} entries of {dirs} directories ({throughput:.0f}/s)",
+            err=True,
+            nl=False,
+        )
+
+    stats = manager.reindex(workers=workers, batch_size=batch_size, progress=report)
+    del manager
+    if interactive:
+        click.echo(err=True)
+    click.echo(
+        f"Indexed {stats.files} entries of {stats.dirs} directories in "
+        f"{stats.duration:.3f}s ({stats.throughput:.0f}/s), creating "
+        f"{stats.created} records at {db_path}."
+    )
+
+
+def _manager_options(func: Callable[..., None]) -> Callable[..., None]:
+    """Adds the options selecting the File ID manager of a command."""
+    options = [
+        click.option(
+            "--manager",
+            "manager_class",
+            default="jupyter_server_fileid.manager.ArbitraryFileIdManager",
+            show_default=True,
+            help="Import path of the File ID manager class, i.e. "
+            "`FileIdExtension.file_id_manager_class`.",
+        ),
+        click.option(
+            "--root",
+            "root_dir",
+            default=".",
+            show_default=True,
+            help="Root directory of the server, i.e. `ServerApp.root_dir`.",
+        ),
+        click.option(
+            "--db",
+            "db_path",
+            default=default_db_path,
+            show_default=True,
+            help="Database path, i.e. `BaseFileIdManager.db_path`.",
+        ),
+        click.option(
+            "--store",
+            "store_class",
+            default="jupyter_server_fileid.storage.SqliteFileIdStore",
+            show_default=True,
+            help="Import path of the storage backend class, i.e. "
+            "`BaseFileIdManager.store_class`.",
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def _load_manager(
+    manager_class: str,
+    root_dir: str,
+    db_path: str,
+    store_class: str,
+    index_on_startup: bool = True,
+) -> BaseFileIdManager:
+    klass = import_item(manager_class)
+    kwargs = {}
+    if issubclass(klass, LocalFileIdManager):
+        kwargs["index_on_startup"] = index_on_startup
+    return klass(
+        root_dir=os.path.abspath(root_dir),
+        db_path=db_path,
+        store_class=import_item(store_class),
+        **kwargs,
+    )
+
+
+@main.command("export")
+@click.argument("output", type=click.File("wb"), default="-")
+@_manager_options
+@click.option(
+    "--format",
+    "format",
+    type=click.Choice(FORMATS),
+    default="ndjson",
+    show_default=True,
+    help="Format of the export.",
+)
+def export_command(
+    output: IO[bytes],
+    manager_class: str,
+    root_dir: str,
+    db_path: str,
+    store_class: str,
+    format: str,
+) -> None:
+    """Exports all file records to OUTPUT, or to stdout by default, such that
+    they may be imported with `jupyter fileid import`, e.g. on another node."""
+    # indexing on startup would write to the database being exported
+    manager = _load_manager(
+        manager_class, root_dir, db_path, store_class, index_on_startup=False
+    )
+    start = time.perf_counter()
+    count = manager.export_records(output, format)
+    del manager
+    click.echo(
+        f"Exported {count} records in {time.perf_counter() - start:.3f}s.", err=True
+    )
+
+
+@main.command("import")
+@click.argument("input", type=click.File("rb"), default="-")
+@_manager_options
+@click.option(
+    "--from-root",
+    default=None,
+    help="Root directory of the exported paths to rewrite. Defaults to the "
+    "root directory of the exporting server.",
+)
+def import_command(
+    input: IO[bytes],
+    manager_class: str,
+    root_dir: str,
+    db_path: str,
+    store_class: str,
+    from_root: Optional[str],
+) -> None:
+    """Imports file records exported with `jupyter fileid export` from INPUT,
+    or from stdin by default. Exported paths are rewritten to the same
+    relative paths under the root directory."""
+    manager = _load_manager(manager_class, root_dir, db_path, store_class)
+    start = time.perf_counter()
+    try:
+        count = manager.import_records(input, root_dir=from_root)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    finally:
+        del manager
+    click.echo(f"Imported {count} records in {time.perf_counter() - start:.3f}s.")
+
+
+@main.command("check")
+@click.option(
+    "--root",
+    "root_dir",
+    default=".",
+    show_default=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Root directory of the server, i.e. `ServerApp.root_dir`.",
+)
+@click.option(
+    "--db",
+    "db_path",
+    default=default_db_path,
+    show_default=True,
+    help="Database path, i.e. `BaseFileIdManager.db_path`.",
+)
+@click.option(
+    "--store",
+    "store_class",
+    default="jupyter_server_fileid.storage.SqliteFileIdStore",
+    show_default=True,
+    help="Import path of the storage backend class, i.e. "
+    "`BaseFileIdManager.store_class`.",
+)
+@click.option(
+    "--workers",
+    default=min(32, (os.cpu_count() or 1) + 4),
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of threads stat'ing files.",
+)
+@click.option("--repair", is_flag=True, help="Fix the drift found.")
+@click.option(
+    "--limit",
+    default=10,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Maximum number of paths listed per kind of drift.",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON.")
+def check(
+    root_dir: str,
+    db_path: str,
+    store_class: str,
+    workers: int,
+    repair: bool,
+    limit: int,
+    as_json: bool,
+) -> None:
+    """Compares the records of `LocalFileIdManager` with the files under a root
+    directory, and reports the drift between them. Exits with status 1 if any
+    drift was found and not repaired."""
+    # indexing on startup would repair the drift before it is checked, and
+    # the database is only written to if repairing it
+    try:
+        manager = LocalFileIdManager(
+            root_dir=os.path.abspath(root_dir),
+            db_path=db_path,
+            store_class=import_item(store_class),
+            index_on_startup=False,
+            config=Config({"SqliteFileIdStore": {"read_only": not repair}}),
+        )
+    except sqlite3.OperationalError as e:
+        raise click.ClickException(f"Cannot open database {db_path}: {e}") from e
+    report = manager.check(workers=workers, repair=repair)
+    del manager
+
+    if as_json:
+        output = report._asdict()
+        output["ok"] = report.ok
+        click.echo(json.dumps(output, indent=2))
+    else:
+        click.echo(f"Checked {report.records} records in {report.duration:.3f}s.")
+        for field, description in [
+            ("stale", "stale records"),
+            ("duplicates", "duplicate paths"),
+            ("missing_dirs", "missing directories"),
+            ("ino_collisions", "inode collisions"),
+            ("crtime_mismatches", "crtime mismatches"),
+        ]:
+            paths = getattr(report, field)
+            click.echo(f"{description}: {len(paths)}")
+            for path in paths[:limit]:
+                click.echo(f"  {path}")
+            if len(paths) > limit:
+                click.echo(f"  ... and {len(paths) - limit} more")
+        if repair:
+            click.echo(f"Repaired {report.repaired} records.")
+
+    if not report.ok and not repair:
+        sys.exit(1)
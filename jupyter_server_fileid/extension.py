@@ -1,11 +1,31 @@
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 from jupyter_events.logger import EventLogger
 from jupyter_server.extension.application import ExtensionApp
-from traitlets import Instance, Type
+from jupyter_server.serverapp import ServerApp
+from tornado.ioloop import PeriodicCallback
+from traitlets import Instance, Type, Unicode
 
-from jupyter_server_fileid.handler import FileIDHandler, FilePathHandler
-from jupyter_server_fileid.manager import ArbitraryFileIdManager, BaseFileIdManager
+from jupyter_server_fileid.handler import (
+    FileIdChangesHandler,
+    FileIDHandler,
+    FileIdListHandler,
+    FileIdPushHandler,
+    FileIdSearchHandler,
+    FileIdStatsHandler,
+    FilePathHandler,
+)
+from jupyter_server_fileid.maintenance import MaintenanceScheduler
+from jupyter_server_fileid.manager import (
+    EVENT_SCHEMA_PATH,
+    ArbitraryFileIdManager,
+    BaseFileIdManager,
+    LocalFileIdManager,
+)
+from jupyter_server_fileid.metrics import FILEID_EVENT_DURATION_SECONDS, observe_manager
+from jupyter_server_fileid.push import ChangePublisher
+from jupyter_server_fileid.replay import EventRecorder
 
 
 class FileIdExtension(ExtensionApp):
@@ -27,20 +47,61 @@ class FileIdExtension(ExtensionApp):
         allow_none=True,
     )
 
+    record_events_path = Unicode(
+        default_value=None,
+        allow_none=True,
+        help=(
+            "The path of a file to which contents events received by the File ID "
+            "manager are appended as NDJSON, such that they may be replayed "
+            "offline with `jupyter fileid replay`. Disabled if None."
+        ),
+        config=True,
+    )
+
     handlers: List[Tuple[str, type]] = [
         ("/api/fileid/id", FileIDHandler),
         ("/api/fileid/path", FilePathHandler),
+        ("/api/fileid/stats", FileIdStatsHandler),
+        ("/api/fileid/changes", FileIdChangesHandler),
+        ("/api/fileid/changes/ws", FileIdPushHandler),
+        ("/api/fileid/search", FileIdSearchHandler),
+        ("/api/fileid/list", FileIdListHandler),
     ]
 
+    _checkpoint_callback: Optional[PeriodicCallback] = None
+    _gc_callback: Optional[PeriodicCallback] = None
+    _maintenance_callback: Optional[PeriodicCallback] = None
+    _push_callback: Optional[PeriodicCallback] = None
+    _publisher: Optional[ChangePublisher] = None
+    _recorder: Optional[EventRecorder] = None
+
     def initialize_settings(self) -> None:
         self.log.info(
             f"Configured File ID manager: {self.file_id_manager_class.__name__}"
         )
         assert self.serverapp is not None
+        # emit changes of file IDs to other extensions (requires jupyter_server~=2)
+        event_logger = self.settings.get("event_logger")
+        if event_logger is not None:
+            event_logger.register_event_schema(EVENT_SCHEMA_PATH)
         self.file_id_manager = self.file_id_manager_class(
-            log=self.log, root_dir=self.serverapp.root_dir, config=self.config
+            log=self.log,
+            root_dir=self.serverapp.root_dir,
+            config=self.config,
+            event_logger=event_logger,
         )
         self.settings.update({"file_id_manager": self.file_id_manager})
+        observe_manager(self.file_id_manager)
+
+        try:
+            self._publisher = ChangePublisher(
+                config=self.config, log=self.log, manager=self.file_id_manager
+            )
+        except NotImplementedError:
+            self.log.info(
+                "File ID manager does not record changes, pushing changes is disabled."
+            )
+        self.settings.update({"file_id_publisher": self._publisher})
 
         # attach listener to contents manager events (requires jupyter_server~=2)
         if "event_logger" in self.settings:
@@ -48,16 +109,90 @@ class FileIdExtension(ExtensionApp):
 
     def initialize_event_listeners(self) -> None:
         handlers_by_action = self.file_id_manager.get_handlers_by_action()
+        if self.record_events_path:
+            self._recorder = EventRecorder(log=self.log, path=self.record_events_path)
+        recorder = self._recorder
 
         async def cm_listener(
             logger: EventLogger, schema_id: str, data: Dict[str, Any]
         ) -> None:
+            if recorder is not None:
+                recorder.record(data)
             handler = handlers_by_action[data["action"]]
             if handler:
+                start = time.perf_counter()
                 handler(data)
+                FILEID_EVENT_DURATION_SECONDS.labels(data["action"]).observe(
+                    time.perf_counter() - start
+                )
 
         self.settings["event_logger"].add_listener(
             schema_id="https://events.jupyter.org/jupyter_server/contents_service/v1",
             listener=cm_listener,
         )
         self.log.info("Attached event listeners.")
+
+    async def _start_jupyter_server_extension(self, serverapp: ServerApp) -> None:
+        assert self.file_id_manager is not None
+        if self.file_id_manager.db_in_memory:
+            self._checkpoint_callback = PeriodicCallback(
+                self.file_id_manager.checkpoint,
+                self.file_id_manager.db_checkpoint_interval * 1000,
+            )
+            self._checkpoint_callback.start()
+            self.log.info("Started periodic database checkpoints.")
+        manager = self.file_id_manager
+        if isinstance(manager, LocalFileIdManager) and manager.gc_interval is not None:
+
+            def collect_garbage() -> None:
+                manager.collect_garbage()
+
+            self._gc_callback = PeriodicCallback(
+                collect_garbage, manager.gc_interval * 1000
+            )
+            self._gc_callback.start()
+            self.log.info("Started periodic garbage collection.")
+
+        scheduler = MaintenanceScheduler(
+            config=self.config, log=self.log, manager=manager
+        )
+        if scheduler.enabled:
+
+            def maintain() -> None:
+                scheduler.tick()
+
+            self._maintenance_callback = PeriodicCallback(
+                maintain, scheduler.check_interval * 1000
+            )
+            self._maintenance_callback.start()
+            self.log.info("Started idle-time database maintenance.")
+
+        publisher = self._publisher
+        if publisher is not None:
+
+            def push() -> None:
+                publisher.tick()
+
+            self._push_callback = PeriodicCallback(push, publisher.interval * 1000)
+            self._push_callback.start()
+            self.log.info("Started pushing changes to subscribed clients.")
+
+    async def stop_extension(self) -> None:
+        observe_manager(None)
+        if self._checkpoint_callback is not None:
+            self._checkpoint_callback.stop()
+            self._checkpoint_callback = None
+        if self._gc_callback is not None:
+            self._gc_callback.stop()
+            self._gc_callback = None
+        if self._maintenance_callback is not None:
+            self._maintenance_callback.stop()
+            self._maintenance_callback = None
+        if self._push_callback is not None:
+            self._push_callback.stop()
+            self._push_callback = None
+        if self._recorder is not None:
+            self._recorder.close()
+        if self.file_id_manager is not None:
+            self.file_id_manager.checkpoint()
+            self.file_id_manager.close()
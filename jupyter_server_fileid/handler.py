@@ -1,9 +1,14 @@
+import json
+from typing import Any, Dict, Optional
+
+from jupyter_core.utils import ensure_async
 from jupyter_server.auth.decorator import authorized
-from jupyter_server.base.handlers import APIHandler
-from tornado import web
+from jupyter_server.base.handlers import APIHandler, JupyterHandler
+from tornado import web, websocket
 from tornado.escape import json_encode
 
 from .manager import BaseFileIdManager
+from .push import ChangePublisher, Subscription
 
 
 class BaseHandler(APIHandler):
@@ -15,6 +20,27 @@ class BaseHandler(APIHandler):
         assert isinstance(manager, BaseFileIdManager)
         return manager
 
+    def _get_int_argument(self, name: str, default: Optional[int]) -> Optional[int]:
+        value = self.get_argument(name, None)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except ValueError as e:
+            raise web.HTTPError(
+                400, log_message=f"'{name}' parameter must be an integer."
+            ) from e
+
+    def _get_limit_argument(self, default: int, maximum: int) -> int:
+        """Returns the `limit` parameter, capped to `maximum`."""
+        limit = self._get_int_argument("limit", default)
+        assert limit is not None
+        if limit <= 0:
+            raise web.HTTPError(
+                400, log_message="'limit' parameter must be a positive integer."
+            )
+        return min(limit, maximum)
+
 
 class FileIDHandler(BaseHandler):
     """A handler that fetches a file ID from the file path."""
@@ -63,3 +89,145 @@ class FilePathHandler(BaseHandler):
             raise web.HTTPError(
                 400, log_message="'id' parameter was not provided in the request."
             )
+
+
+class FileIdStatsHandler(BaseHandler):
+    """A handler that returns statistics on the records and the database of the
+    File ID manager."""
+
+    @web.authenticated
+    @authorized
+    def get(self) -> None:
+        self.write(json_encode(self.file_id_manager.stats()))
+
+
+class FileIdChangesHandler(BaseHandler):
+    """A handler that returns the changes of file paths following a cursor, such
+    that clients may keep their file IDs up to date by polling."""
+
+    MAX_LIMIT = 10000
+
+    @web.authenticated
+    @authorized
+    def get(self) -> None:
+        since = self._get_int_argument("since", None)
+        limit = self._get_limit_argument(1000, self.MAX_LIMIT)
+        try:
+            changes = self.file_id_manager.get_changes(since, limit)
+        except NotImplementedError as e:
+            raise web.HTTPError(501, log_message=str(e)) from e
+        if changes is None:
+            raise web.HTTPError(
+                410,
+                log_message=(
+                    f"The changes following cursor {since} are no longer retained."
+                ),
+            )
+        self.write(json_encode(changes))
+
+
+class FileIdSearchHandler(BaseHandler):
+    """A handler that returns the files whose path contains a query, best
+    matches first."""
+
+    MAX_LIMIT = 1000
+
+    @web.authenticated
+    @authorized
+    def get(self) -> None:
+        try:
+            query = self.get_argument("q")
+        except web.MissingArgumentError as e:
+            raise web.HTTPError(
+                400, log_message="'q' parameter was not provided in the request."
+            ) from e
+        limit = self._get_limit_argument(50, self.MAX_LIMIT)
+        try:
+            results = self.file_id_manager.search(query, limit)
+        except NotImplementedError as e:
+            raise web.HTTPError(501, log_message=str(e)) from e
+        self.write(json_encode({"results": results}))
+
+
+class FileIdListHandler(BaseHandler):
+    """A handler that returns the indexed files under a directory, one page at a
+    time."""
+
+    MAX_LIMIT = 10000
+
+    @web.authenticated
+    @authorized
+    def get(self) -> None:
+        path = self.get_argument("path", "")
+        recursive = self.get_argument("recursive", "false").lower() in ("1", "true")
+        limit = self._get_limit_argument(1000, self.MAX_LIMIT)
+        cursor = self.get_argument("cursor", None)
+        self.write(
+            json_encode(self.file_id_manager.list_ids(path, recursive, limit, cursor))
+        )
+
+
+class FileIdPushHandler(JupyterHandler, websocket.WebSocketHandler):
+    """A websocket handler that pushes changes of file paths to the client.
+    Clients send messages of the form `{"action": "subscribe", "ids": [...],
+    "prefixes": [...]}`, or with the action "unsubscribe", and receive
+    `{"changes": [{"id": ..., "old_path": ..., "path": ...}, ...]}`
+    notifications for the file IDs and API path prefixes subscribed to."""
+
+    auth_resource = "contents"
+
+    @property
+    def publisher(self) -> Optional[ChangePublisher]:
+        return self.settings.get("file_id_publisher")
+
+    async def pre_get(self) -> None:
+        user = self.current_user
+        if user is None:
+            raise web.HTTPError(403)
+        authorized = await ensure_async(
+            self.authorizer.is_authorized(self, user, "read", self.auth_resource)
+        )
+        if not authorized:
+            raise web.HTTPError(403)
+        if self.publisher is None:
+            raise web.HTTPError(
+                501,
+                log_message=(
+                    f"{self.settings['file_id_manager'].__class__.__name__} "
+                    "does not record changes."
+                ),
+            )
+
+    async def get(self, *args: Any, **kwargs: Any) -> None:
+        await self.pre_get()
+        await super().get(*args, **kwargs)
+
+    def open(self, *args: Any, **kwargs: Any) -> None:
+        self.subscription = Subscription(self.send)
+
+    def send(self, message: Dict[str, Any]) -> None:
+        try:
+            self.write_message(json_encode(message))
+        except websocket.WebSocketClosedError:
+            self.on_close()
+
+    def on_message(self, message: Any) -> None:
+        assert self.publisher is not None
+        try:
+            data = json.loads(message)
+            action = data["action"]
+            ids = [str(id) for id in data.get("ids", [])]
+            prefixes = [str(prefix) for prefix in data.get("prefixes", [])]
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.send({"error": "Invalid message."})
+            return
+        if action == "subscribe":
+            self.publisher.subscribe(self.subscription, ids, prefixes)
+        elif action == "unsubscribe":
+            self.publisher.unsubscribe(self.subscription, ids, prefixes)
+        else:
+            self.send({"error": f"Unknown action: {action}."})
+
+    def on_close(self) -> None:
+        if self.publisher is not None and hasattr(self, "subscription"):
+            self.publisher.unsubscribe(self.subscription)
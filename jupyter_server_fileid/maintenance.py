@@ -0,0 +1,156 @@
+import time
+from typing import Any, Dict, Optional
+
+from traitlets import Bool, Float, Instance, Int, TraitError, validate
+from traitlets.config.configurable import LoggingConfigurable
+
+from .manager import BaseFileIdManager, LocalFileIdManager
+
+
+class MaintenanceScheduler(LoggingConfigurable):
+    """
+    Runs maintenance tasks on the database of a File ID manager while the
+    manager is idle, i.e. once no operation has ended for `idle_threshold`
+    seconds. `tick()` is called every `check_interval` seconds by the File ID
+    extension on the server IOLoop. The tasks are:
+
+    - `wal_checkpoint`: writes the write-ahead log back to the database and
+    truncates it, once it is larger than `wal_checkpoint_threshold` bytes.
+
+    - `ino_filter`: rebuilds the inode number filter of a `LocalFileIdManager`
+    in steps of `LocalFileIdManager.INO_FILTER_BATCH_SIZE` records, once it
+    holds more inode numbers than it was sized for.
+
+    - `optimize`: refreshes the statistics of the query planner every
+    `optimize_interval` seconds.
+
+    - `vacuum`: returns the space of deleted records to the filesystem every
+    `vacuum_interval` seconds, if `vacuum` is enabled. Each vacuum frees at
+    most `SqliteFileIdStore.vacuum_pages` pages, and is continued on the next
+    idle tick until no free pages remain.
+
+    Notes
+    -----
+    - Each tick runs at most one task, and each task does a bounded amount of
+    work without waiting for locks, such that a lookup arriving during
+    maintenance is delayed by at most a single task.
+
+    - Managers without a storage backend, like `HashMapFileIdManager`, are
+    not maintained.
+    """
+
+    manager = Instance(
+        klass=BaseFileIdManager,  # type: ignore[type-abstract]
+        help="The File ID manager to maintain.",
+    )
+
+    enabled = Bool(
+        default_value=True,
+        help="Whether to run maintenance tasks while the File ID manager is idle.",
+        config=True,
+    )
+
+    check_interval = Float(
+        default_value=5.0,
+        help="Interval in seconds at which the File ID manager is checked for idleness.",
+        config=True,
+    )
+
+    idle_threshold = Float(
+        default_value=10.0,
+        help=(
+            "Time in seconds since the last File ID manager operation after "
+            "which the manager is considered idle."
+        ),
+        config=True,
+    )
+
+    wal_checkpoint_threshold = Int(
+        default_value=4 * 1024 * 1024,
+        help=(
+            "Size in bytes of the write-ahead log above which it is "
+            "checkpointed and truncated."
+        ),
+        config=True,
+    )
+
+    optimize_interval = Float(
+        default_value=3600.0,
+        help="Minimum interval in seconds between refreshes of query planner statistics.",
+        config=True,
+    )
+
+    vacuum = Bool(
+        default_value=False,
+        help="Whether to return the space of deleted records to the filesystem.",
+        config=True,
+    )
+
+    vacuum_interval = Float(
+        default_value=3600.0,
+        help="Minimum interval in seconds between vacuums, if `vacuum` is enabled.",
+        config=True,
+    )
+
+    @validate(
+        "check_interval", "idle_threshold", "optimize_interval", "vacuum_interval"
+    )
+    def _validate_interval(self, proposal: Dict[str, Any]) -> float:
+        if proposal["value"] <= 0:
+            raise TraitError(
+                f"MaintenanceScheduler : {proposal['trait'].name} must be positive."
+            )
+        return proposal["value"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        # monotonic times at which each periodic task last ran. statistics are
+        # refreshed on the first idle tick.
+        self._last_optimize = -self.optimize_interval
+        self._last_vacuum = time.monotonic()
+
+    def _due_task(self, now: float) -> Optional[str]:
+        """Returns the name of the next task that is due, if any."""
+        if self.manager.disk_usage()[1] > self.wal_checkpoint_threshold:
+            return "wal_checkpoint"
+        manager = self.manager
+        if isinstance(manager, LocalFileIdManager) and manager.ino_filter_full():
+            return "ino_filter"
+        if now - self._last_optimize >= self.optimize_interval:
+            return "optimize"
+        if self.vacuum and now - self._last_vacuum >= self.vacuum_interval:
+            return "vacuum"
+        return None
+
+    def tick(self) -> Optional[str]:
+        """Runs the next due maintenance task if the File ID manager is idle.
+        Returns the name of the task run, if any."""
+        store = getattr(self.manager, "store", None)
+        now = time.monotonic()
+        if store is None or now - self.manager._last_operation < self.idle_threshold:
+            return None
+
+        task = self._due_task(now)
+        if task is None:
+            return None
+
+        start = time.perf_counter()
+        if task == "wal_checkpoint":
+            if not store.wal_checkpoint():
+                self.log.debug(
+                    "MaintenanceScheduler : WAL checkpoint blocked by another "
+                    "connection, retrying on the next tick."
+                )
+        elif task == "ino_filter":
+            assert isinstance(self.manager, LocalFileIdManager)
+            self.manager.rebuild_ino_filter()
+        elif task == "optimize":
+            store.optimize()
+            self._last_optimize = now
+        elif task == "vacuum" and store.vacuum():
+            self._last_vacuum = now
+        self.log.debug(
+            f"MaintenanceScheduler : Ran {task} in "
+            f"{(time.perf_counter() - start) * 1e3:.1f} ms."
+        )
+        return task
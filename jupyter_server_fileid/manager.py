@@ -1,18 +1,60 @@
+import functools
+import json
 import os
 import posixpath
 import sqlite3
 import stat
+import threading
 import time
 import uuid
 from abc import ABC, ABCMeta, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
 from sqlite3 import Connection
-from typing import Any, Callable, Dict, Optional, TypeVar
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from jupyter_core.paths import jupyter_data_dir
-from traitlets import TraitError, Unicode, default, validate
+from jupyter_events.logger import EventLogger
+from traitlets import (
+    Bool,
+    Float,
+    Instance,
+    Int,
+    TraitError,
+    Type,
+    Unicode,
+    default,
+    validate,
+)
 from traitlets.config.configurable import LoggingConfigurable
 from traitlets.traitlets import MetaHasTraits
 
+from .bloom import BloomFilter
+from .metrics import (
+    FILEID_PATH_CACHE,
+    FILEID_SYNC_DIRS_VISITED,
+    FILEID_SYNC_FILES_REIDENTIFIED,
+    FILEID_SYNC_RUNS,
+    observe,
+)
+from .storage import BaseFileIdStore, FileRecord, SqliteFileIdStore
+from .tracing import OperationTracer
+from .transfer import read_records, write_records
+
 F = TypeVar("F", bound=Callable[..., Any])
 
 
@@ -24,7 +66,63 @@ class StatStruct:
     is_symlink: bool
 
 
+class ReindexStats(NamedTuple):
+    """Statistics of an offline reindex by `LocalFileIdManager.reindex()`."""
+
+    # number of files and directories indexed
+    files: int
+    # number of directories indexed
+    dirs: int
+    # number of records created
+    created: int
+    duration: float
+
+    @property
+    def throughput(self) -> float:
+        """Indexed files and directories per second."""
+        return self.files / self.duration if self.duration else 0.0
+
+
+class CheckReport(NamedTuple):
+    """Drift between the records of a `LocalFileIdManager` and the filesystem,
+    as found by `LocalFileIdManager.check()`. Paths are API paths."""
+
+    # number of records checked
+    records: int
+    # paths of records of files that no longer exist at their path
+    stale: List[str]
+    # paths held by more than one record
+    duplicates: List[str]
+    # paths of directories without a record
+    missing_dirs: List[str]
+    # paths of records whose file has the inode number of another record,
+    # i.e. files moved out of band whose records have not been synced
+    ino_collisions: List[str]
+    # paths of records whose file has the same inode number but a different
+    # creation time, i.e. files replaced by a file reusing the inode number
+    crtime_mismatches: List[str]
+    duration: float
+    # number of records fixed, if repaired
+    repaired: int = 0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the records match the filesystem."""
+        return not (
+            self.stale
+            or self.duplicates
+            or self.missing_dirs
+            or self.ino_collisions
+            or self.crtime_mismatches
+        )
+
+
 default_db_path = os.path.join(jupyter_data_dir(), "file_id_manager.db")
+default_log_path = os.path.join(jupyter_data_dir(), "file_id_manager.log")
+
+EVENT_SCHEMA_ID = "https://events.jupyter.org/jupyter_server_fileid/fileid/v1"
+# jupyter_events requires schema paths to be wrapped in a Path
+EVENT_SCHEMA_PATH = Path(__file__).parent / "event_schemas" / "fileid" / "v1.yaml"
 
 
 def log(
@@ -56,8 +154,6 @@ class BaseFileIdManager(ABC, LoggingConfigurable, metaclass=FileIdManagerMeta):
     managers should inherit from this class.
     """
 
-    con: Connection
-
     root_dir = Unicode(
         help="The root directory being served by Jupyter server.",
         config=False,
@@ -101,6 +197,407 @@ class BaseFileIdManager(ABC, LoggingConfigurable, metaclass=FileIdManagerMeta):
             )
         return candidate_value.upper()
 
+    db_in_memory = Bool(
+        default_value=False,
+        help=(
+            "Whether to load the database at `db_path` into memory on startup and "
+            "serve all operations from the in-memory copy. The in-memory database "
+            "is written back to `db_path` every `db_checkpoint_interval` seconds "
+            "while the server is running, and once more when the manager is "
+            "cleaned up. Changes made since the last checkpoint are lost if the "
+            "process exits uncleanly. Has no effect if `db_path` is ':memory:'."
+        ),
+        config=True,
+    )
+
+    CHECKPOINT_INTERVAL_BOUNDS = (1.0, 3600.0)
+    db_checkpoint_interval = Float(
+        default_value=30.0,
+        help=(
+            "Interval in seconds at which the in-memory database is written back "
+            "to `db_path` when `db_in_memory` is enabled. This bounds the window "
+            "of changes that may be lost on an unclean exit. Must be between "
+            f"{CHECKPOINT_INTERVAL_BOUNDS[0]:g} and {CHECKPOINT_INTERVAL_BOUNDS[1]:g}."
+        ),
+        config=True,
+    )
+
+    @validate("db_checkpoint_interval")
+    def _validate_db_checkpoint_interval(self, proposal: Dict[str, Any]) -> float:
+        value = proposal["value"]
+        low, high = self.CHECKPOINT_INTERVAL_BOUNDS
+        if not low <= value <= high:
+            raise TraitError(
+                f"db_checkpoint_interval ({value}) must be between {low:g} and {high:g}."
+            )
+        return value
+
+    store_class = Type(
+        default_value=SqliteFileIdStore,
+        klass=BaseFileIdStore,
+        help=(
+            "The storage backend class used by SQLite-backed File ID managers to "
+            "persist file records. Defaults to SqliteFileIdStore."
+        ),
+        config=True,
+    )
+
+    slow_operation_threshold = Float(
+        default_value=None,
+        allow_none=True,
+        help=(
+            "Enables tracing of File ID manager operations if set. Operations "
+            "that take longer than this many seconds are logged to WARNING, "
+            "along with the number of SQL statements and stat calls they "
+            "performed and the time spent in the database and in the "
+            "filesystem. Set to 0 to log all operations. Disabled if None."
+        ),
+        config=True,
+    )
+
+    event_logger = Instance(
+        klass=EventLogger,
+        allow_none=True,
+        help=(
+            "The event logger through which changes of file IDs are emitted, "
+            "with the schema at `EVENT_SCHEMA_PATH`, which must be registered "
+            "with it. Set by the File ID extension to the event logger of the "
+            "server. Disabled if None."
+        ),
+    )
+
+    lazy_copy = Bool(
+        default_value=False,
+        help=(
+            "Whether copies of directories only record a mapping from the copy "
+            "to its source, rather than a record for each indexed file below "
+            "the source. Files below the copy are then given a file ID when "
+            "first indexed or looked up with get_id(), and the remaining ones "
+            "when records are exported. Copies are eager with storage backends "
+            "that do not support lazy copies."
+        ),
+        config=True,
+    )
+
+    store: BaseFileIdStore
+
+    _tracer: Optional[OperationTracer] = None
+
+    # time at which the last operation ended, as returned by `time.monotonic()`.
+    # updated by the `observe()` decorator.
+    _last_operation = 0.0
+
+    # separator of the persisted paths
+    _sep = "/"
+
+    # number of records written per batch by `import_records()`
+    IMPORT_BATCH_SIZE = 10000
+
+    def _init_tracing(self) -> None:
+        """Installs an `OperationTracer` if `slow_operation_threshold` is set.
+        Must be called once the storage backend is initialized."""
+        if self.slow_operation_threshold is not None:
+            self._tracer = OperationTracer(self, self.slow_operation_threshold)
+
+    def _init_store(self, stat_info: bool, root_dir: str) -> None:
+        """Initializes the storage backend at `db_path`. Records hold the stat
+        info of each file if `stat_info` is True. `root_dir` is the normalized
+        root directory, which prefixes all persisted paths."""
+        # forward SQLite settings to storage backends that accept them
+        kwargs: Dict[str, Any] = {
+            name: getattr(self, name)
+            for name in ("db_journal_mode", "db_in_memory")
+            if name in self.store_class.class_trait_names()
+        }
+        # store_class is validated to be a subclass of BaseFileIdStore, which
+        # is abstract, so type it as a factory of storage backends.
+        store_class = cast(Callable[..., BaseFileIdStore], self.store_class)
+        # pass config rather than parent to avoid a reference cycle, which
+        # would delay cleanup of the manager until the next garbage collection.
+        self.store = store_class(
+            config=self.config,
+            log=self.log,
+            db_path=self.db_path,
+            root_dir=root_dir,
+            stat_info=stat_info,
+            **kwargs,
+        )
+        self._init_tracing()
+
+    @property
+    def con(self) -> Connection:
+        """The connection to the (main) SQLite database of the storage backend.
+        Raises an AttributeError if the manager is not backed by SQLite."""
+        con = getattr(getattr(self, "store", None), "con", None)
+        if isinstance(con, Connection):
+            return con
+        raise AttributeError(
+            f"{self.__class__.__name__} is not backed by a SQLite database."
+        )
+
+    def checkpoint(self) -> None:
+        """Persists any state the storage backend holds only in memory, e.g.
+        writes the in-memory database back to `db_path` if `db_in_memory` is
+        enabled."""
+        if hasattr(self, "store"):
+            self.store.checkpoint()
+
+    def close(self) -> None:
+        """Closes the files held open by the manager outside of its storage
+        backend, after which the manager must not be used. Called by the File
+        ID extension when it stops. Does nothing by default."""
+
+    def count(self) -> int:
+        """Returns the number of file records, including records of deleted
+        files that have not yet been removed."""
+        return self.store.count()
+
+    def disk_usage(self) -> Tuple[int, int]:
+        """Returns the sizes in bytes of the database and of its write-ahead
+        log."""
+        return self.store.disk_usage()
+
+    def count_dirs(self) -> Optional[int]:
+        """Returns the number of directory records, or None if the manager does
+        not track which files are directories."""
+        if not self.store.stat_info:
+            return None
+        return self.store.count_dirs()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns statistics on the records and the database of the manager,
+        as served by `GET /api/fileid/stats`. Statistics that do not apply to
+        the manager are None."""
+        db_size, wal_size = self.disk_usage()
+        try:
+            (journal_mode,) = self.con.execute("PRAGMA journal_mode").fetchone()
+            journal_mode = journal_mode.upper()
+        except AttributeError:
+            journal_mode = None
+        return {
+            "manager": self.__class__.__name__,
+            "records": self.count(),
+            "dirs": self.count_dirs(),
+            "db_size": db_size,
+            "wal_size": wal_size,
+            "journal_mode": journal_mode,
+            "sync": None,
+            "path_cache": None,
+            "ino_filter": None,
+        }
+
+    def get_changes(
+        self, since: Optional[int] = None, limit: int = 1000
+    ) -> Optional[Dict[str, Any]]:
+        """Returns the changes of file paths following the cursor `since`, as
+        served by `GET /api/fileid/changes`: a dictionary of `changes`, mapping
+        each file ID changed to its current API path, or None if its record
+        was deleted or moved out of root_dir; the `cursor` to pass as `since`
+        to get the following changes; and whether `more` changes follow.
+
+        At most `limit` changes are read from the change log, and changes of
+        the same file ID are coalesced. If `since` is None, no changes are
+        returned, only the current cursor. Returns None if the changes
+        following `since` are no longer retained, in which case clients must
+        start over. Raises a NotImplementedError if the storage backend does
+        not record changes."""
+        if since is None:
+            return {"changes": {}, "cursor": self.store.last_change(), "more": False}
+        rows = self.store.get_changes(since, limit)
+        if rows is None:
+            return None
+        changes = {id: self._from_normalized_path(path) for _, id, _, path in rows}
+        return {
+            "changes": changes,
+            "cursor": rows[-1][0] if rows else since,
+            "more": len(rows) == limit,
+        }
+
+    def _list_children(
+        self, path: str, recursive: bool, after: Optional[str], limit: int
+    ) -> List[FileRecord]:
+        """Returns up to `limit` records below the persisted directory `path`,
+        ordered by path and following the persisted path `after` if given. See
+        `BaseFileIdStore.list_children()`."""
+        return self.store.list_children(path, self._sep, recursive, after, limit)
+
+    def list_ids(
+        self,
+        dir_path: str,
+        recursive: bool = False,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Returns the indexed files in the directory at API path `dir_path`, or
+        in its entire subtree if `recursive`, as served by `GET
+        /api/fileid/list`: a list of up to `limit` `files` ordered by path, each
+        a dictionary of its `id`, its API `path`, and whether it `is_dir`, which
+        is None if the manager does not track directories; and the `cursor` to
+        pass to get the following files, or None if there are none.
+
+        Files are read from a range scan of the index on paths, which resumes
+        after the path of the cursor, such that pages are consistent even if
+        files are indexed in between."""
+        # the root directory may normalize with a trailing separator
+        path = self._normalize_path(dir_path)
+        if len(path) > 1:
+            path = path.rstrip(self._sep)
+        after = None if cursor is None else self._normalize_path(cursor)
+        records = self._list_children(path, recursive, after, limit + 1)
+        stat_info = hasattr(self, "store") and self.store.stat_info
+        files = [
+            {
+                "id": record.id,
+                "path": self._from_normalized_path(record.path),
+                "is_dir": bool(record.is_dir) if stat_info else None,
+            }
+            for record in records[:limit]
+        ]
+        more = len(records) > limit
+        return {"files": files, "cursor": files[-1]["path"] if more else None}
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, str]]:
+        """Returns up to `limit` files whose API path contains `query`, ignoring
+        case, as served by `GET /api/fileid/search`. Each file is a dictionary
+        of its `id` and `path`, best matches first. Queries shorter than three
+        characters only match the start of file names. Raises a
+        NotImplementedError if the storage backend does not maintain a search
+        index."""
+        results = []
+        for record in self.store.search(query, limit):
+            path = self._from_normalized_path(record.path)
+            if path is not None:
+                results.append({"id": record.id, "path": path})
+        return results
+
+    def _export_header(self) -> Dict[str, Any]:
+        """Returns the header of exports, which describes the format of the
+        exported paths and records."""
+        return {
+            "manager": self.__class__.__name__,
+            "root_dir": self.store.root_dir,
+            "sep": self._sep,
+            "stat_info": self.store.stat_info,
+        }
+
+    def _dump_records(self) -> Iterator[FileRecord]:
+        """Returns an iterator over all records to export."""
+        return self.store.dump()
+
+    def export_records(self, file: IO[bytes], format: str = "ndjson") -> int:
+        """Writes all records to `file` in `format`, which is either "ndjson" or
+        "binary" as described in the `transfer` module. Lazy copies are
+        materialized first. Records are read from a consistent snapshot where
+        the storage backend supports it. Returns the number of records
+        exported."""
+        self.materialize_copies()
+        count = write_records(file, self._export_header(), self._dump_records(), format)
+        self.log.info(f"{self.__class__.__name__} : Exported {count} records.")
+        return count
+
+    def _path_rewriter(self, root_dir: str, sep: str) -> Callable[[str], Optional[str]]:
+        """Returns a function that accepts a path exported from a manager with
+        root directory `root_dir` and separator `sep`, and returns the
+        corresponding persisted path under the root directory of this manager,
+        or None if the path is not relative to `root_dir`."""
+        root_dir = root_dir.rstrip(sep)
+        # exported paths are already normalized, so if they share the separator
+        # of this manager, only their root directory needs to be replaced.
+        prefix = self._normalize_path("_")[:-1] if sep == self._sep else None
+
+        def rewrite(path: str) -> Optional[str]:
+            if path == root_dir:
+                return self._normalize_path("")
+            if root_dir and not path.startswith(root_dir + sep):
+                return None
+            relpath = path[len(root_dir) :].lstrip(sep)
+            if prefix is not None:
+                return prefix + relpath
+            return self._normalize_path(relpath.replace(sep, "/"))
+
+        return rewrite
+
+    def _import_record(self, record: FileRecord) -> Optional[FileRecord]:
+        """Returns the record to write for an imported record whose path has
+        been rewritten, or None to skip it."""
+        return FileRecord(record.id, record.path)
+
+    def _import_batches(self, batches: Iterator[List[FileRecord]]) -> None:
+        """Writes batches of imported records in a single transaction,
+        replacing any conflicting records."""
+        with self.store.transaction():
+            for batch in batches:
+                self.store.replace_many(batch)
+
+    def import_records(self, file: IO[bytes], root_dir: Optional[str] = None) -> int:
+        """
+        Reads records exported by `export_records()` from `file` and writes
+        them to this manager, replacing any existing records with the same file
+        ID or path. Paths under the root directory of the exporting manager,
+        or under `root_dir` if given, are rewritten to the same relative path
+        under the root directory of this manager; records of other paths are
+        skipped. Returns the number of records imported.
+
+        Notes
+        -----
+        Records are read and written in batches of `IMPORT_BATCH_SIZE` within
+        a single transaction, such that the import completes entirely or not
+        at all, with memory bounded by the batch size.
+        """
+        header, records = read_records(file)
+        if root_dir is None:
+            root_dir = header["root_dir"]
+        rewrite = self._path_rewriter(root_dir, header.get("sep", "/"))
+        imported = skipped = 0
+
+        def batches() -> Iterator[List[FileRecord]]:
+            nonlocal imported, skipped
+            batch: List[FileRecord] = []
+            for record in records:
+                path = rewrite(record.path)
+                rewritten = None
+                if path is not None:
+                    rewritten = self._import_record(record._replace(path=path))
+                if rewritten is None:
+                    skipped += 1
+                    continue
+                batch.append(rewritten)
+                if len(batch) >= self.IMPORT_BATCH_SIZE:
+                    imported += len(batch)
+                    yield batch
+                    batch = []
+            if batch:
+                imported += len(batch)
+                yield batch
+
+        self._import_batches(batches())
+        self.log.info(
+            f"{self.__class__.__name__} : Imported {imported} records, skipped "
+            f"{skipped} records."
+        )
+        return imported
+
+    def _emit(
+        self,
+        action: str,
+        id: Optional[str],
+        old_path: Optional[str],
+        new_path: Optional[str],
+    ) -> None:
+        """Emits a change of file ID through `event_logger`, if any. Paths are
+        API paths."""
+        if self.event_logger is None:
+            return
+        self.event_logger.emit(
+            schema_id=EVENT_SCHEMA_ID,
+            data={
+                "action": action,
+                "id": id,
+                "old_path": old_path,
+                "new_path": new_path,
+            },
+        )
+
     @staticmethod
     def _uuid() -> str:
         return str(uuid.uuid4())
@@ -122,44 +619,137 @@ class BaseFileIdManager(ABC, LoggingConfigurable, metaclass=FileIdManagerMeta):
         self, old_path: str, new_path: str, path_mgr: Any = os.path
     ) -> None:
         """Move all children of a given directory at `old_path` to a new
-        directory at `new_path`, delimited by `sep`."""
-        old_path_glob = old_path + path_mgr.sep + "*"
-        records = self.con.execute(
-            "SELECT id, path FROM Files WHERE path GLOB ?", (old_path_glob,)
-        ).fetchall()
-
-        for record in records:
-            id, old_recpath = record
-            new_recpath = path_mgr.join(
-                new_path, path_mgr.relpath(old_recpath, start=old_path)
-            )
-            self.con.execute(
-                "UPDATE Files SET path = ? WHERE id = ?", (new_recpath, id)
-            )
+        directory at `new_path`, delimited by `sep`, along with the lazy copies
+        at or below it and of it."""
+        self.store.move_children(old_path, new_path, path_mgr.sep)
+        self.store.move_copies(old_path, new_path, path_mgr.sep)
 
     def _copy_recursive(
         self, from_path: str, to_path: str, path_mgr: Any = os.path
     ) -> None:
         """Copy all children of a given directory at `from_path` to a new
         directory at `to_path`, delimited by `sep`."""
-        from_path_glob = from_path + path_mgr.sep + "*"
-        records = self.con.execute(
-            "SELECT path FROM Files WHERE path GLOB ?", (from_path_glob,)
-        ).fetchall()
-
-        for record in records:
-            (from_recpath,) = record
-            to_recpath = path_mgr.join(
-                to_path, path_mgr.relpath(from_recpath, start=from_path)
-            )
-            self.con.execute(
-                "INSERT INTO Files (id, path) VALUES (?, ?)", (self._uuid(), to_recpath)
+        records = self.store.get_children(from_path, path_mgr.sep)
+        self.store.insert_many(
+            FileRecord(self.store.new_id(to_recpath), to_recpath)
+            for to_recpath in (
+                to_path + record.path[len(from_path) :] for record in records
             )
+        )
 
     def _delete_recursive(self, path: str, path_mgr: Any = os.path) -> None:
         """Delete all children of a given directory, delimited by `sep`."""
-        path_glob = path + path_mgr.sep + "*"
-        self.con.execute("DELETE FROM Files WHERE path GLOB ?", (path_glob,))
+        self.store.delete_children(path, path_mgr.sep)
+
+    def _copy_lazily(self, from_path: str, to_path: str) -> bool:
+        """Records the directory at `to_path` as a lazy copy of the directory
+        at `from_path`, if `lazy_copy` is enabled, the storage backend supports
+        it, and `from_path` has indexed children. Returns whether it did, in
+        which case the children must not be copied."""
+        if not self.lazy_copy:
+            return False
+        if not self.store.list_children(from_path, self._sep, True, None, 1):
+            return False
+        # lazy copies left by a previous directory at `to_path`
+        self.store.delete_copies(to_path, self._sep)
+        try:
+            self.store.insert_copy(to_path, from_path)
+        except NotImplementedError:
+            return False
+        return True
+
+    def _copy_source(self, path: str) -> Optional[str]:
+        """Returns the persisted path of the indexed file that the file at the
+        persisted `path` is a lazy copy of, following lazy copies of lazy
+        copies. Returns None if there is none."""
+        seen = set()
+        while True:
+            copy = self.store.get_copy(path, self._sep)
+            if copy is None or copy[0] in seen:
+                return None
+            copy_path, source = copy
+            seen.add(copy_path)
+            path = source + path[len(copy_path) :]
+            if self.store.get_by_path(path) is not None:
+                return path
+
+    def _create_copied(self, path: str) -> Optional[str]:
+        """Creates the record of the file at the persisted `path` below a lazy
+        copy, within the current transaction. Returns its file ID, or None if
+        the file cannot be indexed."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support lazy copies."
+        )
+
+    def _materialize(self, path: str) -> Optional[str]:
+        """Creates the record of the file at the persisted `path` if it is a
+        lazy copy of an indexed file. Returns its file ID, or None if it is
+        not."""
+        if self._copy_source(path) is None:
+            return None
+        with self.store.transaction():
+            return self._create_copied(path)
+
+    def _materialize_copy(self, path: str, source: str, pending: Dict[str, str]) -> int:
+        """Creates the records of the files below the lazy copy at `path` of the
+        directory at `source`, and removes the lazy copy. The lazy copies in
+        `pending` that files below `source` belong to are materialized first,
+        and materialized copies are removed from `pending`. Returns the number
+        of records created."""
+        sep = self._sep
+        pending.pop(path, None)
+        count = 0
+        for other_path, other_source in list(pending.items()):
+            if other_path not in pending:
+                continue
+            if (source + sep).startswith(other_path + sep) or other_path.startswith(
+                source + sep
+            ):
+                count += self._materialize_copy(other_path, other_source, pending)
+        for record in self.store.get_children(source, sep):
+            child_path = path + record.path[len(source) :]
+            if self.store.get_by_path(child_path) is not None:
+                continue
+            if self._create_copied(child_path) is not None:
+                count += 1
+        self.store.delete_copy(path)
+        return count
+
+    def _delete_copies(self, path: str) -> None:
+        """Removes the lazy copies at or below the persisted `path`, which is
+        being deleted. Lazy copies of directories at or below `path` elsewhere
+        are materialized first, since their sources are deleted with it."""
+        pending = dict(self.store.get_copies())
+        if not pending:
+            return
+        prefix = path + self._sep
+        for copy_path, source in list(pending.items()):
+            if copy_path not in pending:
+                continue
+            if (source + self._sep).startswith(prefix) and not (
+                copy_path + self._sep
+            ).startswith(prefix):
+                self._materialize_copy(copy_path, source, pending)
+        self.store.delete_copies(path, self._sep)
+
+    def materialize_copies(self) -> int:
+        """Creates the records of all files below lazy copies that have not
+        been given a file ID yet, and removes the lazy copies, e.g. before
+        exporting records. Returns the number of records created."""
+        if not hasattr(self, "store"):
+            return 0
+        with self.store.transaction():
+            pending = dict(self.store.get_copies())
+            count = 0
+            while pending:
+                path, source = next(iter(pending.items()))
+                count += self._materialize_copy(path, source, pending)
+        if count:
+            self.log.info(
+                f"{self.__class__.__name__} : Materialized {count} records of "
+                "lazy copies."
+            )
+        return count
 
     @abstractmethod
     def index(self, path: str) -> Optional[str]:
@@ -281,23 +871,14 @@ class ArbitraryFileIdManager(BaseFileIdManager):
         self.log.info(
             f"ArbitraryFileIdManager : Configured database path: {self.db_path}"
         )
-        self.con = sqlite3.connect(self.db_path)
         self.log.info(
-            "ArbitraryFileIdManager : Successfully connected to database file."
+            f"ArbitraryFileIdManager : Connecting to database with "
+            f"{self.store_class.__name__} and journal_mode = {self.db_journal_mode}"
         )
+        self._init_store(stat_info=False, root_dir=self.root_dir or "")
         self.log.info(
-            f"ArbitraryFileIdManager : Creating File ID tables and indices with "
-            f"journal_mode = {self.db_journal_mode}"
-        )
-        self.con.execute(f"PRAGMA journal_mode = {self.db_journal_mode}")
-        self.con.execute(
-            "CREATE TABLE IF NOT EXISTS Files("
-            "id TEXT PRIMARY KEY NOT NULL, "
-            "path TEXT NOT NULL UNIQUE"
-            ")"
+            "ArbitraryFileIdManager : Successfully connected to database file."
         )
-        self.con.execute("CREATE INDEX IF NOT EXISTS ix_Files_path ON Files (path)")
-        self.con.commit()
 
     @staticmethod
     def _normalize_separators(path: str) -> str:
@@ -338,72 +919,83 @@ class ArbitraryFileIdManager(BaseFileIdManager):
 
     def _create(self, path: str) -> str:
         path = self._normalize_path(path)
-        row = self.con.execute(
-            "SELECT id FROM Files WHERE path = ?", (path,)
-        ).fetchone()
-        existing_id: Optional[str] = row and row[0]
+        record = self.store.get_by_path(path)
 
-        if existing_id:
-            return existing_id
+        if record:
+            return record.id
 
-        id = self._uuid()
-        self.con.execute("INSERT INTO Files (id, path) VALUES (?, ?)", (id, path))
+        id = self.store.new_id(path)
+        self.store.insert(FileRecord(id, path))
         return id
 
+    def _create_copied(self, path: str) -> Optional[str]:
+        return self._create(path)
+
+    @observe("index")
     def index(self, path: str) -> str:
         # create new record
-        with self.con:
+        with self.store.transaction():
             id = self._create(path)
             return id
 
+    @observe("get_id")
     def get_id(self, path: str) -> Optional[str]:
         path = self._normalize_path(path)
-        row = self.con.execute(
-            "SELECT id FROM Files WHERE path = ?", (path,)
-        ).fetchone()
-        return row and row[0]
+        record = self.store.get_by_path(path)
+        if record is None:
+            return self._materialize(path)
+        return record.id
 
+    @observe("get_path")
     def get_path(self, id: str) -> Optional[str]:
-        row = self.con.execute("SELECT path FROM Files WHERE id = ?", (id,)).fetchone()
-        path = row and row[0]
-        return self._from_normalized_path(path)
+        record = self.store.get(id)
+        return self._from_normalized_path(record and record.path)
 
+    @observe("move")
     def move(self, old_path: str, new_path: str) -> Optional[str]:
-        with self.con:
-            old_path = self._normalize_path(old_path)
-            new_path = self._normalize_path(new_path)
-            row = self.con.execute(
-                "SELECT id FROM Files WHERE path = ?", (old_path,)
-            ).fetchone()
-            id: Optional[str] = row and row[0]
+        with self.store.transaction():
+            old_recpath = self._normalize_path(old_path)
+            new_recpath = self._normalize_path(new_path)
+            record = self.store.get_by_path(old_recpath)
+            id: Optional[str] = record and record.id
 
             if id:
-                self.con.execute(
-                    "UPDATE Files SET path = ? WHERE path = ?", (new_path, old_path)
-                )
-                self._move_recursive(old_path, new_path, posixpath)
+                self.store.update(id, path=new_recpath)
+                self._move_recursive(old_recpath, new_recpath, posixpath)
             else:
-                id = self._create(new_path)
+                id = self._create(new_recpath)
 
-            return id
+        if record:
+            self._emit("move", id, old_path, new_path)
+        return id
 
+    @observe("copy")
     def copy(self, from_path: str, to_path: str) -> Optional[str]:
-        with self.con:
-            from_path = self._normalize_path(from_path)
-            to_path = self._normalize_path(to_path)
+        with self.store.transaction():
+            from_recpath = self._normalize_path(from_path)
+            to_recpath = self._normalize_path(to_path)
 
-            id = self._create(to_path)
-            self._copy_recursive(from_path, to_path, posixpath)
+            id = self._create(to_recpath)
+            if not self._copy_lazily(from_recpath, to_recpath):
+                self._copy_recursive(from_recpath, to_recpath, posixpath)
 
-            return id
+        self._emit("copy", id, from_path, to_path)
+        return id
 
+    @observe("delete")
     def delete(self, path: str) -> None:
-        with self.con:
-            path = self._normalize_path(path)
+        with self.store.transaction():
+            recpath = self._normalize_path(path)
+            # only looked up if the deletion is emitted
+            record = self.store.get_by_path(recpath) if self.event_logger else None
+
+            self._delete_copies(recpath)
+            self.store.delete_by_path(recpath)
+            self._delete_recursive(recpath, posixpath)
 
-            self.con.execute("DELETE FROM Files WHERE path = ?", (path,))
-            self._delete_recursive(path, posixpath)
+        self._emit("delete", record and record.id, path, None)
 
+    @observe("save")
     def save(self, path: str) -> None:
         return None
 
@@ -421,13 +1013,12 @@ class ArbitraryFileIdManager(BaseFileIdManager):
     def __del__(self) -> None:
         """Cleans up `ArbitraryFileIdManager` by committing any pending
         transactions and closing the connection."""
-        if hasattr(self, "con"):
+        if hasattr(self, "store"):
             # If garbage collection happens in a different thread than the thread where
             # the SQLite object was created, committing will fail anyway. We just ignore
             # the exception if this is the case.
             try:
-                self.con.commit()
-                self.con.close()
+                self.store.close()
             except sqlite3.ProgrammingError:
                 pass
 
@@ -441,13 +1032,88 @@ class LocalFileIdManager(BaseFileIdManager):
     Notes
     -----
     All private helper methods prefixed with an underscore (except `__init__()`)
-    do NOT commit their SQL statements in a transaction via `self.con.commit()`.
+    do NOT commit their writes in a transaction via `self.store.commit()`.
     This responsibility is delegated to the public method calling them to
     increase performance. Committing multiple SQL transactions in serial is much
     slower than committing a single SQL transaction wrapping all SQL statements
     performed during a method's procedure body.
     """
 
+    gc_interval = Float(
+        default_value=None,
+        allow_none=True,
+        help=(
+            "Interval in seconds at which the File ID extension runs a slice of "
+            "garbage collection via `collect_garbage()`, which removes the "
+            "records of files that no longer exist. Disabled if None."
+        ),
+        config=True,
+    )
+
+    gc_time_budget = Float(
+        default_value=0.01,
+        help=(
+            "Time in seconds after which a slice of garbage collection stops "
+            "checking records. The next slice resumes from the last record "
+            "checked."
+        ),
+        config=True,
+    )
+
+    index_on_startup = Bool(
+        default_value=True,
+        help=(
+            "Whether all directories under the root directory are indexed when "
+            "the manager is created. Disabled by offline tools like `jupyter "
+            "fileid check`, which must not write to the database before "
+            "reading it."
+        ),
+        config=True,
+    )
+
+    ino_filter = Bool(
+        default_value=False,
+        help=(
+            "Whether get_id() tests the inode number of a file against an "
+            "in-memory Bloom filter of the inode numbers of all records, such "
+            "that lookups of files that were never indexed are answered "
+            "without querying the database. The filter is built from the "
+            "database on startup, updated on every write of this manager, and "
+            "rebuilt by `MaintenanceScheduler` once it grows past its size, "
+            "so it must not be enabled if other processes write to the "
+            "database, e.g. when sharing a database between servers."
+        ),
+        config=True,
+    )
+
+    ino_filter_fp_rate = Float(
+        default_value=0.01,
+        help=(
+            "Target rate of false positives of the inode number filter, i.e. "
+            "the share of lookups of files that were never indexed that still "
+            "query the database. Lower rates take more memory, e.g. about 10 "
+            "bits per record at 0.01 and 15 bits per record at 0.001."
+        ),
+        config=True,
+    )
+
+    # number of records checked within a single transaction during garbage
+    # collection.
+    GC_BATCH_SIZE = 100
+
+    # number of records read at once by `check()`
+    CHECK_BATCH_SIZE = 1000
+
+    # minimum number of inode numbers the inode number filter is sized for
+    INO_FILTER_MIN_CAPACITY = 1024
+
+    # number of records read by each step of rebuilding the inode number filter
+    INO_FILTER_BATCH_SIZE = 10000
+
+    _sep = os.sep
+
+    _ino_filter: Optional[BloomFilter] = None
+
     @validate("root_dir")
     def _validate_root_dir(self, proposal: Dict[str, Any]) -> str:
         if proposal["value"] is None:
@@ -460,6 +1126,16 @@ class LocalFileIdManager(BaseFileIdManager):
             )
         return proposal["value"]
 
+    @validate("ino_filter_fp_rate")
+    def _validate_ino_filter_fp_rate(self, proposal: Dict[str, Any]) -> float:
+        value = proposal["value"]
+        if not 0 < value < 1:
+            raise TraitError(
+                f"LocalFileIdManager : ino_filter_fp_rate ({value}) must be "
+                "between 0 and 1."
+            )
+        return value
+
     @default("db_journal_mode")
     def _default_db_journal_mode(self) -> str:
         return "WAL"
@@ -470,33 +1146,43 @@ class LocalFileIdManager(BaseFileIdManager):
         # initialize instance attrs
         self._update_cursor = False
         self._last_sync = 0.0
+        self._last_sync_duration = 0.0
+        self._last_sync_dirs_visited = 0
+        self._last_sync_dirs_synced = 0
+        self._path_cache_hits = 0
+        self._path_cache_misses = 0
+        # files found at a new path by `_sync_file()`, whether during a sync or
+        # a lookup. only those found during syncs are exported as a metric.
+        self._files_reidentified = 0
+        # file ID of the last record checked by garbage collection
+        self._gc_cursor = ""
+        # lookups answered by the inode number filter, and lookups that passed
+        # the filter but found no record
+        self._ino_filter_negatives = 0
+        self._ino_filter_false_positives = 0
+        # filter being rebuilt by `rebuild_ino_filter()`, and the file ID of
+        # the last record added to it
+        self._ino_filter_next: Optional[BloomFilter] = None
+        self._ino_filter_cursor = ""
+        # whether lazy copies may exist, whose files are not in the filter
+        self._lazy_copies = False
         # initialize connection with db
         self.log.info(f"LocalFileIdManager : Configured root dir: {self.root_dir}")
         self.log.info(f"LocalFileIdManager : Configured database path: {self.db_path}")
-        self.con = sqlite3.connect(self.db_path)
-        self.log.info("LocalFileIdManager : Successfully connected to database file.")
         self.log.info(
-            f"LocalFileIdManager : Creating File ID tables and indices with "
-            f"journal_mode = {self.db_journal_mode}"
+            f"LocalFileIdManager : Connecting to database with "
+            f"{self.store_class.__name__} and journal_mode = {self.db_journal_mode}"
         )
-        self.con.execute(f"PRAGMA journal_mode = {self.db_journal_mode}")
-        self.con.execute(
-            "CREATE TABLE IF NOT EXISTS Files("
-            "id TEXT PRIMARY KEY NOT NULL, "
-            # uniqueness constraint relaxed here because we need to keep records
-            # of deleted files which may occupy same path
-            "path TEXT NOT NULL, "
-            "ino INTEGER NOT NULL UNIQUE, "
-            "crtime INTEGER, "
-            "mtime INTEGER NOT NULL, "
-            "is_dir TINYINT NOT NULL"
-            ")"
+        assert self.root_dir is not None  # Validated in _validate_root_dir
+        self._init_store(
+            stat_info=True, root_dir=os.path.normpath(os.path.normcase(self.root_dir))
         )
-        self._index_all()
-        # no need to index ino as it is autoindexed by sqlite via UNIQUE constraint
-        self.con.execute("CREATE INDEX IF NOT EXISTS ix_Files_path ON Files (path)")
-        self.con.execute("CREATE INDEX IF NOT EXISTS ix_Files_is_dir ON Files (is_dir)")
-        self.con.commit()
+        self.log.info("LocalFileIdManager : Successfully connected to database file.")
+        if self.ino_filter:
+            self._build_ino_filter()
+        if self.index_on_startup:
+            self._index_all()
+            self.store.commit()
 
     def _normalize_path(self, path: str) -> str:
         """Accepts an API path and returns a filesystem path, i.e. one prefixed by root_dir."""
@@ -527,6 +1213,119 @@ class LocalFileIdManager(BaseFileIdManager):
 
         return relpath
 
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["sync"] = {
+            "last_duration": self._last_sync_duration,
+            "last_dirs_visited": self._last_sync_dirs_visited,
+            "last_dirs_synced": self._last_sync_dirs_synced,
+            "seconds_since_last": (
+                time.time() - self._last_sync if self._last_sync else None
+            ),
+        }
+        stats["path_cache"] = {
+            "hits": self._path_cache_hits,
+            "misses": self._path_cache_misses,
+        }
+        ino_filter = self._ino_filter
+        if ino_filter is not None:
+            negatives = self._ino_filter_negatives
+            false_positives = self._ino_filter_false_positives
+            probes = negatives + false_positives
+            stats["ino_filter"] = {
+                "bytes": ino_filter.nbytes,
+                "entries": ino_filter.count,
+                "capacity": ino_filter.capacity,
+                "estimated_fp_rate": ino_filter.estimated_fp_rate,
+                "negatives": negatives,
+                "false_positives": false_positives,
+                "fp_rate": false_positives / probes if probes else None,
+            }
+        return stats
+
+    def _build_ino_filter(self) -> BloomFilter:
+        """Builds the inode number filter from all records, sized for twice as
+        many records such that it is rebuilt as the index doubles in size.
+        Rebuilding also drops the inode numbers of deleted records, which Bloom
+        filters cannot remove."""
+        capacity = max(2 * self.store.count(), self.INO_FILTER_MIN_CAPACITY)
+        ino_filter = BloomFilter(capacity, self.ino_filter_fp_rate)
+        for record in self.store.dump():
+            if record.ino is not None:
+                ino_filter.add(record.ino)
+        self._ino_filter = ino_filter
+        self._ino_filter_next = None
+        self._lazy_copies = bool(self.store.get_copies())
+        return ino_filter
+
+    def _filter_ino(self, ino: int) -> None:
+        """Adds `ino` to the inode number filter, if enabled. Must be called on
+        every write of an inode number to a record."""
+        if self._ino_filter is not None:
+            self._ino_filter.add(ino)
+        if self._ino_filter_next is not None:
+            self._ino_filter_next.add(ino)
+
+    def ino_filter_full(self) -> bool:
+        """Returns whether the inode number filter holds more inode numbers
+        than it was sized for, or is being rebuilt by
+        `rebuild_ino_filter()`."""
+        ino_filter = self._ino_filter
+        if ino_filter is None:
+            return False
+        return (
+            self._ino_filter_next is not None or ino_filter.count > ino_filter.capacity
+        )
+
+    def rebuild_ino_filter(self, limit: Optional[int] = None) -> bool:
+        """
+        Adds the inode numbers of the next `limit` records, in order of their
+        file ID, to a new inode number filter sized for twice as many records
+        as exist when the rebuild starts. Returns True once all records are
+        added and the new filter replaces the current one.
+
+        Notes
+        -----
+        - Lookups keep testing the current filter until it is replaced, while
+        writes update both filters, such that no lookup waits for the rebuild.
+
+        - `limit` defaults to `INO_FILTER_BATCH_SIZE`.
+        """
+        if self._ino_filter is None:
+            return True
+        if limit is None:
+            limit = self.INO_FILTER_BATCH_SIZE
+
+        ino_filter = self._ino_filter_next
+        if ino_filter is None:
+            capacity = max(2 * self.store.count(), self.INO_FILTER_MIN_CAPACITY)
+            ino_filter = BloomFilter(capacity, self.ino_filter_fp_rate)
+            self._ino_filter_next = ino_filter
+            self._ino_filter_cursor = ""
+
+        records = self.store.scan(self._ino_filter_cursor, limit)
+        for record in records:
+            if record.ino is not None:
+                ino_filter.add(record.ino)
+        if len(records) == limit:
+            self._ino_filter_cursor = records[-1].id
+            return False
+
+        self._ino_filter = ino_filter
+        self._ino_filter_next = None
+        self._lazy_copies = bool(self.store.get_copies())
+        return True
+
+    def _copy_lazily(self, from_path: str, to_path: str) -> bool:
+        copied = super()._copy_lazily(from_path, to_path)
+        self._lazy_copies = self._lazy_copies or copied
+        return copied
+
+    def _import_batches(self, batches: Iterator[List[FileRecord]]) -> None:
+        super()._import_batches(batches)
+        if self._ino_filter is not None:
+            self._build_ino_filter()
+
     def _index_all(self) -> None:
         """Recursively indexes all directories under the server root."""
         assert self.root_dir is not None  # Validated in _validate_root_dir
@@ -545,6 +1344,7 @@ class LocalFileIdManager(BaseFileIdManager):
                     if entry_stat is not None:
                         self._index_dir_recursively(entry.path, entry_stat)
 
+    @observe("sync_all")
     def _sync_all(self) -> None:
         """
         Syncs Files table with the filesystem and ensures that the correct path
@@ -569,39 +1369,54 @@ class LocalFileIdManager(BaseFileIdManager):
         self._update_cursor is set to True by _sync_file().
         """
         now = time.time()
-        cursor = self.con.execute("SELECT path, mtime FROM Files WHERE is_dir = 1")
+        start = time.perf_counter()
+        dirs_visited = dirs_synced = 0
+        files_reidentified = self._files_reidentified
+        cursor = self.store.get_dirs()
         self._update_cursor = False
-        dir = cursor.fetchone()
+        dir = next(cursor, None)
 
         while dir:
             path, old_mtime = dir
             stat_info = self._stat(path)
+            dirs_visited += 1
 
             # ignores directories that no longer exist
             if stat_info is None:
-                dir = cursor.fetchone()
+                dir = next(cursor, None)
                 continue
 
             new_mtime = stat_info.mtime
             dir_dirty = new_mtime != old_mtime
 
             if dir_dirty:
+                dirs_synced += 1
                 self._sync_dir(path)
                 # prefer index over _sync_file() as it ensures directory is
                 # stored back into the Files table in the case of `mtime`
                 # mismatch, which results in deleting the old record.
-                self.index(path, stat_info, commit=False)
+                id = self.index(path, stat_info, commit=False)
+                # store the new mtime, such that the directory is not synced
+                # again until it changes.
+                if id is not None:
+                    self._update(id, stat_info)
 
             # check if cursor should be updated
             if self._update_cursor:
                 self._update_cursor = False
-                cursor = self.con.execute(
-                    "SELECT path, mtime FROM Files WHERE is_dir = 1"
-                )
+                cursor = self.store.get_dirs()
 
-            dir = cursor.fetchone()
+            dir = next(cursor, None)
 
         self._last_sync = now
+        self._last_sync_duration = time.perf_counter() - start
+        self._last_sync_dirs_visited = dirs_visited
+        self._last_sync_dirs_synced = dirs_synced
+        FILEID_SYNC_RUNS.inc()
+        FILEID_SYNC_DIRS_VISITED.inc(dirs_visited)
+        FILEID_SYNC_FILES_REIDENTIFIED.inc(
+            self._files_reidentified - files_reidentified
+        )
 
     def _sync_dir(self, dir_path: str) -> None:
         """
@@ -662,30 +1477,362 @@ class LocalFileIdManager(BaseFileIdManager):
         if stat_info.is_symlink:
             return None
 
-        src = self.con.execute(
-            "SELECT id, path, crtime FROM Files WHERE ino = ?", (stat_info.ino,)
-        ).fetchone()
+        src = self.store.get_by_ino(stat_info.ino)
 
         # if ino is not in database, return None
         if src is None:
             return None
-        id, old_path, crtime = src
+        id, old_path, crtime = src.id, src.path, src.crtime
 
         # if timestamps don't match, delete existing record and return None
         if crtime != stat_info.crtime:
-            self.con.execute("DELETE FROM Files WHERE id = ?", (id,))
+            self.store.delete(id)
+            self._emit("delete", id, self._from_normalized_path(old_path), None)
             return None
 
         # otherwise update existing record with new path, moving any indexed
         # children if necessary. then return its id
         self._update(id, path=path)
+        if old_path == path:
+            return id
 
-        if stat_info.is_dir and old_path != path:
+        self._files_reidentified += 1
+        if stat_info.is_dir:
             self._move_recursive(old_path, path)
             self._update_cursor = True
-
+        self._emit(
+            "move",
+            id,
+            self._from_normalized_path(old_path),
+            self._from_normalized_path(path),
+        )
         return id
 
+    def _is_stale(self, record: FileRecord) -> bool:
+        """Returns whether `record` belongs to a file that no longer exists.
+
+        Notes
+        -----
+        A file that is missing from its recorded path may have been moved out
+        of band rather than deleted. Such files are re-identified by the next
+        `_sync_all()` only if the directory they were moved out of is indexed
+        and dirty, so their records are kept until it has been synced.
+        """
+        stat_info = self._stat(record.path)
+        if stat_info is not None and stat_info.ino == record.ino:
+            return False
+
+        parent_path = os.path.dirname(record.path)
+        parent_stat = self._stat(parent_path)
+        if parent_stat is None:
+            return True
+        parent = self.store.get_by_ino(parent_stat.ino)
+        return (
+            parent is None
+            or parent.path != parent_path
+            or parent.mtime == parent_stat.mtime
+        )
+
+    @observe("collect_garbage", foreground=False)
+    def collect_garbage(self, budget: Optional[float] = None) -> int:
+        """
+        Removes the records of files that no longer exist, checking records for
+        at most `budget` seconds, or `gc_time_budget` seconds if not given.
+        Each call resumes from the last record checked by the previous call,
+        such that all records are checked over successive calls. Returns the
+        number of records removed.
+
+        Notes
+        -----
+        - Each pass over all records begins with `_sync_all()`, such that files
+        moved out of band since the last sync are not mistaken for deleted
+        files. This sync is not bounded by `budget`.
+
+        - The space freed by removed records is returned to the filesystem by
+        `BaseFileIdStore.vacuum()`.
+        """
+        if budget is None:
+            budget = self.gc_time_budget
+        deadline = time.perf_counter() + budget
+        removed = 0
+
+        if not self._gc_cursor:
+            with self.store.transaction():
+                self._sync_all()
+
+        while True:
+            with self.store.transaction():
+                records = self.store.scan(self._gc_cursor, self.GC_BATCH_SIZE)
+                for record in records:
+                    self._gc_cursor = record.id
+                    if self._is_stale(record):
+                        self.store.delete(record.id)
+                        removed += 1
+                    if time.perf_counter() >= deadline:
+                        break
+                else:
+                    if len(records) < self.GC_BATCH_SIZE:
+                        # checked the last record, start a new pass on the next call
+                        self._gc_cursor = ""
+                        break
+            if time.perf_counter() >= deadline:
+                break
+
+        if removed:
+            self.store.vacuum()
+            self.log.info(
+                f"LocalFileIdManager : Removed {removed} records of deleted files."
+            )
+        return removed
+
+    def _import_record(self, record: FileRecord) -> Optional[FileRecord]:
+        """Refreshes the stat info of an imported record, since inode numbers
+        and timestamps differ across filesystems. Skips records of files that
+        do not exist at the rewritten path, or that are symlinks."""
+        stat_info = self._stat(record.path)
+        if stat_info is None or stat_info.is_symlink:
+            return None
+        return FileRecord(
+            record.id,
+            record.path,
+            stat_info.ino,
+            stat_info.crtime,
+            stat_info.mtime,
+            stat_info.is_dir,
+        )
+
+    def _scan_dir(self, dir_path: str) -> List[Tuple[str, "StatStruct"]]:
+        """Returns the path and stat info of each entry of the directory at
+        `dir_path`, or an empty list if it cannot be read. Safe to call from
+        worker threads, as it does not access the storage backend."""
+        entries = []
+        try:
+            with os.scandir(dir_path) as scan_iter:
+                for entry in scan_iter:
+                    stat_info = self._stat(entry.path)
+                    if stat_info is not None:
+                        entries.append((entry.path, stat_info))
+        except OSError:
+            pass
+        return entries
+
+    def _walk(self, root_path: str, workers: int) -> Iterator[Tuple[str, "StatStruct"]]:
+        """Yields the path and stat info of every entry under the directory at
+        `root_path`, in no particular order. Directories are read and their
+        entries stat'd by a pool of `workers` threads. Symlinks are yielded,
+        but not followed."""
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            pending: Set[Future] = {executor.submit(self._scan_dir, root_path)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for path, stat_info in future.result():
+                        if stat_info.is_dir and not stat_info.is_symlink:
+                            pending.add(executor.submit(self._scan_dir, path))
+                        yield path, stat_info
+
+    def reindex(
+        self,
+        workers: int = 4,
+        batch_size: int = 1000,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> ReindexStats:
+        """
+        Indexes every file and directory under the server root, creating
+        records for new files and refreshing the paths and stat info of
+        existing ones. Intended to build or refresh the index offline, before
+        the server starts, such that the server starts against a complete
+        index. Returns statistics of the reindex.
+
+        Directories are read and their entries stat'd by a pool of `workers`
+        threads, while records are written by the calling thread in
+        transactions of `batch_size` entries. `progress` is called after each
+        transaction with the number of entries and directories indexed so far.
+
+        Notes
+        -----
+        - Symlinks are not followed, and are not indexed.
+
+        - Records of files that no longer exist are kept, as they may belong to
+        files moved out of band. They are removed by `collect_garbage()`.
+        """
+        assert self.root_dir is not None  # Validated in _validate_root_dir
+        start = time.perf_counter()
+        root_path = self._normalize_path(self.root_dir)
+        root_stat = self._stat(root_path)
+        if root_stat is None or not root_stat.is_dir:
+            return ReindexStats(0, 0, 0, 0.0)
+
+        files = created = 0
+        dirs = 1
+        batch: List[Tuple[str, StatStruct]] = [(root_path, root_stat)]
+
+        def flush() -> None:
+            nonlocal files, created
+            with self.store.transaction():
+                for path, stat_info in batch:
+                    id = self._sync_file(path, stat_info)
+                    if id is None:
+                        self._create(path, stat_info)
+                        created += 1
+                    elif stat_info.is_dir:
+                        # the contents of the directory are indexed as well, so
+                        # it need not be synced until it changes again.
+                        self._update(id, stat_info)
+            files += len(batch)
+            batch.clear()
+            if progress is not None:
+                progress(files, dirs)
+
+        for path, stat_info in self._walk(root_path, workers):
+            if stat_info.is_symlink:
+                continue
+            dirs += stat_info.is_dir
+            batch.append((path, stat_info))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        duration = time.perf_counter() - start
+        self.log.info(
+            f"LocalFileIdManager : Reindexed {files} files and directories in "
+            f"{duration:.3f}s, creating {created} records."
+        )
+        return ReindexStats(files, dirs, created, duration)
+
+    def _is_dir_record(self, path: str, ino: int) -> bool:
+        """Returns whether the directory at `path` has a record with inode
+        number `ino`."""
+        record = self.store.get_by_ino(ino)
+        return record is not None and bool(record.is_dir) and record.path == path
+
+    def _check(self, workers: int) -> Tuple[CheckReport, Dict[str, Any]]:
+        """Compares all records with the filesystem. Returns the report with
+        persisted paths, and the records and stat info needed to repair each
+        kind of drift. Records are read in slices of `CHECK_BATCH_SIZE`, such
+        that only the records found drifting are held in memory."""
+        assert self.root_dir is not None  # Validated in _validate_root_dir
+        start = time.perf_counter()
+        count = 0
+        duplicates: Set[str] = set()
+        stale: List[FileRecord] = []
+        collisions: List[Tuple[FileRecord, StatStruct]] = []
+        mismatches: List[FileRecord] = []
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            records = self.store.scan("", self.CHECK_BATCH_SIZE)
+            while records:
+                count += len(records)
+                stats = executor.map(
+                    self._stat, [record.path for record in records], chunksize=256
+                )
+                for record, stat_info in zip(records, stats):
+                    # only one of the records at a path is found by it
+                    other = self.store.get_by_path(record.path)
+                    if other is not None and other.id != record.id:
+                        duplicates.add(record.path)
+                    if stat_info is None:
+                        stale.append(record)
+                    elif stat_info.ino != record.ino:
+                        other = self.store.get_by_ino(stat_info.ino)
+                        if other is not None and other.path != record.path:
+                            collisions.append((record, stat_info))
+                        else:
+                            stale.append(record)
+                    elif stat_info.crtime != record.crtime:
+                        mismatches.append(record)
+                records = self.store.scan(records[-1].id, self.CHECK_BATCH_SIZE)
+
+        root_path = self._normalize_path(self.root_dir)
+        missing_dirs = []
+        root_stat = self._stat(root_path)
+        if root_stat is not None and root_stat.is_dir:
+            entries = self._walk(root_path, workers)
+            for path, stat_info in [(root_path, root_stat), *entries]:
+                if (
+                    stat_info.is_dir
+                    and not stat_info.is_symlink
+                    and not self._is_dir_record(path, stat_info.ino)
+                ):
+                    missing_dirs.append((path, stat_info))
+
+        report = CheckReport(
+            records=count,
+            stale=sorted(record.path for record in stale),
+            duplicates=sorted(duplicates),
+            missing_dirs=sorted(path for path, _ in missing_dirs),
+            ino_collisions=sorted(record.path for record, _ in collisions),
+            crtime_mismatches=sorted(record.path for record in mismatches),
+            duration=time.perf_counter() - start,
+        )
+        fixes = {
+            "stale": stale,
+            "collisions": collisions,
+            "mismatches": mismatches,
+            "missing_dirs": missing_dirs,
+        }
+        return report, fixes
+
+    def _repair(self, fixes: Dict[str, Any], batch_size: int) -> int:
+        """Applies the fixes returned by `_check()` in transactions of
+        `batch_size` fixes. Returns the number of fixes applied."""
+        actions: List[Callable[[], Any]] = []
+        for record in fixes["stale"] + fixes["mismatches"]:
+            actions.append(functools.partial(self.store.delete, record.id))
+        for record, stat_info in fixes["collisions"]:
+            # the record with the inode number of the file at the path of
+            # `record` belongs to that file, so it is moved there
+            actions.append(functools.partial(self.store.delete, record.id))
+            actions.append(functools.partial(self._sync_file, record.path, stat_info))
+        for path, stat_info in fixes["missing_dirs"]:
+            actions.append(functools.partial(self.index, path, stat_info, commit=False))
+
+        for i in range(0, len(actions), batch_size):
+            with self.store.transaction():
+                for action in actions[i : i + batch_size]:
+                    action()
+        return sum(len(fix) for fix in fixes.values())
+
+    def check(
+        self, workers: int = 4, repair: bool = False, batch_size: int = 1000
+    ) -> CheckReport:
+        """
+        Compares all records with the filesystem without modifying them, and
+        returns a report of the drift between them. Files are stat'd by a pool
+        of `workers` threads.
+
+        If `repair` is True, the records are then fixed: files moved out of
+        band are re-identified with `_sync_all()`, after which the remaining
+        stale records are removed, records are moved to the files holding
+        their inode number, and missing directories are indexed, in
+        transactions of `batch_size` fixes. The returned report describes the
+        drift found before repairing, and the number of fixes applied.
+        """
+        report, fixes = self._check(workers)
+        if repair:
+            with self.store.transaction():
+                self._sync_all()
+            _, fixes = self._check(workers)
+            report = report._replace(repaired=self._repair(fixes, batch_size))
+
+        def api_paths(paths: List[str]) -> List[str]:
+            return [self._from_normalized_path(path) or path for path in paths]
+
+        report = report._replace(
+            stale=api_paths(report.stale),
+            duplicates=api_paths(report.duplicates),
+            missing_dirs=api_paths(report.missing_dirs),
+            ino_collisions=api_paths(report.ino_collisions),
+            crtime_mismatches=api_paths(report.crtime_mismatches),
+        )
+        self.log.info(
+            f"LocalFileIdManager : Checked {report.records} records in "
+            f"{report.duration:.3f}s: {len(report.stale)} stale, "
+            f"{len(report.duplicates)} duplicate paths, {len(report.missing_dirs)} "
+            f"missing directories, {len(report.ino_collisions)} inode collisions, "
+            f"{len(report.crtime_mismatches)} crtime mismatches."
+        )
+        return report
+
     def _parse_raw_stat(self, raw_stat: os.stat_result) -> "StatStruct":
         """Accepts an `os.stat_result` object and returns a `StatStruct`
         object."""
@@ -729,33 +1876,33 @@ class LocalFileIdManager(BaseFileIdManager):
         have a unique `ino`.
         """
         # If the path exists
-        existing_id: Optional[str] = None
-        ino: Optional[int] = None
-        row = self.con.execute(
-            "SELECT id, ino FROM Files WHERE path = ?", (path,)
-        ).fetchone()
-        if row:
-            existing_id, ino = row
+        record = self.store.get_by_path(path)
 
         # If the file ID already exists and the current file matches our records
         # return the file ID instead of creating a new one.
-        if existing_id and stat_info.ino == ino:
-            return existing_id
+        if record and stat_info.ino == record.ino:
+            return record.id
 
-        id = self._uuid()
-        self.con.execute(
-            "INSERT INTO Files (id, path, ino, crtime, mtime, is_dir) VALUES (?, ?, ?, ?, ?, ?)",
-            (
+        id = self.store.new_id(path)
+        self.store.insert(
+            FileRecord(
                 id,
                 path,
                 stat_info.ino,
                 stat_info.crtime,
                 stat_info.mtime,
                 stat_info.is_dir,
-            ),
+            )
         )
+        self._filter_ino(stat_info.ino)
         return id
 
+    def _create_copied(self, path: str) -> Optional[str]:
+        stat_info = self._stat(path)
+        if stat_info is None or stat_info.is_symlink:
+            return None
+        return self._sync_file(path, stat_info) or self._create(path, stat_info)
+
     def _update(
         self,
         id: str,
@@ -776,33 +1923,36 @@ class LocalFileIdManager(BaseFileIdManager):
         dangerous and may throw a runtime error if the file is not guaranteed to
         have a unique `ino`.
         """
+        if stat_info:
+            self._filter_ino(stat_info.ino)
+
         if stat_info and path:
-            self.con.execute(
-                "UPDATE Files SET ino = ?, crtime = ?, mtime = ?, path = ? WHERE id = ?",
-                (stat_info.ino, stat_info.crtime, stat_info.mtime, path, id),
+            self.store.update(
+                id,
+                ino=stat_info.ino,
+                crtime=stat_info.crtime,
+                mtime=stat_info.mtime,
+                path=path,
             )
             return
 
         if stat_info:
-            self.con.execute(
-                "UPDATE Files SET ino = ?, crtime = ?, mtime = ? WHERE id = ?",
-                (stat_info.ino, stat_info.crtime, stat_info.mtime, id),
+            self.store.update(
+                id, ino=stat_info.ino, crtime=stat_info.crtime, mtime=stat_info.mtime
             )
             return
 
         if path:
-            self.con.execute(
-                "UPDATE Files SET path = ? WHERE id = ?",
-                (path, id),
-            )
+            self.store.update(id, path=path)
             return
 
+    @observe("index")
     def index(
         self, path: str, stat_info: Optional["StatStruct"] = None, commit: bool = True
     ) -> Optional[str]:
         """Returns the file ID for the file at `path`, creating a new file ID if
         one does not exist. Returns None only if file does not exist at path."""
-        with self.con:
+        with self.store.transaction():
             path = self._normalize_path(path)
             stat_info = stat_info or self._stat(path)
             if not stat_info:
@@ -821,20 +1971,33 @@ class LocalFileIdManager(BaseFileIdManager):
             id = self._create(path, stat_info)
             return id
 
+    @observe("get_id")
     def get_id(self, path: str) -> Optional[str]:
         """Retrieves the file ID associated with a file path. Returns None if
         the file has not yet been indexed or does not exist at the given
         path."""
-        with self.con:
-            path = self._normalize_path(path)
-            stat_info = self._stat(path)
-            if not stat_info:
-                return None
+        path = self._normalize_path(path)
+        stat_info = self._stat(path)
+        if not stat_info:
+            return None
 
+        ino_filter = None if self._lazy_copies else self._ino_filter
+        # the inode number of every record is in the filter, so a file whose
+        # inode number is not was never indexed
+        if ino_filter is not None and stat_info.ino not in ino_filter:
+            self._ino_filter_negatives += 1
+            return None
+
+        with self.store.transaction():
             # then sync file at path and retrieve id, if any
             id = self._sync_file(path, stat_info)
+            if id is None and not stat_info.is_symlink:
+                id = self._materialize(path)
+            if id is None and ino_filter is not None:
+                self._ino_filter_false_positives += 1
             return id
 
+    @observe("get_path")
     def get_path(self, id: str) -> Optional[str]:
         """Retrieves the file path associated with a file ID. The file path is
         relative to `self.root_dir`. Returns None if the ID does not
@@ -848,24 +2011,27 @@ class LocalFileIdManager(BaseFileIdManager):
         """
         # optimistic approach: first check to see if path was not yet moved
         for retry in [True, False]:
-            row = self.con.execute(
-                "SELECT path, ino, crtime FROM Files WHERE id = ?", (id,)
-            ).fetchone()
+            record = self.store.get(id)
 
             # if file ID does not exist, return None
-            if not row:
+            if not record:
                 return None
 
-            path, ino, crtime = row
+            path, ino, crtime = record.path, record.ino, record.crtime
             stat_info = self._stat(path)
 
             if stat_info and ino == stat_info.ino and crtime == stat_info.crtime:
                 # if file already exists at path and the ino and timestamps match,
                 # then return the correct path immediately (best case)
+                if retry:
+                    self._path_cache_hits += 1
+                    FILEID_PATH_CACHE.labels("hit").inc()
                 return self._from_normalized_path(path)
 
             # otherwise, try again after calling _sync_all() to sync the Files table to the file tree
             if retry:
+                self._path_cache_misses += 1
+                FILEID_PATH_CACHE.labels("miss").inc()
                 self._sync_all()
 
         # If we're here, the retry didn't work.
@@ -879,10 +2045,11 @@ class LocalFileIdManager(BaseFileIdManager):
             f"Successfully updated index following move from {old_path} to {new_path}."
         ),
     )
+    @observe("move")
     def move(self, old_path: str, new_path: str) -> Optional[str]:
         """Handles file moves by updating the file path of the associated file
         ID.  Returns the file ID. Returns None if file does not exist at new_path."""
-        with self.con:
+        with self.store.transaction():
             old_path = self._normalize_path(old_path)
             new_path = self._normalize_path(new_path)
 
@@ -906,13 +2073,10 @@ class LocalFileIdManager(BaseFileIdManager):
     def _copy_recursive(self, from_path: str, to_path: str, _: str = "") -> None:
         """Copy all children of a given directory at `from_path` to a new
         directory at `to_path`. Inserts stat_info with record."""
-        from_path_glob = os.path.join(from_path, "*")
-        records = self.con.execute(
-            "SELECT path FROM Files WHERE path GLOB ?", (from_path_glob,)
-        ).fetchall()
+        records = self.store.get_children(from_path, os.path.sep)
 
         for record in records:
-            (from_recpath,) = record
+            from_recpath = record.path
             to_recpath = os.path.join(
                 to_path, os.path.relpath(from_recpath, start=from_path)
             )
@@ -929,37 +2093,50 @@ class LocalFileIdManager(BaseFileIdManager):
             f"Successfully indexed {to_path} following copy from {from_path}."
         ),
     )
+    @observe("copy")
     def copy(self, from_path: str, to_path: str) -> Optional[str]:
         """Handles file copies by creating a new record in the Files table.
         Returns the file ID associated with `new_path`. Also indexes `old_path`
-        if record does not exist in Files table. TODO: emit to event bus to
-        inform client extensions to copy records associated with old file ID to
-        the new file ID."""
-        from_path = self._normalize_path(from_path)
-        to_path = self._normalize_path(to_path)
-
-        if os.path.isdir(to_path):
-            self._copy_recursive(from_path, to_path)
-
-        self.index(from_path, commit=False)
+        if record does not exist in Files table. Emits a `copy` event with the
+        new file ID and both paths through `event_logger`, such that client
+        extensions may copy data associated with the old file ID."""
+        from_recpath = self._normalize_path(from_path)
+        to_recpath = self._normalize_path(to_path)
+
+        if os.path.isdir(to_recpath) and not self._copy_lazily(
+            from_recpath, to_recpath
+        ):
+            self._copy_recursive(from_recpath, to_recpath)
+
+        self.index(from_recpath, commit=False)
         # transaction committed in index()
-        return self.index(to_path)
+        id = self.index(to_recpath)
+        self._emit("copy", id, from_path, to_path)
+        return id
 
     @log(
         lambda self, path: f"Deleting index at {path}.",
         lambda self, path: f"Successfully deleted index at {path}.",
     )
+    @observe("delete")
     def delete(self, path: str) -> None:
         """Handles file deletions by deleting the associated record in the File
         table. Returns None."""
-        with self.con:
-            path = self._normalize_path(path)
+        with self.store.transaction():
+            recpath = self._normalize_path(path)
+            # only looked up if the deletion is emitted
+            record = self.store.get_by_path(recpath) if self.event_logger else None
 
-            if os.path.isdir(path):
-                self._delete_recursive(path)
+            # the directory may already be gone from the filesystem
+            self._delete_copies(recpath)
+            if os.path.isdir(recpath):
+                self._delete_recursive(recpath)
 
-            self.con.execute("DELETE FROM Files WHERE path = ?", (path,))
+            self.store.delete_by_path(recpath)
 
+        self._emit("delete", record and record.id, path, None)
+
+    @observe("save")
     def save(self, path: str) -> None:
         """Handles file saves (edits) by updating recorded stat info.
 
@@ -971,23 +2148,20 @@ class LocalFileIdManager(BaseFileIdManager):
         JupyterLab.  This would (wrongly) preserve the association b/w the old
         file ID and the current path rather than create a new file ID.
         """
-        with self.con:
+        with self.store.transaction():
             path = self._normalize_path(path)
 
             # look up record by ino and path
             stat_info = self._stat(path)
             if stat_info is None:
                 return
-            row = self.con.execute(
-                "SELECT id FROM Files WHERE ino = ? AND path = ?", (stat_info.ino, path)
-            ).fetchone()
+            record = self.store.get_by_ino(stat_info.ino)
             # if no record exists, return early
-            if row is None:
+            if record is None or record.path != path:
                 return
 
             # otherwise, update the stat info
-            (id,) = row
-            self._update(id, stat_info)
+            self._update(record.id, stat_info)
 
     def get_handlers_by_action(
         self,
@@ -1003,6 +2177,493 @@ class LocalFileIdManager(BaseFileIdManager):
     def __del__(self) -> None:
         """Cleans up `LocalFileIdManager` by committing any pending transactions and
         closing the connection."""
-        if hasattr(self, "con"):
-            self.con.commit()
-            self.con.close()
+        if hasattr(self, "store"):
+            self.store.close()
+
+
+class HashMapFileIdManager(BaseFileIdManager):
+    """
+    File ID manager that works on arbitrary filesystems, like
+    `ArbitraryFileIdManager`, but keeps all records in in-memory hash maps
+    rather than in a SQLite database. A sorted index of all paths is maintained
+    alongside the hash maps to support moving, copying, and deleting
+    directories.
+
+    Records are persisted to an append-only operation log at `db_path`. Once
+    the log grows past `compaction_threshold` operations, it is compacted into
+    a snapshot of the current records by a background thread.
+
+    Notes
+    -----
+    - Unlike the SQLite-backed managers, this manager does not support multiple
+    processes or manager instances sharing the same `db_path`.
+
+    - The operation log is flushed at the end of every public method but not
+    fsynced, so operations survive a process crash but not a system crash.
+    """
+
+    compaction_threshold = Int(
+        default_value=100000,
+        help=(
+            "The number of operations that may be appended to the operation log "
+            "before it is compacted into a snapshot. The log is never compacted "
+            "before it holds at least as many operations as there are records."
+        ),
+        config=True,
+    )
+
+    @default("db_path")
+    def _default_db_path(self) -> str:
+        return default_log_path
+
+    @validate("root_dir")
+    def _validate_root_dir(self, proposal: Dict[str, Any]) -> str:
+        if proposal["value"] is None:
+            return ""
+
+        return ArbitraryFileIdManager._normalize_separators(proposal["value"])
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        # pass args and kwargs to parent Configurable
+        super().__init__(*args, **kwargs)
+        # initialize instance attrs
+        self._path_by_id: Dict[str, str] = {}
+        self._id_by_path: Dict[str, str] = {}
+        self._sorted_paths: List[str] = []
+        self._log: Optional[IO[str]] = None
+        self._log_gen = 0
+        self._log_ops = 0
+        # whether an entry of the operation log was truncated on load
+        self._log_truncated = False
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._init_tracing()
+        self.log.info(f"HashMapFileIdManager : Configured root dir: {self.root_dir}")
+        self.log.info(
+            f"HashMapFileIdManager : Configured operation log path: {self.db_path}"
+        )
+        if self.db_path == ":memory:":
+            return
+
+        self._load()
+        self.log.info(
+            f"HashMapFileIdManager : Loaded {len(self._path_by_id)} records from "
+            "operation log."
+        )
+
+    @property
+    def _snapshot_path(self) -> str:
+        return self.db_path + ".snapshot"
+
+    @property
+    def _rotated_log_path(self) -> str:
+        return self.db_path + ".1"
+
+    def _read_log(self, path: str, min_gen: int) -> int:
+        """Applies all operations in the log file at `path` if its generation is
+        greater than `min_gen`. Returns the generation of the log file, or -1
+        if it does not exist."""
+        gen = -1
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line may be truncated if the process exited
+                        # while it was being written
+                        self.log.warning(
+                            "HashMapFileIdManager : Ignoring truncated entry in "
+                            f"{path}."
+                        )
+                        self._log_truncated = True
+                        break
+
+                    if entry[0] == "h":
+                        gen = entry[1]
+                        if gen <= min_gen:
+                            break
+                    else:
+                        self._apply(entry)
+                        self._log_ops += 1
+        except FileNotFoundError:
+            return -1
+
+        return gen
+
+    def _load(self) -> None:
+        """Loads all records from the snapshot and operation logs, then opens
+        the operation log for appending."""
+        snapshot_gen = self._read_log(self._snapshot_path, -1)
+        self._log_ops = 0
+        rotated_gen = self._read_log(self._rotated_log_path, snapshot_gen)
+        log_gen = self._read_log(self.db_path, snapshot_gen)
+
+        if rotated_gen > snapshot_gen or self._log_truncated:
+            # a previous compaction did not complete or the log is damaged, so
+            # finish compacting synchronously before appending to a new log.
+            gen = max(snapshot_gen, rotated_gen, log_gen)
+            self._write_snapshot(
+                self._snapshot_path,
+                self._rotated_log_path,
+                list(self._path_by_id.items()),
+                gen,
+            )
+            self._open_log(gen + 1)
+            self._log_ops = 0
+        elif log_gen > snapshot_gen:
+            self._log_gen = log_gen
+            self._log = self._open_log_file("a")
+        else:
+            self._open_log(snapshot_gen + 1)
+
+    def _open_log_file(self, mode: str) -> IO[str]:
+        """Opens the operation log at `db_path`, which stays open until it is
+        rotated by `compact()` or closed by `close()`."""
+        return open(self.db_path, mode, encoding="utf-8")
+
+    def _open_log(self, gen: int) -> None:
+        """Opens a new, empty operation log of generation `gen` at `db_path`."""
+        self._log_gen = gen
+        self._log = self._open_log_file("w")
+        try:
+            self._append(["h", gen])
+            self._log.flush()
+        except BaseException:
+            self._log.close()
+            self._log = None
+            raise
+
+    def _append(self, entry: List[Any]) -> None:
+        if self._log is None:
+            return
+
+        self._log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._log_ops += 1
+
+    def _commit(self) -> None:
+        """Flushes the operation log and compacts it if it exceeds the
+        configured threshold."""
+        if self._log is None:
+            return
+
+        self._log.flush()
+        if self._log_ops >= max(self.compaction_threshold, len(self._path_by_id)):
+            self.compact()
+
+    def compact(self, wait: bool = False) -> None:
+        """Compacts the operation log into a snapshot of the current records.
+        The snapshot is written by a background thread unless `wait` is True.
+        Does nothing if a compaction is already in progress."""
+        if self._log is None:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+
+        # rotate the log, such that new operations are appended to a new log
+        # while the snapshot is being written.
+        self._log.close()
+        os.replace(self.db_path, self._rotated_log_path)
+        snapshot_gen = self._log_gen
+        self._open_log(snapshot_gen + 1)
+        self._log_ops = 0
+
+        records = list(self._path_by_id.items())
+        self._compaction_thread = threading.Thread(
+            target=self._write_snapshot,
+            args=(self._snapshot_path, self._rotated_log_path, records, snapshot_gen),
+            daemon=True,
+        )
+        self._compaction_thread.start()
+        self.log.info(
+            f"HashMapFileIdManager : Compacting operation log into {len(records)} records."
+        )
+        if wait:
+            self._compaction_thread.join()
+
+    @staticmethod
+    def _write_snapshot(
+        snapshot_path: str,
+        rotated_log_path: str,
+        records: List[Tuple[str, str]],
+        gen: int,
+    ) -> None:
+        """Atomically replaces the snapshot at `snapshot_path` with `records`,
+        then deletes the rotated operation log that the new snapshot supersedes.
+
+        This is a static method so the compaction thread does not hold a
+        reference to the manager, which would delay its cleanup."""
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(["h", gen]) + "\n")
+            for id, path in records:
+                f.write(json.dumps(["s", id, path], separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        try:
+            os.remove(rotated_log_path)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, entry: List[Any]) -> None:
+        """Applies an operation log entry to the in-memory records."""
+        op = entry[0]
+        if op == "s":
+            self._set(entry[1], entry[2])
+        elif op == "d":
+            self._delete_tree(entry[1])
+        elif op == "m":
+            self._move_tree(entry[1], entry[2])
+
+    def _children_range(self, path: str) -> Tuple[int, int]:
+        """Returns the range of indices in the sorted path index occupied by
+        children of `path`. Since "0" is the character following "/", all
+        children of `path` sort between `path + "/"` and `path + "0"`."""
+        lo = bisect_left(self._sorted_paths, path + "/")
+        hi = bisect_left(self._sorted_paths, path + "0", lo)
+        return lo, hi
+
+    def _remove_path(self, path: str) -> Optional[str]:
+        """Removes a single path from the records. Returns its file ID, if any."""
+        id = self._id_by_path.pop(path, None)
+        if id is None:
+            return None
+
+        del self._path_by_id[id]
+        del self._sorted_paths[bisect_left(self._sorted_paths, path)]
+        return id
+
+    def _set(self, id: str, path: str) -> None:
+        """Associates a file ID with a path, replacing any existing record at
+        `path` or for `id`."""
+        self._remove_path(path)
+        old_path = self._path_by_id.get(id)
+        if old_path is not None:
+            self._remove_path(old_path)
+
+        self._path_by_id[id] = path
+        self._id_by_path[path] = id
+        insort(self._sorted_paths, path)
+
+    def _delete_tree(self, path: str) -> None:
+        """Deletes the record at `path` and all records of its children."""
+        self._remove_path(path)
+        lo, hi = self._children_range(path)
+        for child_path in self._sorted_paths[lo:hi]:
+            del self._path_by_id[self._id_by_path.pop(child_path)]
+        del self._sorted_paths[lo:hi]
+
+    def _move_tree(self, old_path: str, new_path: str) -> Optional[str]:
+        """Moves the record at `old_path` and all records of its children to
+        `new_path`, replacing any existing records there. Returns the file ID
+        of `old_path`, if any."""
+        lo, hi = self._children_range(old_path)
+        children = [
+            (self._id_by_path.pop(child_path), new_path + child_path[len(old_path) :])
+            for child_path in self._sorted_paths[lo:hi]
+        ]
+        del self._sorted_paths[lo:hi]
+        id = self._remove_path(old_path)
+
+        self._delete_tree(new_path)
+        if id is not None:
+            self._path_by_id[id] = new_path
+            self._id_by_path[new_path] = id
+            insort(self._sorted_paths, new_path)
+
+        # replacing the common prefix of a sorted run of paths preserves their
+        # order, so the children can be inserted as a single slice.
+        for child_id, child_path in children:
+            self._path_by_id[child_id] = child_path
+            self._id_by_path[child_path] = child_id
+        lo = bisect_left(self._sorted_paths, new_path + "/")
+        self._sorted_paths[lo:lo] = [child_path for _, child_path in children]
+
+        return id
+
+    def _normalize_path(self, path: str) -> str:
+        """Accepts an API path and returns a "persistable" path, i.e. one prefixed
+        by root_dir that can then be persisted in a format relative to the implementation."""
+        path = ArbitraryFileIdManager._normalize_separators(path)
+        root_dir = self.root_dir or ""
+        if posixpath.commonprefix([root_dir, path]) != root_dir:
+            path = posixpath.join(root_dir, path)
+
+        return path
+
+    def _from_normalized_path(self, path: Optional[str]) -> Optional[str]:
+        """Accepts a "persistable" path and returns an API path, i.e. one relative
+        to root_dir and uses forward slashes as the path separator. Returns
+        `None` if the given path is None or is not relative to root_dir."""
+        if path is None:
+            return None
+
+        root_dir = self.root_dir or ""
+        if posixpath.commonprefix([root_dir, path]) != root_dir:
+            return None
+
+        return posixpath.relpath(path, root_dir)
+
+    def _create(self, path: str) -> str:
+        existing_id = self._id_by_path.get(path)
+        if existing_id:
+            return existing_id
+
+        id = self._uuid()
+        self._set(id, path)
+        self._append(["s", id, path])
+        return id
+
+    def _export_header(self) -> Dict[str, Any]:
+        return {
+            "manager": self.__class__.__name__,
+            "root_dir": self.root_dir or "",
+            "sep": self._sep,
+            "stat_info": False,
+        }
+
+    def _dump_records(self) -> Iterator[FileRecord]:
+        for id, path in list(self._path_by_id.items()):
+            yield FileRecord(id, path)
+
+    def _import_batches(self, batches: Iterator[List[FileRecord]]) -> None:
+        for batch in batches:
+            for record in batch:
+                self._set(record.id, record.path)
+                self._append(["s", record.id, record.path])
+        self._commit()
+
+    def get_changes(
+        self, since: Optional[int] = None, limit: int = 1000
+    ) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError(f"{self.__class__.__name__} does not record changes.")
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, str]]:
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not maintain a search index."
+        )
+
+    def _list_children(
+        self, path: str, recursive: bool, after: Optional[str], limit: int
+    ) -> List[FileRecord]:
+        if path:
+            lo, hi = self._children_range(path)
+        else:
+            lo, hi = 0, len(self._sorted_paths)
+        if after is not None:
+            lo = max(lo, bisect_right(self._sorted_paths, after, lo, hi))
+        offset = len(path) + 1 if path else 0
+        records: List[FileRecord] = []
+        while lo < hi and len(records) < limit:
+            child_path = self._sorted_paths[lo]
+            name, sep, _ = child_path[offset:].partition("/")
+            if recursive or not sep:
+                records.append(FileRecord(self._id_by_path[child_path], child_path))
+                lo += 1
+            else:
+                # skip the descendants of the direct child, like a range scan
+                lo = bisect_left(
+                    self._sorted_paths, child_path[:offset] + name + "0", lo, hi
+                )
+        return records
+
+    def count(self) -> int:
+        return len(self._path_by_id)
+
+    def count_dirs(self) -> Optional[int]:
+        return None
+
+    def disk_usage(self) -> Tuple[int, int]:
+        """Returns the sizes in bytes of the snapshot and of the operation
+        log."""
+        sizes = []
+        for path in (self._snapshot_path, self.db_path):
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        return sizes[0], sizes[1]
+
+    @observe("index")
+    def index(self, path: str) -> str:
+        id = self._create(self._normalize_path(path))
+        self._commit()
+        return id
+
+    @observe("get_id")
+    def get_id(self, path: str) -> Optional[str]:
+        return self._id_by_path.get(self._normalize_path(path))
+
+    @observe("get_path")
+    def get_path(self, id: str) -> Optional[str]:
+        return self._from_normalized_path(self._path_by_id.get(id))
+
+    @observe("move")
+    def move(self, old_path: str, new_path: str) -> Optional[str]:
+        old_recpath = self._normalize_path(old_path)
+        new_recpath = self._normalize_path(new_path)
+
+        id = self._move_tree(old_recpath, new_recpath)
+        self._append(["m", old_recpath, new_recpath])
+        moved = id is not None
+        if id is None:
+            id = self._create(new_recpath)
+
+        self._commit()
+        if moved:
+            self._emit("move", id, old_path, new_path)
+        return id
+
+    @observe("copy")
+    def copy(self, from_path: str, to_path: str) -> Optional[str]:
+        from_recpath = self._normalize_path(from_path)
+        to_recpath = self._normalize_path(to_path)
+
+        id = self._create(to_recpath)
+        lo, hi = self._children_range(from_recpath)
+        for from_child_path in self._sorted_paths[lo:hi]:
+            self._create(to_recpath + from_child_path[len(from_recpath) :])
+
+        self._commit()
+        self._emit("copy", id, from_path, to_path)
+        return id
+
+    @observe("delete")
+    def delete(self, path: str) -> None:
+        recpath = self._normalize_path(path)
+        id = self._id_by_path.get(recpath)
+
+        self._delete_tree(recpath)
+        self._append(["d", recpath])
+        self._commit()
+        self._emit("delete", id, path, None)
+
+    @observe("save")
+    def save(self, path: str) -> None:
+        return None
+
+    def get_handlers_by_action(
+        self,
+    ) -> Dict[str, Optional[Callable[[Dict[str, Any]], Any]]]:
+        return {
+            "get": None,
+            "save": None,
+            "rename": lambda data: self.move(data["source_path"], data["path"]),
+            "copy": lambda data: self.copy(data["source_path"], data["path"]),
+            "delete": lambda data: self.delete(data["path"]),
+        }
+
+    def close(self) -> None:
+        """Waits for any compaction in progress and closes the operation log,
+        which stays open for appending from startup until then."""
+        compaction_thread = getattr(self, "_compaction_thread", None)
+        if compaction_thread is not None:
+            compaction_thread.join()
+        log_file = getattr(self, "_log", None)
+        if log_file is not None:
+            log_file.close()
+            self._log = None
+
+    def __del__(self) -> None:
+        """Cleans up `HashMapFileIdManager` if it was not closed."""
+        self.close()
@@ -0,0 +1,146 @@
+"""
+Prometheus metrics of the File ID extension. Metrics are registered in the
+default registry of `prometheus_client`, and hence are exposed through the
+`/metrics` endpoint of Jupyter server alongside its own metrics.
+
+The latency of the `/api/fileid` endpoints is already recorded by Jupyter
+server in `http_request_duration_seconds`, labeled by handler class.
+"""
+
+import functools
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+if TYPE_CHECKING:
+    from .manager import BaseFileIdManager
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# upper bounds in seconds of the buckets of latency histograms. point lookups
+# take tens of microseconds, while syncs of large trees may take seconds.
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+FILEID_OPERATION_DURATION_SECONDS = Histogram(
+    "jupyter_server_fileid_operation_duration_seconds",
+    "Duration of File ID manager operations in seconds",
+    ["manager", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+FILEID_EVENT_DURATION_SECONDS = Histogram(
+    "jupyter_server_fileid_event_duration_seconds",
+    "Duration of the handling of contents events in seconds",
+    ["action"],
+    buckets=LATENCY_BUCKETS,
+)
+
+FILEID_SYNC_RUNS = Counter(
+    "jupyter_server_fileid_sync_runs",
+    "Number of syncs of the index with the filesystem",
+)
+
+FILEID_SYNC_DIRS_VISITED = Counter(
+    "jupyter_server_fileid_sync_dirs_visited",
+    "Number of indexed directories checked for changes by syncs",
+)
+
+FILEID_SYNC_FILES_REIDENTIFIED = Counter(
+    "jupyter_server_fileid_sync_files_reidentified",
+    "Number of files found at a new path by syncs, i.e. moved out of band",
+)
+
+FILEID_PATH_CACHE = Counter(
+    "jupyter_server_fileid_path_cache",
+    "Number of path lookups by file ID answered from the stored path (hit) or "
+    "that required a sync with the filesystem (miss)",
+    ["result"],
+)
+
+FILEID_RECORDS = Gauge(
+    "jupyter_server_fileid_records",
+    "Number of file records",
+)
+
+FILEID_DB_SIZE_BYTES = Gauge(
+    "jupyter_server_fileid_db_size_bytes",
+    "Size of the File ID database in bytes",
+)
+
+FILEID_WAL_SIZE_BYTES = Gauge(
+    "jupyter_server_fileid_wal_size_bytes",
+    "Size of the write-ahead log of the File ID database in bytes",
+)
+
+
+def observe(operation: str, foreground: bool = True) -> Callable[[F], F]:
+    """Decorator that records the duration of a File ID manager method in
+    `FILEID_OPERATION_DURATION_SECONDS` under `operation`. Only the outermost
+    decorated method is recorded, such that e.g. the syncs performed by
+    `get_path()` count towards its own duration only. Also records the time
+    at which the operation ended in the `_last_operation` attribute of the
+    manager, as returned by `time.monotonic()`."""
+
+    def decorator(method: F) -> F:
+        # histogram children by manager class, to skip the label lookup
+        children: Dict[type, Any] = {}
+
+        @functools.wraps(method)
+        def wrapped(self: Any, *args: Any, **kwargs: Any) -> Any:
+            if getattr(self, "_observing", False):
+                return method(self, *args, **kwargs)
+
+            self._observing = True
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                self._observing = False
+                if foreground:
+                    self._last_operation = time.monotonic()
+                child = children.get(type(self))
+                if child is None:
+                    child = FILEID_OPERATION_DURATION_SECONDS.labels(
+                        type(self).__name__, operation
+                    )
+                    children[type(self)] = child
+                child.observe(duration)
+
+        return wrapped  # type: ignore[return-value]
+
+    return decorator
+
+
+def observe_manager(manager: Optional["BaseFileIdManager"]) -> None:
+    """Reports the number of records and the size of the database of
+    `manager` in the gauges of this module whenever metrics are collected.
+    Reports zero for all gauges if `manager` is None."""
+    if manager is None:
+        FILEID_RECORDS.set_function(lambda: 0)
+        FILEID_DB_SIZE_BYTES.set_function(lambda: 0)
+        FILEID_WAL_SIZE_BYTES.set_function(lambda: 0)
+        return
+
+    FILEID_RECORDS.set_function(manager.count)
+    FILEID_DB_SIZE_BYTES.set_function(lambda: manager.disk_usage()[0])
+    FILEID_WAL_SIZE_BYTES.set_function(lambda: manager.disk_usage()[1])
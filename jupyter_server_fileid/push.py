@@ -0,0 +1,233 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from traitlets import Float, Instance, Int, TraitError, validate
+from traitlets.config.configurable import LoggingConfigurable
+
+from .manager import BaseFileIdManager
+
+
+class Subscription:
+    """The file IDs and path prefixes a client of `ChangePublisher` subscribes
+    to, and the callback by which notifications are sent to it."""
+
+    def __init__(self, send: Callable[[Dict[str, Any]], None]) -> None:
+        self.send = send
+        self.ids: Set[str] = set()
+        self.prefixes: Set[str] = set()
+
+
+class _PrefixNode:
+    __slots__ = ("children", "subscriptions")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _PrefixNode] = {}
+        self.subscriptions: Set[Subscription] = set()
+
+
+class PrefixIndex:
+    """Index of subscriptions by API path prefix, stored as a trie of path
+    components, such that finding the subscriptions matching a path takes time
+    proportional to its depth rather than to the number of subscriptions. A
+    prefix matches the path equal to it and every path below it, and the empty
+    prefix matches every path."""
+
+    def __init__(self) -> None:
+        self._root = _PrefixNode()
+
+    @staticmethod
+    def _components(path: str) -> List[str]:
+        return [component for component in path.split("/") if component]
+
+    def add(self, prefix: str, subscription: Subscription) -> None:
+        node = self._root
+        for component in self._components(prefix):
+            node = node.children.setdefault(component, _PrefixNode())
+        node.subscriptions.add(subscription)
+
+    def discard(self, prefix: str, subscription: Subscription) -> None:
+        """Removes `subscription` from `prefix`, pruning nodes left empty."""
+        components = self._components(prefix)
+        nodes = [self._root]
+        for component in components:
+            child = nodes[-1].children.get(component)
+            if child is None:
+                return
+            nodes.append(child)
+        nodes[-1].subscriptions.discard(subscription)
+        for depth in range(len(components), 0, -1):
+            if nodes[depth].subscriptions or nodes[depth].children:
+                break
+            del nodes[depth - 1].children[components[depth - 1]]
+
+    def match(self, path: str) -> Set[Subscription]:
+        """Returns the subscriptions to any prefix of `path`."""
+        node = self._root
+        matches = set(node.subscriptions)
+        for component in self._components(path):
+            child = node.children.get(component)
+            if child is None:
+                break
+            node = child
+            matches |= node.subscriptions
+        return matches
+
+
+class ChangePublisher(LoggingConfigurable):
+    """
+    Pushes changes of file paths to subscribed clients, e.g. those connected to
+    `/api/fileid/changes/ws`. `tick()` is called every `interval` seconds by
+    the File ID extension on the server IOLoop, and reads the changes recorded
+    since the previous tick from the change log of the manager.
+
+    Notes
+    -----
+    - Changes are read from the change log rather than from the manager
+    operations, such that every change is pushed whichever operation made it,
+    including moves detected when syncing with the filesystem.
+
+    - Changes of the same file ID within a tick are coalesced into one, and
+    each subscription receives at most one notification per tick.
+
+    - If more changes were made since the previous tick than the change log
+    retains, subscriptions are sent a `reset` notification instead, after
+    which clients must refresh the file IDs they hold.
+
+    - Raises a NotImplementedError on creation if the manager does not record
+    changes.
+    """
+
+    manager = Instance(
+        klass=BaseFileIdManager,  # type: ignore[type-abstract]
+        help="The File ID manager whose changes are pushed.",
+    )
+
+    interval = Float(
+        default_value=0.5,
+        help=(
+            "Interval in seconds at which changes are pushed to subscribed "
+            "clients. Changes made within an interval are batched into one "
+            "notification per client."
+        ),
+        config=True,
+    )
+
+    batch_size = Int(
+        default_value=10000,
+        help=(
+            "Maximum number of changes read from the change log per interval. "
+            "Further changes are pushed on the following intervals."
+        ),
+        config=True,
+    )
+
+    @validate("interval", "batch_size")
+    def _validate_positive(self, proposal: Dict[str, Any]) -> Any:
+        if proposal["value"] <= 0:
+            raise TraitError(
+                f"ChangePublisher : {proposal['trait'].name} must be positive."
+            )
+        return proposal["value"]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._subscriptions: Set[Subscription] = set()
+        self._by_id: Dict[str, Set[Subscription]] = {}
+        self._by_prefix = PrefixIndex()
+        self._cursor = self._last_change()
+
+    def _last_change(self) -> int:
+        return self.manager.get_changes()["cursor"]  # type: ignore[index]
+
+    def subscribe(
+        self,
+        subscription: Subscription,
+        ids: Iterable[str] = (),
+        prefixes: Iterable[str] = (),
+    ) -> None:
+        """Adds `ids` and API path `prefixes` to `subscription`."""
+        if not self._subscriptions:
+            # the change log is not read without subscriptions
+            self._cursor = self._last_change()
+        self._subscriptions.add(subscription)
+        for id in ids:
+            subscription.ids.add(id)
+            self._by_id.setdefault(id, set()).add(subscription)
+        for prefix in prefixes:
+            subscription.prefixes.add(prefix)
+            self._by_prefix.add(prefix, subscription)
+
+    def unsubscribe(
+        self,
+        subscription: Subscription,
+        ids: Optional[Iterable[str]] = None,
+        prefixes: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Removes `ids` and `prefixes` from `subscription`, or the entire
+        subscription if neither is given."""
+        if ids is None and prefixes is None:
+            ids, prefixes = list(subscription.ids), list(subscription.prefixes)
+            self._subscriptions.discard(subscription)
+        for id in ids or ():
+            subscription.ids.discard(id)
+            subscribers = self._by_id.get(id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_id[id]
+        for prefix in prefixes or ():
+            subscription.prefixes.discard(prefix)
+            self._by_prefix.discard(prefix, subscription)
+
+    def _read_changes(self) -> Optional[Dict[str, List[Optional[str]]]]:
+        """Reads the changes following the cursor, coalesced by file ID into
+        their old and new API paths. Returns None if they are no longer
+        retained."""
+        rows = self.manager.store.get_changes(self._cursor, self.batch_size)
+        if rows is None:
+            return None
+        changes: Dict[str, List[Optional[str]]] = {}
+        for seq, id, old_path, path in rows:
+            change = changes.get(id)
+            if change is None:
+                changes[id] = [old_path, path]
+            else:
+                change[1] = path
+            self._cursor = seq
+        from_normalized_path = self.manager._from_normalized_path
+        for change in changes.values():
+            change[0] = from_normalized_path(change[0])
+            change[1] = from_normalized_path(change[1])
+        return changes
+
+    def tick(self) -> int:
+        """Pushes the changes made since the previous tick to the subscriptions
+        matching them. Returns the number of notifications sent."""
+        if not self._subscriptions:
+            return 0
+
+        changes = self._read_changes()
+        if changes is None:
+            self.log.warning(
+                "ChangePublisher : Changes were pruned from the change log "
+                "before being pushed, resetting subscriptions."
+            )
+            self._cursor = self._last_change()
+            for subscription in list(self._subscriptions):
+                subscription.send({"reset": True})
+            return len(self._subscriptions)
+
+        notifications: Dict[Subscription, List[Dict[str, Optional[str]]]] = {}
+        for id, (old_path, path) in changes.items():
+            if old_path == path:
+                continue
+            subscriptions = set(self._by_id.get(id, ()))
+            for matched_path in (old_path, path):
+                if matched_path is not None:
+                    subscriptions |= self._by_prefix.match(matched_path)
+            change = {"id": id, "old_path": old_path, "path": path}
+            for subscription in subscriptions:
+                notifications.setdefault(subscription, []).append(change)
+
+        for subscription, subscription_changes in notifications.items():
+            subscription.send({"changes": subscription_changes})
+        return len(notifications)
@@ -8,8 +8,15 @@ import pytest
 from jupyter_server_fileid.manager import (
     ArbitraryFileIdManager,
     BaseFileIdManager,
+    HashMapFileIdManager,
     LocalFileIdManager,
 )
+from jupyter_server_fileid.storage import (
+    BaseFileIdStore,
+    DbmFileIdStore,
+    ShardedSqliteFileIdStore,
+    SqliteFileIdStore,
+)
 
 
 @pytest.fixture
@@ -33,34 +40,61 @@ def delete_fid_db(fid_db_path: str) -> Generator[None, None, None]:
         pass
 
 
-@pytest.fixture
-def fid_manager(fid_db_path: str, jp_root_dir: Path) -> LocalFileIdManager:
-    """Fixture returning a test-configured instance of `LocalFileIdManager`."""
-    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+def _disable_journal(fid_manager: BaseFileIdManager) -> None:
     # disable journal so no temp journal file is created under `tmp_path`.
     # reduces test flakiness since sometimes journal file has same ino and
     # crtime as a deleted file, so FID manager detects it wrongly as a move
     # also makes tests run faster :)
-    fid_manager.con.execute("PRAGMA journal_mode = OFF")
+    if hasattr(getattr(fid_manager, "store", None), "con"):
+        fid_manager.con.execute("PRAGMA journal_mode = OFF")
+
+
+@pytest.fixture(params=["sqlite", "dbm", "sharded"])
+def fid_store_class(request: pytest.FixtureRequest) -> Type[BaseFileIdStore]:
+    """Parametrized fixture that runs the test with each of the default storage
+    backends."""
+    class_by_param: Dict[str, Type[BaseFileIdStore]] = {
+        "sqlite": SqliteFileIdStore,
+        "dbm": DbmFileIdStore,
+        "sharded": ShardedSqliteFileIdStore,
+    }
+    return class_by_param[request.param]
+
+
+@pytest.fixture
+def fid_manager(
+    fid_db_path: str, jp_root_dir: Path, fid_store_class: Type[BaseFileIdStore]
+) -> LocalFileIdManager:
+    """Fixture returning a test-configured instance of `LocalFileIdManager`."""
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), store_class=fid_store_class
+    )
+    _disable_journal(fid_manager)
     return fid_manager
 
 
 @pytest.fixture
 def arbitrary_fid_manager(
-    fid_db_path: str, jp_root_dir: Path
+    fid_db_path: str, jp_root_dir: Path, fid_store_class: Type[BaseFileIdStore]
 ) -> ArbitraryFileIdManager:
     """Fixture returning a test-configured instance of `ArbitraryFileIdManager`."""
     arbitrary_fid_manager = ArbitraryFileIdManager(
-        db_path=fid_db_path, root_dir=str(jp_root_dir)
+        db_path=fid_db_path, root_dir=str(jp_root_dir), store_class=fid_store_class
     )
-    arbitrary_fid_manager.con.execute("PRAGMA journal_mode = OFF")
+    _disable_journal(arbitrary_fid_manager)
     return arbitrary_fid_manager
 
 
+@pytest.fixture
+def hashmap_fid_manager(fid_db_path: str, jp_root_dir: Path) -> HashMapFileIdManager:
+    """Fixture returning a test-configured instance of `HashMapFileIdManager`."""
+    return HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+
+
 @pytest.fixture(params=["local", "arbitrary"])
 def any_fid_manager_class(request: pytest.FixtureRequest) -> Type[BaseFileIdManager]:
-    """Parametrized fixture that runs the test with each of the default File ID
-    manager implementations."""
+    """Parametrized fixture that runs the test with each of the default
+    SQLite-backed File ID manager implementations."""
     class_by_param: Dict[str, Type[BaseFileIdManager]] = {
         "local": LocalFileIdManager,
         "arbitrary": ArbitraryFileIdManager,
@@ -68,12 +102,41 @@ def any_fid_manager_class(request: pytest.FixtureRequest) -> Type[BaseFileIdMana
     return class_by_param[request.param]
 
 
-@pytest.fixture
+@pytest.fixture(
+    params=[
+        "local-sqlite",
+        "local-dbm",
+        "local-sharded",
+        "arbitrary-sqlite",
+        "arbitrary-dbm",
+        "arbitrary-sharded",
+        "hashmap",
+    ]
+)
 def any_fid_manager(
-    any_fid_manager_class: Type[BaseFileIdManager], fid_db_path: str, jp_root_dir: Path
+    request: pytest.FixtureRequest, fid_db_path: str, jp_root_dir: Path
 ) -> BaseFileIdManager:
-    fid_manager = any_fid_manager_class(db_path=fid_db_path, root_dir=str(jp_root_dir))
-    fid_manager.con.execute("PRAGMA journal_mode = OFF")
+    """Parametrized fixture that runs the test with an instance of each of the
+    default File ID manager implementations, on each of the default storage
+    backends if applicable."""
+    class_by_param: Dict[str, Type[BaseFileIdManager]] = {
+        "local": LocalFileIdManager,
+        "arbitrary": ArbitraryFileIdManager,
+        "hashmap": HashMapFileIdManager,
+    }
+    store_class_by_param: Dict[str, Type[BaseFileIdStore]] = {
+        "sqlite": SqliteFileIdStore,
+        "dbm": DbmFileIdStore,
+        "sharded": ShardedSqliteFileIdStore,
+    }
+    manager_param, _, store_param = request.param.partition("-")
+    kwargs: Dict[str, Any] = {}
+    if store_param:
+        kwargs["store_class"] = store_class_by_param[store_param]
+    fid_manager = class_by_param[manager_param](
+        db_path=fid_db_path, root_dir=str(jp_root_dir), **kwargs
+    )
+    _disable_journal(fid_manager)
     return fid_manager
 
 
@@ -0,0 +1,159 @@
+import json
+import sqlite3
+import time
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional
+
+from traitlets import Unicode
+from traitlets.config.configurable import LoggingConfigurable
+
+from .manager import BaseFileIdManager
+from .storage import DuplicateRecordError
+
+# fields of contents events persisted by `EventRecorder`, besides the time of
+# receipt under the key "t".
+RECORDED_FIELDS = ("action", "path", "source_path")
+
+
+class EventRecorder(LoggingConfigurable):
+    """
+    Records contents events received by the File ID extension to a file, such
+    that they may be replayed against a File ID manager offline with
+    `replay()` or `jupyter fileid replay`.
+
+    Each event is appended to `path` as a single line of JSON holding the time
+    of receipt in seconds since the epoch under "t", and the "action", "path",
+    and "source_path" fields of the event, if set.
+    """
+
+    path = Unicode(help="The path of the NDJSON file events are appended to.")
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._file: Optional[IO[str]] = self._open()
+        self.log.info(f"EventRecorder : Recording contents events to {self.path}.")
+
+    def _open(self) -> IO[str]:
+        """Opens the file at `path` for appending, which stays open until
+        `close()`. Line buffered, such that each event is written once
+        recorded."""
+        return open(self.path, "a", buffering=1, encoding="utf-8")
+
+    def record(self, data: Dict[str, Any]) -> None:
+        """Appends a contents event to the file at `path`."""
+        if self._file is None:
+            return
+
+        event: Dict[str, Any] = {"t": round(time.time(), 3)}
+        for field in RECORDED_FIELDS:
+            if data.get(field) is not None:
+                event[field] = data[field]
+        self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields the events recorded by `EventRecorder` to the file at `path`,
+    skipping blank and truncated lines."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(event, dict) and "action" in event:
+                yield event
+
+
+class ActionStats(NamedTuple):
+    """Latencies of replayed events of a single action, in seconds."""
+
+    events: int
+    errors: int
+    p50: float
+    p99: float
+    max: float
+    total: float
+
+
+class ReplayStats(NamedTuple):
+    """Statistics of a replay of recorded events against a File ID manager."""
+
+    events: int
+    skipped: int
+    duration: float
+    records: int
+    actions: Dict[str, ActionStats]
+
+    @property
+    def throughput(self) -> float:
+        """Replayed events per second, excluding skipped events."""
+        replayed = self.events - self.skipped
+        return replayed / self.duration if self.duration else 0.0
+
+
+def replay(
+    manager: BaseFileIdManager,
+    events: Iterator[Dict[str, Any]],
+    original_speed: bool = False,
+) -> ReplayStats:
+    """Applies recorded contents events to `manager` via the handlers returned
+    by its `get_handlers_by_action()`. Events are applied as fast as possible,
+    unless `original_speed` is True, in which case the original intervals
+    between events are kept. Events of actions ignored by the manager are
+    skipped. Events failing with a database, filesystem, or value error are
+    logged and counted, but do not stop the replay. Other exceptions, e.g.
+    from bugs of the manager, propagate."""
+    handlers_by_action = manager.get_handlers_by_action()
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    n_events = skipped = 0
+    first_time: Optional[float] = None
+
+    start = time.perf_counter()
+    for event in events:
+        n_events += 1
+        action = event["action"]
+        handler = handlers_by_action.get(action)
+        if handler is None:
+            skipped += 1
+            continue
+
+        if original_speed and "t" in event:
+            if first_time is None:
+                first_time = event["t"] - (time.perf_counter() - start)
+            delay = event["t"] - first_time - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        data = {field: event.get(field) for field in RECORDED_FIELDS}
+        handler_start = time.perf_counter()
+        try:
+            handler(data)
+        except (ValueError, OSError, sqlite3.Error, DuplicateRecordError) as e:
+            errors[action] = errors.get(action, 0) + 1
+            manager.log.warning(f"Failed to replay {action} event {event}: {e}")
+        latencies.setdefault(action, []).append(time.perf_counter() - handler_start)
+    duration = time.perf_counter() - start
+
+    actions = {}
+    for action, samples in latencies.items():
+        samples.sort()
+        actions[action] = ActionStats(
+            events=len(samples),
+            errors=errors.get(action, 0),
+            p50=samples[len(samples) // 2],
+            p99=samples[min(len(samples) - 1, len(samples) * 99 // 100)],
+            max=samples[-1],
+            total=sum(samples),
+        )
+    return ReplayStats(
+        events=n_events,
+        skipped=skipped,
+        duration=duration,
+        records=manager.count(),
+        actions=actions,
+    )
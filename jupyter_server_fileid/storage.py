@@ -0,0 +1,1984 @@
+import bisect
+import dbm
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import uuid
+from abc import ABC, ABCMeta, abstractmethod
+from contextlib import contextmanager
+from sqlite3 import Connection
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+from urllib.request import pathname2url
+
+from traitlets import Bool, Float, Int, TraitError, Unicode, validate
+from traitlets import Callable as CallableTrait
+from traitlets.config.configurable import LoggingConfigurable
+from traitlets.traitlets import MetaHasTraits
+
+T = TypeVar("T")
+
+
+class FileRecord(NamedTuple):
+    """A record associating a file ID with a path. Records of storage backends
+    without `stat_info` only hold the `id` and `path` fields."""
+
+    id: str
+    path: str
+    ino: Optional[int] = None
+    crtime: Optional[int] = None
+    mtime: Optional[int] = None
+    is_dir: bool = False
+
+
+class DuplicateRecordError(Exception):
+    """Raised by storage backends other than SQLite, which raise
+    `sqlite3.IntegrityError` instead, when a write would give two records the
+    same file ID, the same inode number, or the same path without
+    `stat_info`."""
+
+
+# number of records read at a time by `BaseFileIdStore.dump()`.
+DUMP_BATCH_SIZE = 1000
+
+
+def _file_size(path: str) -> int:
+    """Returns the size in bytes of the file at `path`, or 0 if it does not
+    exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class FileIdStoreMeta(ABCMeta, MetaHasTraits):
+    pass
+
+
+class BaseFileIdStore(ABC, LoggingConfigurable, metaclass=FileIdStoreMeta):
+    """
+    Base class for storage backends of File ID managers. A storage backend
+    persists file records and supports point lookups by ID, path, and inode
+    number, operations on all records under a directory, batched writes, and
+    transactions.
+
+    Notes
+    -----
+    - Write methods do not commit. Callers are expected to wrap their writes in
+    `transaction()`, which commits on exit.
+
+    - Prefix operations accept a `sep` argument, which is the path separator of
+    the paths persisted by the calling manager. The children of `path` are all
+    records whose path starts with `path + sep`.
+    """
+
+    db_path = Unicode(
+        help="The path of the database used by the storage backend.",
+        config=False,
+    )
+
+    root_dir = Unicode(
+        default_value="",
+        help=(
+            "The root directory of the calling manager, in the format of the "
+            "paths it persists. Persisted paths are prefixed by `root_dir`."
+        ),
+        config=False,
+    )
+
+    stat_info = Bool(
+        default_value=False,
+        help=(
+            "Whether records hold the stat info of each file, as required by "
+            "`LocalFileIdManager`. Paths are not unique if enabled, since the "
+            "records of deleted files are kept."
+        ),
+        config=False,
+    )
+
+    def new_id(self, path: str) -> str:
+        """Returns a new file ID for a record at `path`. Returns a random UUID
+        by default."""
+        return str(uuid.uuid4())
+
+    @abstractmethod
+    def get(self, id: str) -> Optional[FileRecord]:
+        """Returns the record with file ID `id`, if any."""
+
+    @abstractmethod
+    def get_by_path(self, path: str) -> Optional[FileRecord]:
+        """Returns a record at `path`, if any."""
+
+    @abstractmethod
+    def get_by_ino(self, ino: int) -> Optional[FileRecord]:
+        """Returns the record with inode number `ino`, if any. Requires
+        `stat_info`."""
+
+    @abstractmethod
+    def get_children(self, path: str, sep: str) -> List[FileRecord]:
+        """Returns the records of all children of the directory at `path`."""
+
+    def list_children(
+        self,
+        path: str,
+        sep: str,
+        recursive: bool,
+        after: Optional[str],
+        limit: int,
+    ) -> List[FileRecord]:
+        """Returns up to `limit` records of the children of the directory at
+        `path`, or of its direct children only unless `recursive`, ordered by
+        path and following the path `after` if given. Lists all records if
+        `path` is empty. By default, all children are read and then
+        filtered."""
+        children = self.get_children(path, sep) if path else list(self.dump())
+        offset = len(path) + 1 if path else 0
+        records = sorted(
+            (
+                record
+                for record in children
+                if (recursive or sep not in record.path[offset:])
+                and (after is None or record.path > after)
+            ),
+            key=lambda record: record.path,
+        )
+        return records[:limit]
+
+    @abstractmethod
+    def get_dirs(self) -> Iterator[Tuple[str, int]]:
+        """Returns an iterator over the path and mtime of all directory
+        records. Requires `stat_info`."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Returns the number of records."""
+
+    def count_dirs(self) -> int:
+        """Returns the number of directory records. Requires `stat_info`."""
+        return sum(1 for _ in self.get_dirs())
+
+    def scan(self, after: str, limit: int) -> List[FileRecord]:
+        """Returns up to `limit` records with a file ID greater than `after`,
+        ordered by file ID, such that all records can be visited in slices.
+        Not supported by default."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support scanning records."
+        )
+
+    def dump(self) -> Iterator[FileRecord]:
+        """Returns an iterator over all records, e.g. to export them. Pages
+        through the records with `scan()` by default."""
+        after = ""
+        while True:
+            records = self.scan(after, DUMP_BATCH_SIZE)
+            yield from records
+            if len(records) < DUMP_BATCH_SIZE:
+                return
+            after = records[-1].id
+
+    @abstractmethod
+    def insert(self, record: FileRecord) -> None:
+        """Inserts a new record."""
+
+    def insert_many(self, records: Iterable[FileRecord]) -> None:
+        """Inserts multiple new records in a single batch."""
+        for record in records:
+            self.insert(record)
+
+    def replace_many(self, records: Iterable[FileRecord]) -> None:
+        """Inserts multiple records in a single batch, replacing any existing
+        records with the same file ID, and any existing records with the same
+        inode number if `stat_info` is enabled, or at the same path otherwise."""
+        for record in records:
+            self.delete(record.id)
+            if self.stat_info:
+                assert record.ino is not None
+                existing = self.get_by_ino(record.ino)
+                if existing is not None:
+                    self.delete(existing.id)
+            else:
+                self.delete_by_path(record.path)
+            self.insert(record)
+
+    @abstractmethod
+    def update(self, id: str, **fields: Any) -> None:
+        """Updates the given fields of the record with file ID `id`."""
+
+    @abstractmethod
+    def delete(self, id: str) -> None:
+        """Deletes the record with file ID `id`."""
+
+    @abstractmethod
+    def delete_by_path(self, path: str) -> None:
+        """Deletes all records at `path`."""
+
+    def move_children(self, old_path: str, new_path: str, sep: str) -> None:
+        """Moves the records of all children of the directory at `old_path` to
+        the directory at `new_path`."""
+        for record in self.get_children(old_path, sep):
+            self.update(record.id, path=new_path + record.path[len(old_path) :])
+
+    def delete_children(self, path: str, sep: str) -> None:
+        """Deletes the records of all children of the directory at `path`."""
+        for record in self.get_children(path, sep):
+            self.delete(record.id)
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[Any]:
+        """Returns a context manager that commits all writes performed within
+        it on exit, or rolls them back if an exception is raised."""
+
+    @abstractmethod
+    def commit(self) -> None:
+        """Commits any pending writes."""
+
+    def checkpoint(self) -> None:
+        """Persists any state held only in memory. Does nothing by default."""
+
+    def vacuum(self) -> bool:
+        """Returns part of the space freed by deleted records to the
+        filesystem, where this can be done incrementally. Returns False if more
+        space remains to be returned. Does nothing by default."""
+        return True
+
+    def wal_checkpoint(self) -> bool:
+        """Writes the changes held in the write-ahead log back to the database
+        and truncates the log. Returns False if the checkpoint could not
+        complete. Does nothing by default."""
+        return True
+
+    def optimize(self) -> None:
+        """Refreshes the statistics used to plan queries. Does nothing by
+        default."""
+
+    def insert_copy(self, path: str, source: str) -> None:
+        """Records the directory at `path` as a lazy copy of the directory at
+        `source`, whose children are given records by the manager on demand.
+        Replaces any lazy copy at `path`. Not supported by default."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not record lazy copies."
+        )
+
+    def get_copy(self, path: str, sep: str) -> Optional[Tuple[str, str]]:
+        """Returns the path and source of the nearest lazy copy at or above
+        `path`, if any. Returns None by default."""
+        return None
+
+    def get_copies(self) -> List[Tuple[str, str]]:
+        """Returns the path and source of every lazy copy, ordered by path.
+        Returns an empty list by default."""
+        return []
+
+    def move_copies(self, old_path: str, new_path: str, sep: str) -> None:
+        """Moves the lazy copies at or below `old_path` to `new_path`, and
+        updates the sources at or below `old_path` likewise. Does nothing by
+        default."""
+
+    def delete_copy(self, path: str) -> None:
+        """Deletes the lazy copy at `path`. Does nothing by default."""
+
+    def delete_copies(self, path: str, sep: str) -> None:
+        """Deletes the lazy copies at or below `path`. Does nothing by
+        default."""
+
+    def get_changes(
+        self, since: int, limit: int
+    ) -> Optional[List[Tuple[int, str, Optional[str], Optional[str]]]]:
+        """Returns up to `limit` changes with a sequence number greater than
+        `since` from the change log, ordered by sequence number. Each change is
+        a tuple of its sequence number, a file ID, the old path of the record,
+        or None if it was inserted, and its new path, or None if it was
+        deleted. Returns None if the changes
+        following `since` are no longer retained. Not supported by default."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not record changes.")
+
+    def last_change(self) -> int:
+        """Returns the sequence number of the last change recorded in the change
+        log, or 0 if none was recorded. Not supported by default."""
+        raise NotImplementedError(f"{self.__class__.__name__} does not record changes.")
+
+    def search(self, query: str, limit: int) -> List[FileRecord]:
+        """Returns up to `limit` records whose path relative to `root_dir`
+        contains `query`, best matches first. Matches in the file name rank
+        above matches in the names of parent directories. Not supported by
+        default."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not maintain a search index."
+        )
+
+    def disk_usage(self) -> Tuple[int, int]:
+        """Returns the sizes in bytes of the database file at `db_path` and of
+        its write-ahead log. Files that do not exist count as empty."""
+        return _file_size(self.db_path), _file_size(self.db_path + "-wal")
+
+    @abstractmethod
+    def close(self) -> None:
+        """Commits any pending writes and closes the storage backend."""
+
+
+class SqliteFileIdStore(BaseFileIdStore):
+    """
+    Storage backend that persists records in the `Files` table of a SQLite
+    database.
+    """
+
+    db_journal_mode = Unicode(
+        default_value="DELETE",
+        help="The journal mode setting for the SQLite database.",
+        config=False,
+    )
+
+    db_in_memory = Bool(
+        default_value=False,
+        help=(
+            "Whether to load the database at `db_path` into memory and serve all "
+            "operations from the in-memory copy until the next `checkpoint()`."
+        ),
+        config=False,
+    )
+
+    change_log_retention = Int(
+        default_value=10000,
+        min=0,
+        help=(
+            "The number of changes of file paths retained in the change log "
+            "served by `GET /api/fileid/changes`. Moves and deletes of records "
+            "are recorded in the same transaction that writes them. "
+            "Disabled if 0."
+        ),
+        config=True,
+    )
+
+    vacuum_pages = Int(
+        default_value=1024,
+        min=0,
+        help=(
+            "The maximum number of free pages returned to the filesystem by each "
+            "vacuum, bounding the time it holds the database. Unbounded if 0."
+        ),
+        config=True,
+    )
+
+    # the change log is pruned whenever the sequence number of a change is a
+    # multiple of this, such that it holds at most `change_log_retention +
+    # CHANGE_LOG_PRUNE_INTERVAL` changes.
+    CHANGE_LOG_PRUNE_INTERVAL = 100
+
+    search_index = Bool(
+        default_value=False,
+        help=(
+            "Whether to maintain a full-text index of the paths of records, "
+            "served by `GET /api/fileid/search`. The index is written in the "
+            "same transaction as the records, and is built from the existing "
+            "records when first enabled. Requires SQLite to be built with FTS5."
+        ),
+        config=True,
+    )
+
+    # weights of matches in the file name and in the relative path of a record
+    # when ranking search results
+    SEARCH_WEIGHTS = (10.0, 1.0)
+
+    busy_timeout = Float(
+        default_value=5.0,
+        help=(
+            "Seconds to wait for a lock held by another connection to the same "
+            "database, e.g. one opened by another Jupyter server sharing `db_path`, "
+            "before failing with 'database is locked'."
+        ),
+        config=True,
+    )
+
+    busy_retries = Int(
+        default_value=3,
+        help=(
+            "The number of times a statement that failed with 'database is locked' "
+            "is retried, when it is safe to do so, after `busy_timeout` elapses."
+        ),
+        config=True,
+    )
+
+    busy_retry_backoff = Float(
+        default_value=0.05,
+        help=(
+            "Seconds to wait before the first retry of a statement that failed "
+            "with 'database is locked'. The delay doubles with each retry, up to "
+            "one second."
+        ),
+        config=True,
+    )
+
+    # settings of each profile. "durable" matches the defaults of SQLite.
+    PROFILES: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "durable": {
+            "synchronous": "FULL",
+            "cache_size": -2000,
+            "mmap_size": 0,
+            "temp_store": "DEFAULT",
+            "cached_statements": 128,
+        },
+        "balanced": {
+            "synchronous": "NORMAL",
+            "cache_size": -16384,
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "MEMORY",
+            "cached_statements": 256,
+        },
+        "fast": {
+            "synchronous": "OFF",
+            "cache_size": -65536,
+            "mmap_size": 1024 * 1024 * 1024,
+            "temp_store": "MEMORY",
+            "cached_statements": 512,
+        },
+    }
+    SYNCHRONOUS_MODES: ClassVar[List[str]] = ["OFF", "NORMAL", "FULL", "EXTRA"]
+    TEMP_STORES: ClassVar[List[str]] = ["DEFAULT", "FILE", "MEMORY"]
+
+    profile = Unicode(
+        default_value="durable",
+        help=(
+            "The profile of performance settings applied to each connection, "
+            f"one of {list(PROFILES)}. 'durable' keeps the defaults of SQLite, "
+            "which sync every commit to disk. 'balanced' syncs less often and "
+            "reads the database file via memory-mapped I/O; with the WAL journal "
+            "mode, it may lose the last commits on power loss but never corrupts "
+            "the database. 'fast' never syncs, and may corrupt the database on "
+            "power loss. Settings configured individually take precedence."
+        ),
+        config=True,
+    )
+
+    synchronous = Unicode(
+        default_value=None,
+        allow_none=True,
+        help=(
+            f"The synchronous setting, one of {SYNCHRONOUS_MODES}. Defaults to "
+            "the setting of `profile`."
+        ),
+        config=True,
+    )
+
+    cache_size = Int(
+        default_value=None,
+        allow_none=True,
+        help=(
+            "The size of the page cache, in pages if positive, or in KiB if "
+            "negative. Defaults to the setting of `profile`."
+        ),
+        config=True,
+    )
+
+    mmap_size = Int(
+        default_value=None,
+        allow_none=True,
+        min=0,
+        help=(
+            "The maximum number of bytes of the database file read via "
+            "memory-mapped I/O, or 0 to disable it. Defaults to the setting of "
+            "`profile`."
+        ),
+        config=True,
+    )
+
+    temp_store = Unicode(
+        default_value=None,
+        allow_none=True,
+        help=(
+            f"Where temporary tables and indices are stored, one of {TEMP_STORES}. "
+            "Defaults to the setting of `profile`."
+        ),
+        config=True,
+    )
+
+    cached_statements = Int(
+        default_value=None,
+        allow_none=True,
+        min=0,
+        help=(
+            "The number of prepared statements cached by each connection. "
+            "Defaults to the setting of `profile`."
+        ),
+        config=True,
+    )
+
+    read_only = Bool(
+        default_value=False,
+        help=(
+            "Whether the database is opened read-only, e.g. by `jupyter fileid "
+            "check`. The database must exist, and is neither created nor "
+            "migrated, nor is its journal mode set. Writes fail."
+        ),
+        config=True,
+    )
+
+    @validate("profile")
+    def _validate_profile(self, proposal: Dict[str, Any]) -> str:
+        if proposal["value"] not in self.PROFILES:
+            raise TraitError(
+                f"profile ('{proposal['value']}') must be one of {list(self.PROFILES)}."
+            )
+        return proposal["value"]
+
+    @validate("synchronous", "temp_store")
+    def _validate_pragma_choice(self, proposal: Dict[str, Any]) -> Optional[str]:
+        value = proposal["value"]
+        name = proposal["trait"].name
+        choices = self.SYNCHRONOUS_MODES if name == "synchronous" else self.TEMP_STORES
+        if value is None:
+            return None
+        if value.upper() not in choices:
+            raise TraitError(f"{name} ('{value}') must be one of {choices}.")
+        return value.upper()
+
+    def _setting(self, name: str) -> Any:
+        """Returns the value of the setting `name`, falling back to the
+        setting of `profile`."""
+        value = getattr(self, name)
+        return self.PROFILES[self.profile][name] if value is None else value
+
+    MAX_BUSY_RETRY_DELAY = 1.0
+
+    # maximum number of rows of each index sampled by `optimize()`.
+    ANALYSIS_LIMIT = 1000
+
+    con: Connection
+
+    # connection to the DB file at `db_path` when `db_in_memory` is enabled.
+    _disk_con: Optional[Connection] = None
+
+    # number of nested `transaction()` blocks currently entered.
+    _depth = 0
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.con = self._connect()
+        self._columns = (
+            "id, path, ino, crtime, mtime, is_dir" if self.stat_info else "id, path"
+        )
+        if not self.read_only:
+            self._create_tables()
+
+    def _connect(self) -> Connection:
+        """Returns a new connection to the database at `db_path`, applying the
+        configured journal mode. If `db_in_memory` is enabled, the database
+        file is instead loaded into an in-memory database via the SQLite backup
+        API, and a connection to the in-memory database is returned."""
+        if not self.db_in_memory or self.db_path == ":memory:":
+            return self._connect_file()
+
+        self._disk_con = self._connect_file()
+        con = sqlite3.connect(
+            ":memory:",
+            isolation_level="IMMEDIATE",
+            cached_statements=self._setting("cached_statements"),
+        )
+        self._retry(self._disk_con.backup, con)
+        self.log.info("SqliteFileIdStore : Loaded database file into memory.")
+        return con
+
+    def _connect_file(self) -> Connection:
+        # begin write transactions with BEGIN IMMEDIATE, which acquires the
+        # write lock upfront. Otherwise, two connections that read before
+        # writing within a transaction may deadlock when both try to upgrade
+        # to a write lock, failing one of them without waiting for the other.
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            con = sqlite3.connect(
+                uri,
+                uri=True,
+                timeout=self.busy_timeout,
+                cached_statements=self._setting("cached_statements"),
+            )
+            # settings of the connection, which do not write to the database
+            for name in ("cache_size", "mmap_size", "temp_store"):
+                con.execute(f"PRAGMA {name} = {self._setting(name)}")
+            return con
+
+        con = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            isolation_level="IMMEDIATE",
+            cached_statements=self._setting("cached_statements"),
+        )
+        # allow free pages to be returned to the filesystem by `vacuum()`. only
+        # takes effect when the database is created, so it must precede the
+        # journal mode, which writes the header of a new database in WAL mode.
+        self._retry(con.execute, "PRAGMA auto_vacuum = INCREMENTAL")
+        self._retry(con.execute, f"PRAGMA journal_mode = {self.db_journal_mode}")
+        for name in ("synchronous", "cache_size", "mmap_size", "temp_store"):
+            con.execute(f"PRAGMA {name} = {self._setting(name)}")
+        return con
+
+    def _retry(self, func: Callable[..., T], *args: Any) -> T:
+        """Calls `func`, retrying with exponential backoff up to `busy_retries`
+        times if it fails because the database is locked. Must only be called
+        with functions that leave the database unchanged if they fail."""
+        delay = self.busy_retry_backoff
+        for _ in range(self.busy_retries):
+            try:
+                return func(*args)
+            except sqlite3.OperationalError as e:
+                if "database is locked" not in str(e):
+                    raise
+            self.log.debug(
+                f"SqliteFileIdStore : Database is locked, retrying in {delay:g}s."
+            )
+            time.sleep(delay * (0.5 + random.random()))
+            delay = min(delay * 2, self.MAX_BUSY_RETRY_DELAY)
+        return func(*args)
+
+    def execute(self, sql: str, params: Any = ()) -> sqlite3.Cursor:
+        """Executes a statement, retrying it if the database is locked and the
+        statement begins a new transaction, such that retrying it is safe."""
+        if self.con.in_transaction:
+            return self.con.execute(sql, params)
+        return self._retry(self.con.execute, sql, params)
+
+    def executemany(self, sql: str, params: Iterable[Any]) -> sqlite3.Cursor:
+        """Executes a statement for each item of `params`. See `execute()`."""
+        if self.con.in_transaction:
+            return self.con.executemany(sql, params)
+        return self._retry(self.con.executemany, sql, list(params))
+
+    def _create_tables(self) -> None:
+        if self.stat_info:
+            self.execute(
+                "CREATE TABLE IF NOT EXISTS Files("
+                "id TEXT PRIMARY KEY NOT NULL, "
+                # uniqueness constraint relaxed here because we need to keep records
+                # of deleted files which may occupy same path
+                "path TEXT NOT NULL, "
+                "ino INTEGER NOT NULL UNIQUE, "
+                "crtime INTEGER, "
+                "mtime INTEGER NOT NULL, "
+                "is_dir TINYINT NOT NULL"
+                ")"
+            )
+            # no need to index ino as it is autoindexed by sqlite via UNIQUE constraint
+            self.execute("CREATE INDEX IF NOT EXISTS ix_Files_path ON Files (path)")
+            self.execute("CREATE INDEX IF NOT EXISTS ix_Files_is_dir ON Files (is_dir)")
+        else:
+            self.execute(
+                "CREATE TABLE IF NOT EXISTS Files("
+                "id TEXT PRIMARY KEY NOT NULL, "
+                "path TEXT NOT NULL UNIQUE"
+                ")"
+            )
+            self.execute("CREATE INDEX IF NOT EXISTS ix_Files_path ON Files (path)")
+        # lazy copies of directories, see `insert_copy()`
+        self.execute(
+            "CREATE TABLE IF NOT EXISTS Copies("
+            "path TEXT PRIMARY KEY NOT NULL, "
+            "source TEXT NOT NULL"
+            ")"
+        )
+        self._create_change_log()
+        self._create_search_index()
+        self.commit()
+
+    def _create_change_log(self) -> None:
+        """Creates the change log and the triggers recording changes into it,
+        or drops the triggers if the change log is disabled. Triggers record
+        changes in the same transaction as the writes to `Files`, whichever
+        statement performs them. The triggers are replaced within a single
+        transaction, such that managers starting concurrently do not
+        interleave."""
+        with self._transaction():
+            self.execute(
+                "CREATE TABLE IF NOT EXISTS Changes("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "id TEXT NOT NULL, "
+                # path of the record before the change
+                "old_path TEXT, "
+                # NULL if the record was deleted
+                "path TEXT"
+                ")"
+            )
+            for trigger in (
+                "Files_insert",
+                "Files_update",
+                "Files_delete",
+                "Changes_prune",
+            ):
+                self.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            if not self.change_log_retention:
+                return
+
+            # inserts are not recorded, since clients only follow file IDs they
+            # already hold, and indexing would flood the change log.
+            self.execute(
+                "CREATE TRIGGER Files_update AFTER UPDATE OF path ON Files "
+                "WHEN old.path IS NOT new.path BEGIN "
+                "INSERT INTO Changes (id, old_path, path) "
+                "VALUES (new.id, old.path, new.path); END"
+            )
+            self.execute(
+                "CREATE TRIGGER Files_delete AFTER DELETE ON Files BEGIN "
+                "INSERT INTO Changes (id, old_path, path) "
+                "VALUES (old.id, old.path, NULL); END"
+            )
+            self.execute(
+                "CREATE TRIGGER Changes_prune AFTER INSERT ON Changes "
+                f"WHEN new.seq % {self.CHANGE_LOG_PRUNE_INTERVAL} = 0 BEGIN "
+                "DELETE FROM Changes "
+                f"WHERE seq <= new.seq - {self.change_log_retention}; END"
+            )
+
+    def _search_columns(self, row: str) -> str:
+        """Returns the values indexed for the record `row`, i.e. `new` within
+        triggers or `Files`: its rowid, its file name, and its path relative to
+        `root_dir`. Values are computed without custom functions, such that
+        records written by any connection are indexed."""
+        root_dir = self.root_dir.rstrip("/\\")
+        offset = len(root_dir) + 2 if root_dir else 1
+        # the file name follows the last separator
+        path = f"replace({row}.path, '\\', '/')"
+        name = f"substr({path}, length(rtrim({path}, replace({path}, '/', ''))) + 1)"
+        return f"{row}.rowid, {name}, substr({row}.path, {offset})"
+
+    def _create_search_index(self) -> None:
+        """Creates the search index and the triggers maintaining it, or drops
+        both if the search index is disabled. The index is rebuilt from the
+        records if it does not exist yet or was built for another `root_dir`."""
+        insert_sql = (
+            "CREATE TRIGGER FilesSearch_insert AFTER INSERT ON Files BEGIN "
+            "INSERT OR REPLACE INTO FilesSearch (rowid, name, path) "
+            f"VALUES ({self._search_columns('new')}); END"
+        )
+        with self._transaction():
+            row = self.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'FilesSearch_insert'"
+            ).fetchone()
+            if self.search_index and row and row[0] == insert_sql:
+                return
+
+            for trigger in (
+                "FilesSearch_insert",
+                "FilesSearch_update",
+                "FilesSearch_delete",
+            ):
+                self.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self.execute("DROP TABLE IF EXISTS FilesSearch")
+            if not self.search_index:
+                return
+
+            self.execute(
+                "CREATE VIRTUAL TABLE FilesSearch "
+                "USING fts5(name, path, tokenize = 'trigram')"
+            )
+            self.execute(
+                "INSERT INTO FilesSearch (rowid, name, path) "
+                f"SELECT {self._search_columns('Files')} FROM Files"
+            )
+            self.execute(insert_sql)
+            self.execute(
+                "CREATE TRIGGER FilesSearch_update AFTER UPDATE OF path ON Files "
+                "WHEN old.path IS NOT new.path BEGIN "
+                "INSERT OR REPLACE INTO FilesSearch (rowid, name, path) "
+                f"VALUES ({self._search_columns('new')}); END"
+            )
+            self.execute(
+                "CREATE TRIGGER FilesSearch_delete AFTER DELETE ON Files BEGIN "
+                "DELETE FROM FilesSearch WHERE rowid = old.rowid; END"
+            )
+
+    def _get_one(self, where: str, params: Tuple[Any, ...]) -> Optional[FileRecord]:
+        row = self.execute(
+            f"SELECT {self._columns} FROM Files WHERE {where}", params
+        ).fetchone()
+        return row and FileRecord(*row)
+
+    def get(self, id: str) -> Optional[FileRecord]:
+        return self._get_one("id = ?", (id,))
+
+    def get_by_path(self, path: str) -> Optional[FileRecord]:
+        return self._get_one("path = ?", (path,))
+
+    def get_by_ino(self, ino: int) -> Optional[FileRecord]:
+        return self._get_one("ino = ?", (ino,))
+
+    @staticmethod
+    def _children_range(path: str, sep: str) -> Tuple[str, str]:
+        """Returns bounds such that `lower <= child < upper` holds for the path
+        of every child of `path`, and for no other path. Range predicates are
+        used over GLOB or LIKE patterns, which treat some characters that may
+        occur in paths as wildcards, and which only use the index on `path` up
+        to the first such character."""
+        return path + sep, path + chr(ord(sep) + 1)
+
+    def get_children(self, path: str, sep: str) -> List[FileRecord]:
+        rows = self.execute(
+            f"SELECT {self._columns} FROM Files WHERE path >= ? AND path < ?",
+            self._children_range(path, sep),
+        ).fetchall()
+        return [FileRecord(*row) for row in rows]
+
+    def list_children(
+        self,
+        path: str,
+        sep: str,
+        recursive: bool,
+        after: Optional[str],
+        limit: int,
+    ) -> List[FileRecord]:
+        """Reads the children with a range scan of the index on `path`. Unless
+        `recursive`, the descendants of each direct child are skipped with a
+        new range scan, such that listing a directory reads one row per direct
+        child, however large its subtree."""
+        lower, upper = self._children_range(path, sep) if path else ("", chr(0x10FFFF))
+        if after is not None and after >= lower:
+            start, inclusive = after, False
+        else:
+            start, inclusive = lower, True
+        records: List[FileRecord] = []
+        while len(records) < limit:
+            rows = self.execute(
+                f"SELECT {self._columns} FROM Files "
+                f"WHERE path {'>=' if inclusive else '>'} ? AND path < ? "
+                "ORDER BY path LIMIT ?",
+                (start, upper, limit - len(records)),
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                record = FileRecord(*row)
+                name, child_sep, _ = record.path[len(lower) :].partition(sep)
+                if recursive or not child_sep:
+                    records.append(record)
+                    start, inclusive = record.path, False
+                    continue
+                # the descendants of a direct child sort contiguously, and
+                # before any path following the direct child and `sep`
+                start, inclusive = lower + name + chr(ord(sep) + 1), True
+                break
+        return records
+
+    def get_dirs(self) -> Iterator[Tuple[str, int]]:
+        return self.execute("SELECT path, mtime FROM Files WHERE is_dir = 1")
+
+    def count(self) -> int:
+        (count,) = self.execute("SELECT COUNT(*) FROM Files").fetchone()
+        return int(count)
+
+    def count_dirs(self) -> int:
+        (count,) = self.execute(
+            "SELECT COUNT(*) FROM Files WHERE is_dir = 1"
+        ).fetchone()
+        return int(count)
+
+    def scan(self, after: str, limit: int) -> List[FileRecord]:
+        rows = self.execute(
+            f"SELECT {self._columns} FROM Files WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        return [FileRecord(*row) for row in rows]
+
+    def dump(self) -> Iterator[FileRecord]:
+        """Reads all records with a single statement, and hence from a
+        consistent snapshot of the database. The records must be consumed
+        before writing with this store."""
+        cursor = self.execute(f"SELECT {self._columns} FROM Files")
+        while True:
+            rows = cursor.fetchmany(DUMP_BATCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield FileRecord(*row)
+
+    def get_changes(
+        self, since: int, limit: int
+    ) -> Optional[List[Tuple[int, str, Optional[str], Optional[str]]]]:
+        if not self.change_log_retention:
+            return super().get_changes(since, limit)
+        (first,) = self.execute("SELECT MIN(seq) FROM Changes").fetchone()
+        if since > self.last_change() or (first is not None and since < first - 1):
+            return None
+        return self.execute(
+            "SELECT seq, id, old_path, path FROM Changes "
+            "WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since, limit),
+        ).fetchall()
+
+    def last_change(self) -> int:
+        if not self.change_log_retention:
+            return super().last_change()
+        row = self.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'Changes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def search(self, query: str, limit: int) -> List[FileRecord]:
+        if not self.search_index:
+            return super().search(query, limit)
+        columns = ", ".join(f"Files.{column}" for column in self._columns.split(", "))
+        if len(query) < 3:
+            # trigrams cannot match shorter queries, which instead match the
+            # start of file names, unranked
+            escaped = re.sub(r"([\\%_])", r"\\\1", query)
+            rows = self.execute(
+                f"SELECT {columns} FROM FilesSearch "
+                "JOIN Files ON Files.rowid = FilesSearch.rowid "
+                "WHERE FilesSearch.name LIKE ? ESCAPE '\\' LIMIT ?",
+                (escaped + "%", limit),
+            ).fetchall()
+        else:
+            weights = ", ".join(str(weight) for weight in self.SEARCH_WEIGHTS)
+            rows = self.execute(
+                f"SELECT {columns} FROM FilesSearch "
+                "JOIN Files ON Files.rowid = FilesSearch.rowid "
+                f"WHERE FilesSearch MATCH ? ORDER BY bm25(FilesSearch, {weights}) "
+                "LIMIT ?",
+                ('"' + query.replace('"', '""') + '"', limit),
+            ).fetchall()
+        return [FileRecord(*row) for row in rows]
+
+    def insert(self, record: FileRecord) -> None:
+        self.insert_many([record])
+
+    def _insert_many(
+        self, records: Iterable[FileRecord], on_conflict: str = ""
+    ) -> None:
+        """Inserts `records`, handling conflicts with the upsert clause
+        `on_conflict` if given."""
+        if self.stat_info:
+            self.executemany(
+                "INSERT INTO Files (id, path, ino, crtime, mtime, is_dir) "
+                "VALUES (?, ?, ?, ?, ?, ?)" + on_conflict,
+                records,
+            )
+        else:
+            self.executemany(
+                "INSERT INTO Files (id, path) VALUES (?, ?)" + on_conflict,
+                (record[:2] for record in records),
+            )
+
+    def insert_many(self, records: Iterable[FileRecord]) -> None:
+        self._insert_many(records)
+
+    def replace_many(self, records: Iterable[FileRecord]) -> None:
+        # conflicting records are deleted, and records with the same file ID
+        # updated, explicitly rather than with INSERT OR REPLACE, whose
+        # deletions do not fire the triggers of the change log and of the
+        # search index. records are written one at a time, such that later
+        # records of the batch replace earlier ones.
+        key = "ino" if self.stat_info else "path"
+        columns = self._columns.split(", ")[1:]
+        on_conflict = " ON CONFLICT (id) DO UPDATE SET " + ", ".join(
+            f"{column} = excluded.{column}" for column in columns
+        )
+        for record in records:
+            self.execute(
+                f"DELETE FROM Files WHERE {key} = ? AND id != ?",
+                (getattr(record, key), record.id),
+            )
+            self._insert_many([record], on_conflict)
+
+    def update(self, id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self.execute(
+            f"UPDATE Files SET {assignments} WHERE id = ?", (*fields.values(), id)
+        )
+
+    def delete(self, id: str) -> None:
+        self.execute("DELETE FROM Files WHERE id = ?", (id,))
+
+    def delete_by_path(self, path: str) -> None:
+        self.execute("DELETE FROM Files WHERE path = ?", (path,))
+
+    def move_children(self, old_path: str, new_path: str, sep: str) -> None:
+        # replace the prefix of all children in a single statement. SQLite's
+        # substr() is 1-indexed, so this keeps the separator following old_path.
+        self.execute(
+            "UPDATE Files SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+            (new_path, len(old_path) + 1, *self._children_range(old_path, sep)),
+        )
+
+    def delete_children(self, path: str, sep: str) -> None:
+        self.execute(
+            "DELETE FROM Files WHERE path >= ? AND path < ?",
+            self._children_range(path, sep),
+        )
+
+    def insert_copy(self, path: str, source: str) -> None:
+        self.execute(
+            "INSERT OR REPLACE INTO Copies (path, source) VALUES (?, ?)", (path, source)
+        )
+
+    def get_copy(self, path: str, sep: str) -> Optional[Tuple[str, str]]:
+        # look up `path` and each of its parents with the primary key
+        candidates = [path]
+        end = path.rfind(sep)
+        while end > 0:
+            candidates.append(path[:end])
+            end = path.rfind(sep, 0, end)
+        placeholders = ", ".join("?" * len(candidates))
+        row = self.execute(
+            f"SELECT path, source FROM Copies WHERE path IN ({placeholders}) "
+            "ORDER BY length(path) DESC LIMIT 1",
+            candidates,
+        ).fetchone()
+        return row and (row[0], row[1])
+
+    def get_copies(self) -> List[Tuple[str, str]]:
+        rows = self.execute("SELECT path, source FROM Copies ORDER BY path")
+        return [(path, source) for path, source in rows]
+
+    def move_copies(self, old_path: str, new_path: str, sep: str) -> None:
+        params = (new_path, len(old_path) + 1, old_path)
+        lower, upper = self._children_range(old_path, sep)
+        self.execute(
+            "UPDATE OR REPLACE Copies SET path = ? || substr(path, ?) "
+            "WHERE path = ? OR (path >= ? AND path < ?)",
+            (*params, lower, upper),
+        )
+        self.execute(
+            "UPDATE Copies SET source = ? || substr(source, ?) "
+            "WHERE source = ? OR (source >= ? AND source < ?)",
+            (*params, lower, upper),
+        )
+
+    def delete_copy(self, path: str) -> None:
+        self.execute("DELETE FROM Copies WHERE path = ?", (path,))
+
+    def delete_copies(self, path: str, sep: str) -> None:
+        self.execute(
+            "DELETE FROM Copies WHERE path = ? OR (path >= ? AND path < ?)",
+            (path, *self._children_range(path, sep)),
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        if self._depth == 0 and not self.con.in_transaction:
+            # acquire the write lock before any reads, such that no other
+            # connection may write between the reads and writes of this
+            # transaction. retrying is safe since nothing has been done yet.
+            self._retry(self.con.execute, "BEGIN IMMEDIATE")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self.con.rollback()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self.commit()
+
+    def transaction(self) -> ContextManager[Any]:
+        return self._transaction()
+
+    def commit(self) -> None:
+        # a failed commit leaves the transaction open, so it may be retried.
+        self._retry(self.con.commit)
+
+    def wal_checkpoint(self) -> bool:
+        """Runs `PRAGMA wal_checkpoint(TRUNCATE)`, without waiting for locks
+        held by other connections, such that it never blocks. Does nothing
+        unless the database is in WAL mode."""
+        self.commit()
+        self.con.execute("PRAGMA busy_timeout = 0")
+        try:
+            (busy, _, _) = self.con.execute(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+        finally:
+            self.con.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        return not busy
+
+    def optimize(self) -> None:
+        """Runs `ANALYZE` if the database was never analyzed, and
+        `PRAGMA optimize` otherwise. At most `ANALYSIS_LIMIT` rows of each
+        index are sampled, such that this takes bounded time on large
+        databases."""
+        self.commit()
+        self.execute(f"PRAGMA analysis_limit = {self.ANALYSIS_LIMIT}")
+        analyzed = self.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()
+        self.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+
+    def vacuum(self) -> bool:
+        """Frees up to `vacuum_pages` unused pages of the database file. Only
+        databases created by this class support incremental vacuum, so this
+        does nothing on databases created with an earlier version. Commits any
+        pending writes, so it must not be called within `transaction()`."""
+        # the pragma frees a single page each time it is stepped, but `execute()`
+        # only steps statements without result columns once.
+        self.commit()
+        if self.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return True
+        self._retry(
+            self.con.executescript, f"PRAGMA incremental_vacuum({self.vacuum_pages})"
+        )
+        return not self.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def checkpoint(self) -> None:
+        """Writes the in-memory database back to `db_path` in a single
+        transaction, such that the file on disk always holds a complete
+        snapshot. Does nothing unless `db_in_memory` is enabled."""
+        if self._disk_con is None:
+            return
+
+        self.commit()
+        self._retry(self.con.backup, self._disk_con)
+
+    def close(self) -> None:
+        """Commits any pending transactions, checkpoints the in-memory database
+        if `db_in_memory` is enabled, and closes all connections."""
+        self.commit()
+        self.checkpoint()
+        self.con.close()
+        if self._disk_con is not None:
+            self._disk_con.close()
+            self._disk_con = None
+
+
+class DbmFileIdStore(BaseFileIdStore):
+    """
+    Storage backend that persists records in a key-value database opened with
+    the standard library `dbm` module, which uses the best implementation
+    available on the platform (e.g. GDBM or NDBM, falling back to `dbm.dumb`).
+
+    Each record is stored under its file ID, alongside secondary keys mapping
+    each path to the file IDs at that path and each inode number to its file
+    ID. Paths are also indexed as a tree, where each path maps to the names of
+    its children that hold records or have descendants holding records, and
+    the number of records is kept under its own key.
+
+    Notes
+    -----
+    - Writes performed within `transaction()` are buffered in memory and only
+    written to the database on commit.
+
+    - `dbm` databases do not support ordered iteration over keys, so prefix
+    operations walk the tree of paths, and take time proportional to the
+    number of descendants. `get_dirs()` and `dump()` scan every key in the
+    database, and so does `scan()` at the start of each pass, i.e. when
+    `after` is empty. Later pages of the pass are sliced from the sorted file
+    IDs collected then, along with the file IDs inserted since.
+
+    - Deleted keys are kept with an empty value, and reused once written
+    again.
+
+    - Paths are split into names at forward slashes and at `os.sep`, such
+    that the tree serves managers persisting either separator.
+
+    - `db_path` may not be ':memory:', and may not be shared with a SQLite
+    database, since some `dbm` implementations create a file at `db_path`.
+    """
+
+    _DELETED = None
+
+    _COUNT_KEY = "n/records"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._db = self._open_db()
+        # writes buffered by the current transaction, where a value of
+        # `_DELETED` marks a deleted key.
+        self._pending: Dict[str, Optional[str]] = {}
+        # child lists of the tree of paths modified by the current
+        # transaction, serialized into `_pending` on commit
+        self._children: Dict[str, Set[str]] = {}
+        # sorted file IDs collected at the start of the current pass of
+        # `scan()`, and the file IDs inserted since then
+        self._scan_ids: Optional[List[str]] = None
+        self._inserted_ids: List[str] = []
+        self._depth = 0
+        if self._get(self._COUNT_KEY) is None:
+            self._build_index()
+
+    def _open_db(self) -> Any:
+        """Opens the database at `db_path`, which is held open for the lifetime
+        of the store and closed by `close()`."""
+        return dbm.open(self.db_path, "c")
+
+    def _build_index(self) -> None:
+        """Builds the tree of paths and the number of records of a database
+        created before they were maintained."""
+        count = 0
+        for key in self._keys("r/"):
+            record = self.get(key[2:])
+            if record is not None:
+                self._link(record.path)
+                count += 1
+        self._set(self._COUNT_KEY, str(count))
+        self.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        if key in self._pending:
+            return self._pending[key]
+        value = self._db.get(key)
+        # an empty value marks a deleted key, see `commit()`
+        return value.decode() if value else None
+
+    def _set(self, key: str, value: Optional[str]) -> None:
+        self._pending[key] = value
+
+    @staticmethod
+    def _split(path: str) -> Tuple[str, str]:
+        """Returns the parent of `path` and the name of `path` in it, including
+        the separator preceding it. The parent is empty if `path` has none."""
+        end = max(path.rfind("/"), path.rfind(os.sep))
+        return (path[:end], path[end:]) if end >= 0 else ("", "")
+
+    def _names(self, path: str) -> Set[str]:
+        """Returns the names of the children of `path` in the tree of paths."""
+        names = self._children.get(path)
+        if names is None:
+            value = self._get("c/" + path)
+            names = set() if value is None else set(json.loads(value))
+            self._children[path] = names
+        return names
+
+    def _link(self, path: str) -> None:
+        """Adds `path` to the tree of paths, along with its ancestors."""
+        parent, name = self._split(path)
+        while name:
+            names = self._names(parent)
+            if name in names:
+                return
+            names.add(name)
+            parent, name = self._split(parent)
+
+    def _unlink(self, path: str) -> None:
+        """Removes `path` from the tree of paths, along with its ancestors,
+        unless they hold records or have descendants holding records."""
+        while not self._get_ids(path) and not self._names(path):
+            parent, name = self._split(path)
+            if not name:
+                return
+            self._names(parent).discard(name)
+            path = parent
+
+    def _keys(self, prefix: str) -> List[str]:
+        """Returns all keys beginning with `prefix`, including pending keys."""
+        # not all `dbm` implementations support iteration
+        keys = set(map(bytes.decode, self._db.keys()))
+        keys.update(self._pending)
+        return [
+            key
+            for key in keys
+            if key.startswith(prefix) and self._get(key) is not self._DELETED
+        ]
+
+    def _load(self, id: str, value: str) -> FileRecord:
+        return FileRecord(id, *json.loads(value))
+
+    def get(self, id: str) -> Optional[FileRecord]:
+        value = self._get("r/" + id)
+        return None if value is None else self._load(id, value)
+
+    def _get_ids(self, path: str) -> List[str]:
+        value = self._get("p/" + path)
+        return [] if value is None else list(json.loads(value))
+
+    def get_by_path(self, path: str) -> Optional[FileRecord]:
+        ids = self._get_ids(path)
+        return self.get(ids[0]) if ids else None
+
+    def get_by_ino(self, ino: int) -> Optional[FileRecord]:
+        id = self._get(f"i/{ino}")
+        return None if id is None else self.get(id)
+
+    def get_children(self, path: str, sep: str) -> List[FileRecord]:
+        records = []
+        parents = [path]
+        while parents:
+            parent = parents.pop()
+            for name in self._names(parent):
+                if parent == path and not name.startswith(sep):
+                    continue
+                child = parent + name
+                parents.append(child)
+                for id in self._get_ids(child):
+                    record = self.get(id)
+                    if record is not None:
+                        records.append(record)
+        return records
+
+    def get_dirs(self) -> Iterator[Tuple[str, int]]:
+        dirs = []
+        for key in self._keys("r/"):
+            record = self.get(key[2:])
+            if record is not None and record.is_dir:
+                assert record.mtime is not None
+                dirs.append((record.path, record.mtime))
+        return iter(dirs)
+
+    def scan(self, after: str, limit: int) -> List[FileRecord]:
+        if self._scan_ids is None or not after:
+            self._scan_ids = sorted(key[2:] for key in self._keys("r/"))
+        elif self._inserted_ids:
+            # merges two sorted runs in linear time
+            self._scan_ids.extend(sorted(self._inserted_ids))
+            self._scan_ids.sort()
+        self._inserted_ids = []
+
+        ids = self._scan_ids
+        records: List[FileRecord] = []
+        i = bisect.bisect_right(ids, after)
+        while i < len(ids) and len(records) < limit:
+            # deleted records are skipped, and reinserted ones listed twice
+            if not records or ids[i] != records[-1].id:
+                record = self.get(ids[i])
+                if record is not None:
+                    records.append(record)
+            i += 1
+        return records
+
+    def dump(self) -> Iterator[FileRecord]:
+        for key in self._keys("r/"):
+            record = self.get(key[2:])
+            if record is not None:
+                yield record
+
+    def count(self) -> int:
+        return int(self._get(self._COUNT_KEY) or 0)
+
+    def _add_count(self, delta: int) -> None:
+        self._set(self._COUNT_KEY, str(self.count() + delta))
+
+    def _add_path(self, path: str, id: str) -> None:
+        ids = self._get_ids(path)
+        if self.stat_info:
+            ids.append(id)
+        elif ids:
+            raise DuplicateRecordError(f"A record at path {path} already exists.")
+        else:
+            ids = [id]
+        self._set("p/" + path, json.dumps(ids))
+        self._link(path)
+
+    def _remove_path(self, path: str, id: str) -> None:
+        ids = [other_id for other_id in self._get_ids(path) if other_id != id]
+        self._set("p/" + path, json.dumps(ids) if ids else self._DELETED)
+        self._unlink(path)
+
+    def _put(self, record: FileRecord) -> None:
+        fields = list(record[1:]) if self.stat_info else [record.path]
+        self._set("r/" + record.id, json.dumps(fields))
+
+    def insert(self, record: FileRecord) -> None:
+        if self._get("r/" + record.id) is not None:
+            raise DuplicateRecordError(f"A record with ID {record.id} already exists.")
+        if self.stat_info:
+            if self._get(f"i/{record.ino}") is not None:
+                raise DuplicateRecordError(
+                    f"A record with inode number {record.ino} already exists."
+                )
+            self._set(f"i/{record.ino}", record.id)
+        self._add_path(record.path, record.id)
+        self._put(record)
+        self._add_count(1)
+        if self._scan_ids is not None:
+            self._inserted_ids.append(record.id)
+
+    def update(self, id: str, **fields: Any) -> None:
+        record = self.get(id)
+        if record is None:
+            return
+
+        new_record = record._replace(**fields)
+        if new_record == record:
+            return
+        if new_record.ino != record.ino:
+            if self._get(f"i/{new_record.ino}") is not None:
+                raise DuplicateRecordError(
+                    f"A record with inode number {new_record.ino} already exists."
+                )
+            self._set(f"i/{record.ino}", self._DELETED)
+            self._set(f"i/{new_record.ino}", id)
+        if new_record.path != record.path:
+            self._remove_path(record.path, id)
+            self._add_path(new_record.path, id)
+        self._put(new_record)
+
+    def delete(self, id: str) -> None:
+        record = self.get(id)
+        if record is None:
+            return
+
+        self._remove_path(record.path, id)
+        if self.stat_info:
+            self._set(f"i/{record.ino}", self._DELETED)
+        self._set("r/" + id, self._DELETED)
+        self._add_count(-1)
+
+    def delete_by_path(self, path: str) -> None:
+        for id in self._get_ids(path):
+            self.delete(id)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self._pending.clear()
+                self._children.clear()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self.commit()
+
+    def transaction(self) -> ContextManager[Any]:
+        return self._transaction()
+
+    def commit(self) -> None:
+        for path, names in self._children.items():
+            self._set(
+                "c/" + path, json.dumps(sorted(names)) if names else self._DELETED
+            )
+        self._children.clear()
+        if not self._pending:
+            return
+
+        for key, value in self._pending.items():
+            if value is self._DELETED:
+                # deleted keys are emptied rather than deleted, as `dbm.dumb`
+                # rewrites its whole index on each deletion
+                if key in self._db:
+                    self._db[key] = b""
+            else:
+                self._db[key] = value
+        self._pending.clear()
+        if hasattr(self._db, "sync"):
+            self._db.sync()
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+
+class ShardedSqliteFileIdStore(BaseFileIdStore):
+    """
+    Storage backend that partitions records across multiple SQLite databases
+    ("shards") by the top-level subtree of their path, intended for large
+    multi-tenant roots where each tenant owns a subtree of `root_dir`.
+
+    Records of paths at most `shard_depth` levels below `root_dir` live in the
+    main database at `db_path`. All other records live in the shard named by
+    the first `shard_depth` components of their path relative to `root_dir`,
+    unless `shard_function` is set. Shards are stored under
+    `{db_path}.shards/` and are only created when a record is first written to
+    them.
+
+    File IDs of records created in a shard are prefixed by the shard name and
+    a period, such that lookups by ID are routed to a single shard. Records
+    moved across shards keep their file ID, and are found through the
+    `Forwarding` table of the main database.
+
+    Notes
+    -----
+    - Writes to all shards are committed together when the outermost
+    `transaction()` exits, and rolled back together if it raises. Since
+    SQLite cannot commit several databases atomically, moves across shards
+    are recorded in the `Relocations` table of the main database, which is
+    committed before the other shards and cleared after them, such that a
+    move interrupted by a crash during commit is completed the next time the
+    store is opened.
+
+    - Lookups by inode number and `get_dirs()` query every shard, and so do
+    prefix operations on directories less than `shard_depth` levels below
+    `root_dir`.
+    """
+
+    db_journal_mode = Unicode(
+        default_value="DELETE",
+        help="The journal mode setting for every SQLite database.",
+        config=False,
+    )
+
+    db_in_memory = Bool(
+        default_value=False,
+        help=(
+            "Whether to load every SQLite database into memory. See "
+            "`SqliteFileIdStore.db_in_memory`."
+        ),
+        config=False,
+    )
+
+    shard_depth = Int(
+        default_value=1,
+        help=(
+            "The number of leading path components, relative to the root "
+            "directory, that determine the shard of a record. Records of paths "
+            "with at most this many components are kept in the main database."
+        ),
+        config=True,
+    )
+
+    @validate("shard_depth")
+    def _validate_shard_depth(self, proposal: Dict[str, Any]) -> int:
+        value = proposal["value"]
+        if value < 1:
+            raise TraitError(f"shard_depth ({value}) must be at least 1.")
+        return value
+
+    shard_function = CallableTrait(
+        default_value=None,
+        allow_none=True,
+        help=(
+            "A function that accepts a path relative to the root directory, "
+            "delimited by forward slashes, and returns the key of the shard "
+            "holding the record at that path, or None to keep it in the main "
+            "database. Overrides `shard_depth` if set. Must return the same key "
+            "for a directory and all of its children, unless it returns None "
+            "for the directory."
+        ),
+        config=True,
+    )
+
+    MAIN_SHARD = ""
+    SHARD_SUFFIX = ".db"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._shards: Dict[str, SqliteFileIdStore] = {}
+        self._depth = 0
+        # file IDs of the relocations whose intent is cleared on commit
+        self._relocating: Set[str] = set()
+        self._main = self._open_shard(self.MAIN_SHARD, self.db_path)
+        self._main.execute(
+            "CREATE TABLE IF NOT EXISTS Forwarding("
+            "id TEXT PRIMARY KEY NOT NULL, "
+            "shard TEXT NOT NULL"
+            ")"
+        )
+        self._main.execute(
+            "CREATE TABLE IF NOT EXISTS Relocations("
+            "id TEXT PRIMARY KEY NOT NULL, "
+            "src TEXT NOT NULL, "
+            "dst TEXT NOT NULL, "
+            "path TEXT NOT NULL"
+            ")"
+        )
+        self._main.commit()
+        self._recover()
+
+    @property
+    def con(self) -> Connection:
+        """The connection to the main database."""
+        return self._main.con
+
+    @property
+    def shards_dir(self) -> Optional[str]:
+        """The directory holding the shard databases, or None if `db_path` is
+        ':memory:'."""
+        return None if self.db_path == ":memory:" else self.db_path + ".shards"
+
+    def _open_shard(self, name: str, db_path: str) -> SqliteFileIdStore:
+        shard = SqliteFileIdStore(
+            config=self.config,
+            log=self.log,
+            db_path=db_path,
+            root_dir=self.root_dir,
+            stat_info=self.stat_info,
+            db_journal_mode=self.db_journal_mode,
+            db_in_memory=self.db_in_memory,
+            # sequence numbers would not be ordered across shards
+            change_log_retention=0,
+            search_index=False,
+        )
+        self._shards[name] = shard
+        return shard
+
+    def _shard(self, name: str, create: bool = False) -> Optional[SqliteFileIdStore]:
+        """Returns the shard named `name`. Returns None if the shard does not
+        exist yet, unless `create` is True."""
+        if name in self._shards:
+            return self._shards[name]
+
+        shards_dir = self.shards_dir
+        if shards_dir is None:
+            return self._open_shard(name, ":memory:") if create else None
+
+        db_path = os.path.join(shards_dir, name + self.SHARD_SUFFIX)
+        if not os.path.exists(db_path):
+            if not create:
+                return None
+            os.makedirs(shards_dir, exist_ok=True)
+        return self._open_shard(name, db_path)
+
+    def _all_shards(self) -> Dict[str, SqliteFileIdStore]:
+        """Returns all shards by name, opening any shards not yet opened."""
+        shards_dir = self.shards_dir
+        if shards_dir is not None and os.path.isdir(shards_dir):
+            for filename in os.listdir(shards_dir):
+                name = filename[: -len(self.SHARD_SUFFIX)]
+                if filename.endswith(self.SHARD_SUFFIX) and self._is_shard_name(name):
+                    self._shard(name)
+        return dict(self._shards)
+
+    def _is_shard_name(self, name: str) -> bool:
+        # guards against file IDs that would otherwise address arbitrary files
+        return name == self.MAIN_SHARD or re.fullmatch("[0-9a-f]{16}", name) is not None
+
+    def _relpath(self, path: str) -> str:
+        """Returns `path` relative to `root_dir`, delimited by forward slashes."""
+        root_dir = self.root_dir.rstrip("/" + os.sep)
+        if root_dir and (
+            path == root_dir or path[len(root_dir) : len(root_dir) + 1] in ("/", os.sep)
+        ):
+            path = path[len(root_dir) :]
+        if os.sep != "/":
+            path = path.replace(os.sep, "/")
+        return "/".join(part for part in path.split("/") if part)
+
+    def shard_name(self, path: str) -> str:
+        """Returns the name of the shard holding the record at `path`, which is
+        `MAIN_SHARD` for the main database."""
+        relpath = self._relpath(path)
+        if self.shard_function is not None:
+            key = self.shard_function(relpath)
+        else:
+            parts = relpath.split("/")
+            key = (
+                "/".join(parts[: self.shard_depth])
+                if len(parts) > self.shard_depth
+                else None
+            )
+        if key is None:
+            return self.MAIN_SHARD
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def _prefix_shards(self, path: str) -> Dict[str, SqliteFileIdStore]:
+        """Returns the shards that may hold children of the directory at
+        `path` by name."""
+        relpath = self._relpath(path)
+        # all children share the leading components of `path`
+        if (
+            self.shard_function is None
+            and relpath
+            and len(relpath.split("/")) >= self.shard_depth
+        ):
+            name = self.shard_name(path + "/_")
+            shard = self._shard(name)
+            return {} if shard is None else {name: shard}
+        return self._all_shards()
+
+    def new_id(self, path: str) -> str:
+        name = self.shard_name(path)
+        id = str(uuid.uuid4())
+        return f"{name}.{id}" if name != self.MAIN_SHARD else id
+
+    def _locate(self, id: str) -> Optional[Tuple[str, FileRecord]]:
+        """Returns the name of the shard holding the record with file ID `id`
+        and the record itself, if any."""
+        name = id.rpartition(".")[0]
+        record = self._get_from(name, id) if self._is_shard_name(name) else None
+        if record is not None:
+            return name, record
+
+        row = self._main.execute(
+            "SELECT shard FROM Forwarding WHERE id = ?", (id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = self._get_from(row[0], id)
+        return None if record is None else (row[0], record)
+
+    def _get_from(self, name: str, id: str) -> Optional[FileRecord]:
+        shard = self._shard(name)
+        return None if shard is None else shard.get(id)
+
+    def get(self, id: str) -> Optional[FileRecord]:
+        located = self._locate(id)
+        return None if located is None else located[1]
+
+    def get_by_path(self, path: str) -> Optional[FileRecord]:
+        shard = self._shard(self.shard_name(path))
+        return None if shard is None else shard.get_by_path(path)
+
+    def get_by_ino(self, ino: int) -> Optional[FileRecord]:
+        for shard in self._all_shards().values():
+            record = shard.get_by_ino(ino)
+            if record is not None:
+                return record
+        return None
+
+    def get_children(self, path: str, sep: str) -> List[FileRecord]:
+        records = []
+        for shard in self._prefix_shards(path).values():
+            records.extend(shard.get_children(path, sep))
+        return records
+
+    def get_dirs(self) -> Iterator[Tuple[str, int]]:
+        for shard in self._all_shards().values():
+            yield from shard.get_dirs()
+
+    def count(self) -> int:
+        return sum(shard.count() for shard in self._all_shards().values())
+
+    def count_dirs(self) -> int:
+        return sum(shard.count_dirs() for shard in self._all_shards().values())
+
+    def scan(self, after: str, limit: int) -> List[FileRecord]:
+        records: List[FileRecord] = []
+        for shard in self._all_shards().values():
+            records.extend(shard.scan(after, limit))
+        records.sort(key=lambda record: record.id)
+        return records[:limit]
+
+    def dump(self) -> Iterator[FileRecord]:
+        """Reads the records of each shard from a consistent snapshot of that
+        shard. Snapshots of different shards may differ in time."""
+        for shard in self._all_shards().values():
+            yield from shard.dump()
+
+    def insert(self, record: FileRecord) -> None:
+        self.insert_many([record])
+
+    def replace_many(self, records: Iterable[FileRecord]) -> None:
+        by_shard: Dict[str, List[FileRecord]] = {}
+        forwarded = []
+        for record in records:
+            dst = self.shard_name(record.path)
+            located = self._locate(record.id)
+            if located is not None and located[0] != dst:
+                self.delete(record.id)
+            if record.id.rpartition(".")[0] != dst:
+                # the file ID does not encode the shard of the record
+                forwarded.append((record.id, dst))
+            by_shard.setdefault(dst, []).append(record)
+        for name, shard_records in by_shard.items():
+            shard = self._shard(name, create=True)
+            assert shard is not None
+            shard.replace_many(shard_records)
+        self._main.executemany(
+            "INSERT OR REPLACE INTO Forwarding (id, shard) VALUES (?, ?)", forwarded
+        )
+
+    def insert_many(self, records: Iterable[FileRecord]) -> None:
+        by_shard: Dict[str, List[FileRecord]] = {}
+        for record in records:
+            by_shard.setdefault(self.shard_name(record.path), []).append(record)
+        for name, shard_records in by_shard.items():
+            shard = self._shard(name, create=True)
+            assert shard is not None
+            shard.insert_many(shard_records)
+
+    def update(self, id: str, **fields: Any) -> None:
+        located = self._locate(id)
+        if located is None:
+            return
+
+        src, record = located
+        if "path" in fields:
+            dst = self.shard_name(fields["path"])
+            if dst != src:
+                self._relocate([(record._replace(**fields), src, dst)])
+                return
+        shard = self._shard(src)
+        assert shard is not None
+        shard.update(id, **fields)
+
+    def delete(self, id: str) -> None:
+        located = self._locate(id)
+        if located is None:
+            return
+
+        shard = self._shard(located[0])
+        assert shard is not None
+        shard.delete(id)
+        self._main.execute("DELETE FROM Forwarding WHERE id = ?", (id,))
+
+    def delete_by_path(self, path: str) -> None:
+        shard = self._shard(self.shard_name(path))
+        if shard is not None:
+            shard.delete_by_path(path)
+
+    def move_children(self, old_path: str, new_path: str, sep: str) -> None:
+        relocations: List[Tuple[FileRecord, str, str]] = []
+        for src, shard in self._prefix_shards(old_path).items():
+            records = shard.get_children(old_path, sep)
+            moved = [
+                record._replace(path=new_path + record.path[len(old_path) :])
+                for record in records
+            ]
+            dsts = [self.shard_name(record.path) for record in moved]
+            if all(dst == src for dst in dsts):
+                shard.move_children(old_path, new_path, sep)
+            else:
+                relocations.extend(
+                    (record, src, dst) for record, dst in zip(moved, dsts)
+                )
+        self._relocate(relocations)
+
+    def delete_children(self, path: str, sep: str) -> None:
+        for shard in self._prefix_shards(path).values():
+            shard.delete_children(path, sep)
+
+    def _relocate(self, relocations: List[Tuple[FileRecord, str, str]]) -> None:
+        """Moves each given record from shard `src` to shard `dst`. An intent
+        to move each record is written to the main database, which is committed
+        first, so that a move interrupted during commit is completed by
+        `_recover()`."""
+        if not relocations:
+            return
+
+        self._main.executemany(
+            "INSERT OR REPLACE INTO Relocations (id, src, dst, path) "
+            "VALUES (?, ?, ?, ?)",
+            ((record.id, src, dst, record.path) for record, src, dst in relocations),
+        )
+        self._apply_relocations(relocations)
+
+    def _apply_relocations(
+        self, relocations: List[Tuple[FileRecord, str, str]]
+    ) -> None:
+        """Writes the given moves to the shards without committing. Their
+        intents are cleared once the shards are committed."""
+        # the steps below are idempotent, so they may be repeated on recovery.
+        by_dst: Dict[str, List[FileRecord]] = {}
+        by_src: Dict[str, List[str]] = {}
+        for record, src, dst in relocations:
+            by_dst.setdefault(dst, []).append(record)
+            by_src.setdefault(src, []).append(record.id)
+
+        for dst, records in by_dst.items():
+            dst_shard = self._shard(dst, create=True)
+            assert dst_shard is not None
+            dst_shard.executemany(
+                "DELETE FROM Files WHERE id = ?",
+                ((record.id,) for record in records),
+            )
+            dst_shard.insert_many(records)
+
+        for src, ids in by_src.items():
+            src_shard = self._shard(src)
+            if src_shard is None:
+                continue
+            src_shard.executemany(
+                "DELETE FROM Files WHERE id = ?", ((id,) for id in ids)
+            )
+
+        self._main.executemany(
+            "INSERT OR REPLACE INTO Forwarding (id, shard) VALUES (?, ?)",
+            ((record.id, dst) for record, _, dst in relocations),
+        )
+        self._relocating.update(record.id for record, _, _ in relocations)
+
+    def _recover(self) -> None:
+        """Completes any moves across shards interrupted before their intents
+        were cleared from the `Relocations` table."""
+        rows = self._main.execute(
+            "SELECT id, src, dst, path FROM Relocations"
+        ).fetchall()
+        if not rows:
+            return
+
+        relocations = []
+        for id, src, dst, path in rows:
+            # the record is in `src` until the move is complete, and in `dst`
+            # if the move was interrupted after deleting it from `src`.
+            for name in (src, dst):
+                record = self._get_from(name, id)
+                if record is not None:
+                    relocations.append((record._replace(path=path), src, dst))
+                    break
+        try:
+            with self._transaction():
+                self._apply_relocations(relocations)
+        except sqlite3.IntegrityError as e:
+            self._main.execute("DELETE FROM Relocations")
+            self._main.commit()
+            self.log.warning(
+                f"ShardedSqliteFileIdStore : Abandoned interrupted moves across "
+                f"shards: {e}"
+            )
+            return
+        self.log.info(
+            f"ShardedSqliteFileIdStore : Recovered {len(rows)} interrupted moves "
+            "across shards."
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self._rollback()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            self.commit()
+
+    def transaction(self) -> ContextManager[Any]:
+        return self._transaction()
+
+    def _rollback(self) -> None:
+        for shard in self._shards.values():
+            shard.con.rollback()
+        self._relocating.clear()
+
+    def commit(self) -> None:
+        # the main database holds the intents of relocations, which must be
+        # committed before the shards they relocate records across
+        self._main.commit()
+        for name, shard in self._shards.items():
+            if name != self.MAIN_SHARD:
+                shard.commit()
+        if self._relocating:
+            self._main.executemany(
+                "DELETE FROM Relocations WHERE id = ?",
+                ((id,) for id in self._relocating),
+            )
+            self._main.commit()
+            self._relocating.clear()
+
+    def checkpoint(self) -> None:
+        for shard in self._shards.values():
+            shard.checkpoint()
+
+    def vacuum(self) -> bool:
+        results = [shard.vacuum() for shard in self._shards.values()]
+        return all(results)
+
+    def wal_checkpoint(self) -> bool:
+        results = [shard.wal_checkpoint() for shard in self._shards.values()]
+        return all(results)
+
+    def optimize(self) -> None:
+        for shard in self._shards.values():
+            shard.optimize()
+
+    def disk_usage(self) -> Tuple[int, int]:
+        db_size = wal_size = 0
+        for shard in self._all_shards().values():
+            shard_db_size, shard_wal_size = shard.disk_usage()
+            db_size += shard_db_size
+            wal_size += shard_wal_size
+        return db_size, wal_size
+
+    def close(self) -> None:
+        if self._shards:
+            self.commit()
+        for shard in self._shards.values():
+            shard.close()
+        self._shards.clear()
@@ -0,0 +1,227 @@
+"""
+Opt-in tracing of File ID manager operations, enabled by setting
+`BaseFileIdManager.slow_operation_threshold`.
+
+Tracing is installed on a single manager instance by wrapping its public
+methods, its `_stat()` method, and the methods of its storage backend with
+instance attributes, such that managers without tracing run the unmodified
+class methods and pay no cost at all. Statements are counted with
+`Connection.set_trace_callback()` on the connection of SQLite storage backends.
+"""
+
+import contextlib
+import functools
+import time
+from collections import Counter
+from sqlite3 import Connection
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from .manager import BaseFileIdManager
+
+# public methods of File ID managers traced as operations. calls nested within
+# another operation count towards the outer operation.
+OPERATIONS = (
+    "index",
+    "get_id",
+    "get_path",
+    "move",
+    "copy",
+    "delete",
+    "save",
+    "_sync_all",
+    "collect_garbage",
+)
+
+# methods of storage backends whose duration counts as time spent in the
+# database.
+STORE_METHODS = (
+    "get",
+    "get_by_path",
+    "get_by_ino",
+    "get_children",
+    "get_dirs",
+    "count",
+    "insert",
+    "insert_many",
+    "update",
+    "delete",
+    "delete_by_path",
+    "move_children",
+    "delete_children",
+    "scan",
+    "transaction",
+    "commit",
+    "vacuum",
+)
+
+# maximum length of the arguments and statements included in log messages.
+MAX_LOGGED_LENGTH = 200
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_LOGGED_LENGTH:
+        return text
+    return text[: MAX_LOGGED_LENGTH - 3] + "..."
+
+
+class OperationTrace:
+    """Breakdown of the time spent in a single traced operation."""
+
+    def __init__(self, operation: str, args: Any) -> None:
+        self.operation = operation
+        self.args = args
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+        self.db_time = 0.0
+        self.stats = 0
+        self.fs_time = 0.0
+
+    def format(self) -> str:
+        args = _truncate(", ".join(repr(arg) for arg in self.args))
+        message = (
+            f"{self.operation}({args}) took {self.duration * 1e3:.1f} ms: "
+            f"{sum(self.statements.values())} statements, "
+            f"{self.db_time * 1e3:.1f} ms in the database; "
+            f"{self.stats} stats, {self.fs_time * 1e3:.1f} ms in the filesystem."
+        )
+        if self.statements:
+            sql, count = self.statements.most_common(1)[0]
+            message += f" Most frequent statement ({count}x): {_truncate(sql)}"
+        return message
+
+
+class OperationTracer:
+    """
+    Traces the operations of a File ID manager, and logs a breakdown of each
+    operation that takes longer than `threshold` seconds to WARNING.
+
+    The breakdown holds the number of SQL statements executed and of files
+    stat'd, and the time spent in the storage backend (DB time) and in
+    `_stat()` (FS time). Only statements executed on the main connection of
+    the storage backend are counted.
+    """
+
+    def __init__(self, manager: "BaseFileIdManager", threshold: float) -> None:
+        self.log = manager.log
+        self.threshold = threshold
+        self.trace: Optional[OperationTrace] = None
+        self.last_trace: Optional[OperationTrace] = None
+        self._in_store = False
+
+        for name in OPERATIONS:
+            if hasattr(manager, name):
+                setattr(
+                    manager, name, self._wrap_operation(name, getattr(manager, name))
+                )
+        if hasattr(manager, "_stat"):
+            manager._stat = self._wrap_stat(manager._stat)
+
+        store = getattr(manager, "store", None)
+        if store is None:
+            return
+        for name in STORE_METHODS:
+            setattr(store, name, self._wrap_store_method(getattr(store, name)))
+        con = getattr(store, "con", None)
+        if isinstance(con, Connection):
+            con.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, sql: str) -> None:
+        if self.trace is not None:
+            self.trace.statements[sql] += 1
+
+    def _wrap_operation(
+        self, operation: str, method: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        operation = operation.lstrip("_")
+
+        @functools.wraps(method)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            if self.trace is not None:
+                return method(*args, **kwargs)
+
+            trace = self.trace = OperationTrace(operation, args)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.trace = None
+                trace.duration = time.perf_counter() - trace.start
+                self.last_trace = trace
+                if trace.duration >= self.threshold:
+                    self.log.warning(f"Slow operation: {trace.format()}")
+
+        return wrapped
+
+    def _wrap_stat(self, method: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(method)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            trace = self.trace
+            if trace is None:
+                return method(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                trace.stats += 1
+                trace.fs_time += time.perf_counter() - start
+
+        return wrapped
+
+    @contextlib.contextmanager
+    def _time_db(self) -> Iterator[None]:
+        """Adds the time spent within to the DB time of the current operation.
+        Nested calls are not counted twice."""
+        trace = self.trace
+        if trace is None or self._in_store:
+            yield
+            return
+
+        self._in_store = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.db_time += time.perf_counter() - start
+            self._in_store = False
+
+    def _timed_iterator(self, iterator: Iterator[Any]) -> Iterator[Any]:
+        while True:
+            with self._time_db():
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    @contextlib.contextmanager
+    def _timed_context(self, context: Any) -> Iterator[Any]:
+        with self._time_db():
+            value = context.__enter__()
+        try:
+            yield value
+        except BaseException as e:
+            with self._time_db():
+                if not context.__exit__(type(e), e, e.__traceback__):
+                    raise
+        else:
+            with self._time_db():
+                context.__exit__(None, None, None)
+
+    def _wrap_store_method(self, method: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(method)
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            if self.trace is None:
+                return method(*args, **kwargs)
+
+            with self._time_db():
+                result = method(*args, **kwargs)
+            # also time the work deferred to iteration or to the exit of a
+            # transaction
+            if hasattr(result, "__next__"):
+                return self._timed_iterator(result)
+            if hasattr(result, "__enter__"):
+                return self._timed_context(result)
+            return result
+
+        return wrapped
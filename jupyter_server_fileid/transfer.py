@@ -0,0 +1,140 @@
+"""
+Serialization of file records exported by `BaseFileIdManager.export_records()`
+and imported by `BaseFileIdManager.import_records()`, e.g. to move the file IDs
+of a user to another node with `jupyter fileid export` and `jupyter fileid
+import`.
+
+An export consists of a header followed by one entry per record, in one of two
+formats:
+
+- `ndjson`: the header is a JSON object on the first line, and each record is a
+JSON array of the fields of `FileRecord` on its own line. Records of managers
+without stat info only hold the `id` and `path` fields.
+
+- `binary`: `MAGIC`, then the header as length-prefixed JSON, then each record
+prefixed by its length in bytes. A record holds the length-prefixed file ID,
+the stat info packed as `STAT_INFO` if the header sets `stat_info`, and the
+path. A zero length marks the end of the export.
+
+All lengths are unsigned little-endian integers of 4 bytes, except for the
+length of file IDs, which is of 2 bytes. Both formats are streamed, such that
+exports of any size are written and read with constant memory. Reading binary
+exports truncated anywhere, or NDJSON exports truncated within a line, raises a
+`ValueError`.
+"""
+
+import json
+import struct
+from typing import IO, Any, Dict, Iterable, Iterator, Tuple
+
+from .storage import FileRecord
+
+FORMATS = ("ndjson", "binary")
+
+VERSION = 1
+
+MAGIC = b"FILEID\x00\x01"
+
+# ino, crtime, mtime and flags, where bit 0 of flags is set for directories and
+# bit 1 is set if crtime is known.
+STAT_INFO = struct.Struct("<qqqB")
+
+_LENGTH = struct.Struct("<I")
+_ID_LENGTH = struct.Struct("<H")
+
+
+def write_records(
+    file: IO[bytes],
+    header: Dict[str, Any],
+    records: Iterable[FileRecord],
+    format: str = "ndjson",
+) -> int:
+    """Writes `header` and `records` to `file` in `format`. The header must
+    set `stat_info`. Returns the number of records written."""
+    if format not in FORMATS:
+        raise ValueError(f"format ('{format}') must be one of {list(FORMATS)}.")
+
+    header = {"version": VERSION, **header}
+    stat_info = header["stat_info"]
+    count = 0
+    if format == "ndjson":
+        file.write(json.dumps(header).encode() + b"\n")
+        for record in records:
+            fields = record if stat_info else record[:2]
+            file.write(json.dumps(fields, separators=(",", ":")).encode() + b"\n")
+            count += 1
+        return count
+
+    header_bytes = json.dumps(header).encode()
+    file.write(MAGIC + _LENGTH.pack(len(header_bytes)) + header_bytes)
+    for record in records:
+        id_bytes = record.id.encode()
+        body = _ID_LENGTH.pack(len(id_bytes)) + id_bytes
+        if stat_info:
+            flags = int(bool(record.is_dir)) | (record.crtime is not None) << 1
+            body += STAT_INFO.pack(record.ino, record.crtime or 0, record.mtime, flags)
+        body += record.path.encode()
+        file.write(_LENGTH.pack(len(body)) + body)
+        count += 1
+    file.write(_LENGTH.pack(0))
+    return count
+
+
+def _read_exactly(file: IO[bytes], size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Export is truncated.")
+    return data
+
+
+def _read_ndjson(file: IO[bytes], stat_info: bool) -> Iterator[FileRecord]:
+    for line in file:
+        if not line.endswith(b"\n"):
+            raise ValueError("Export is truncated.")
+        fields = json.loads(line)
+        yield FileRecord(*fields) if stat_info else FileRecord(fields[0], fields[1])
+
+
+def _read_binary(file: IO[bytes], stat_info: bool) -> Iterator[FileRecord]:
+    while True:
+        (length,) = _LENGTH.unpack(_read_exactly(file, _LENGTH.size))
+        if not length:
+            return
+        body = _read_exactly(file, length)
+        (id_length,) = _ID_LENGTH.unpack_from(body)
+        offset = _ID_LENGTH.size + id_length
+        id = body[_ID_LENGTH.size : offset].decode()
+        if not stat_info:
+            yield FileRecord(id, body[offset:].decode())
+            continue
+        ino, crtime, mtime, flags = STAT_INFO.unpack_from(body, offset)
+        path = body[offset + STAT_INFO.size :].decode()
+        yield FileRecord(
+            id, path, ino, crtime if flags & 2 else None, mtime, bool(flags & 1)
+        )
+
+
+def read_records(file: IO[bytes]) -> Tuple[Dict[str, Any], Iterator[FileRecord]]:
+    """Reads an export written by `write_records()` from `file`, detecting its
+    format. Returns the header and an iterator over the records, which reads
+    them from `file` as it is consumed."""
+    magic = file.read(len(MAGIC))
+    if magic == MAGIC:
+        (length,) = _LENGTH.unpack(_read_exactly(file, _LENGTH.size))
+        header = json.loads(_read_exactly(file, length))
+        reader = _read_binary
+    else:
+        line = magic + file.readline()
+        try:
+            header = json.loads(line)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict):
+            raise ValueError("Not a File ID export.")
+        reader = _read_ndjson
+
+    if header.get("version") != VERSION:
+        raise ValueError(
+            f"Unsupported File ID export version: {header.get('version')}."
+        )
+    return header, reader(file, bool(header.get("stat_info")))
@@ -0,0 +1,29 @@
+from jupyter_server_fileid.bloom import BloomFilter
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=10000, fp_rate=0.01)
+    for key in range(0, 20000, 2):
+        bloom.add(key)
+
+    # no false negatives, and false positives near the target rate
+    assert all(key in bloom for key in range(0, 20000, 2))
+    false_positives = sum(key in bloom for key in range(1, 20000, 2))
+    assert false_positives < 200
+    assert 0.005 < bloom.estimated_fp_rate < 0.02
+    # about 10 bits per key at a rate of 0.01
+    assert 11000 < bloom.nbytes < 13000
+
+
+def test_bloom_filter_readd():
+    bloom = BloomFilter(capacity=100, fp_rate=0.01)
+    assert bloom.add(1)
+    # adding a member again does not count it twice
+    assert not bloom.add(1)
+    assert bloom.count == 1
+
+
+def test_bloom_filter_empty():
+    bloom = BloomFilter(capacity=0, fp_rate=0.01)
+    assert 1 not in bloom
+    assert bloom.estimated_fp_rate == 0
@@ -0,0 +1,134 @@
+import json
+import os
+
+from click.testing import CliRunner
+
+from jupyter_server_fileid.cli import main
+from jupyter_server_fileid.manager import LocalFileIdManager
+
+
+def test_reindex(fid_db_path, jp_root_dir, fs_helpers):
+    fs_helpers.touch("dir", dir=True)
+    fs_helpers.touch("dir/a.txt")
+
+    result = CliRunner().invoke(
+        main,
+        ["reindex", "--root", str(jp_root_dir), "--db", fid_db_path, "--workers", "2"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Indexed 3 entries of 2 directories" in result.output
+    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert fid_manager.count() == 3
+    assert fid_manager.get_id("dir/a.txt") is not None
+
+
+def test_export_import(fid_db_path, jp_root_dir, fs_helpers, tmp_path):
+    fs_helpers.touch("a.txt")
+    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    id = fid_manager.index("a.txt")
+    del fid_manager
+    export_path = str(tmp_path / "export.bin")
+    other_db_path = str(tmp_path / "other.db")
+    options = ["--manager", "jupyter_server_fileid.manager.LocalFileIdManager"]
+
+    result = CliRunner().invoke(
+        main,
+        ["export", export_path, "--root", str(jp_root_dir), "--db", fid_db_path]
+        + ["--format", "binary"]
+        + options,
+    )
+    assert result.exit_code == 0, result.output
+    result = CliRunner().invoke(
+        main,
+        ["import", export_path, "--root", str(jp_root_dir), "--db", other_db_path]
+        + options,
+    )
+    assert result.exit_code == 0, result.output
+    assert "Imported 2 records" in result.output
+
+    other = LocalFileIdManager(db_path=other_db_path, root_dir=str(jp_root_dir))
+    assert other.get_id("a.txt") == id
+
+
+def test_export_read_only(fid_db_path, jp_root_dir, fs_helpers, tmp_path):
+    fs_helpers.touch("a.txt")
+    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    fid_manager.index("a.txt")
+    records = sorted(fid_manager.store.dump())
+    del fid_manager
+    fs_helpers.touch("newdir", dir=True)
+
+    result = CliRunner().invoke(
+        main,
+        ["export", str(tmp_path / "export.ndjson"), "--root", str(jp_root_dir)]
+        + ["--db", fid_db_path]
+        + ["--manager", "jupyter_server_fileid.manager.LocalFileIdManager"],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Exported 2 records" in result.output
+
+    # newdir is not indexed by the export
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), index_on_startup=False
+    )
+    assert sorted(fid_manager.store.dump()) == records
+
+
+def test_check(fid_db_path, jp_root_dir, fs_helpers):
+    fs_helpers.touch("a.txt")
+    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    fid_manager.index("a.txt")
+    del fid_manager
+    fs_helpers.delete("a.txt")
+    args = ["check", "--root", str(jp_root_dir), "--db", fid_db_path]
+
+    result = CliRunner().invoke(main, args)
+    assert result.exit_code == 1
+    assert "stale records: 1\n  a.txt\n" in result.output
+
+    result = CliRunner().invoke(main, args + ["--repair"])
+    assert result.exit_code == 0, result.output
+    assert "Repaired 1 records." in result.output
+
+    result = CliRunner().invoke(main, args + ["--json"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)["ok"]
+
+
+def test_check_read_only(fid_db_path, jp_root_dir, fs_helpers):
+    fs_helpers.touch("a", dir=True)
+    fs_helpers.touch("a/f.txt")
+    fid_manager = LocalFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    fid_manager.index("a/f.txt")
+    records = sorted(fid_manager.store.dump())
+    del fid_manager
+    with open(fid_db_path, "rb") as f:
+        contents = f.read()
+    fs_helpers.move("a", "b")
+    fs_helpers.touch("newdir", dir=True)
+
+    result = CliRunner().invoke(
+        main, ["check", "--root", str(jp_root_dir), "--db", fid_db_path, "--json"]
+    )
+    assert result.exit_code == 1, result.output
+    report = json.loads(result.output)
+    assert report["stale"] == ["a", "a/f.txt"]
+    assert report["missing_dirs"] == ["b", "newdir"]
+
+    # the database is left as is without --repair
+    with open(fid_db_path, "rb") as f:
+        assert f.read() == contents
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), index_on_startup=False
+    )
+    assert sorted(fid_manager.store.dump()) == records
+
+
+def test_check_missing_db(fid_db_path, jp_root_dir):
+    result = CliRunner().invoke(
+        main, ["check", "--root", str(jp_root_dir), "--db", fid_db_path]
+    )
+    assert result.exit_code == 1
+    assert f"Cannot open database {fid_db_path}" in result.output
+    assert not os.path.exists(fid_db_path)
@@ -18,6 +18,12 @@ class MockFileIdManager(BaseFileIdManager):
     get_handlers_by_action = MagicMock()
     get_path = MagicMock(return_value="mock_path")
     get_id = MagicMock(return_value="mock_id")
+    stats = MagicMock(return_value={"records": 1})
+    list_ids = MagicMock(return_value={"files": [], "cursor": None})
+    search = MagicMock(return_value=[{"id": "mock_id", "path": "mock_path"}])
+    get_changes = MagicMock(
+        return_value={"changes": {"mock_id": "mock_path"}, "cursor": 2, "more": False}
+    )
 
 
 @pytest.fixture
@@ -51,6 +57,60 @@ async def test_file_path_handler(jp_fetch, file_id_extension):
     assert body["path"] == "mock_path"
 
 
+async def test_file_id_stats_handler(jp_fetch, file_id_extension):
+    response = await jp_fetch("api/fileid/stats")
+    file_id_extension.file_id_manager.stats.assert_called_once()
+    assert json_decode(response.body) == {"records": 1}
+
+
+async def test_file_id_changes_handler(jp_fetch, file_id_extension):
+    response = await jp_fetch("api/fileid/changes", params={"since": "1"})
+    file_id_extension.file_id_manager.get_changes.assert_called_with(1, 1000)
+    body = json_decode(response.body)
+    assert body == {"changes": {"mock_id": "mock_path"}, "cursor": 2, "more": False}
+
+    await jp_fetch("api/fileid/changes", params={"limit": "1000000"})
+    file_id_extension.file_id_manager.get_changes.assert_called_with(None, 10000)
+
+
+@pytest.mark.parametrize("params", [{"since": "a"}, {"limit": "0"}])
+async def test_invalid_query_param_in_changes_handler(jp_fetch, params):
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("api/fileid/changes", params=params)
+
+    assert err.value.code == 400
+
+
+async def test_expired_cursor_in_changes_handler(jp_fetch, monkeypatch):
+    monkeypatch.setattr(MockFileIdManager, "get_changes", MagicMock(return_value=None))
+
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("api/fileid/changes", params={"since": "1"})
+
+    assert err.value.code == 410
+
+
+async def test_file_id_search_handler(jp_fetch, file_id_extension):
+    response = await jp_fetch("api/fileid/search", params={"q": "mock"})
+    file_id_extension.file_id_manager.search.assert_called_with("mock", 50)
+    body = json_decode(response.body)
+    assert body == {"results": [{"id": "mock_id", "path": "mock_path"}]}
+
+    with pytest.raises(HTTPClientError) as err:
+        await jp_fetch("api/fileid/search")
+    assert err.value.code == 400
+
+
+async def test_file_id_list_handler(jp_fetch, file_id_extension):
+    response = await jp_fetch(
+        "api/fileid/list", params={"path": "dir", "recursive": "true", "cursor": "a"}
+    )
+    file_id_extension.file_id_manager.list_ids.assert_called_with(
+        "dir", True, 1000, "a"
+    )
+    assert json_decode(response.body) == {"files": [], "cursor": None}
+
+
 async def test_missing_query_param_in_id_handler(jp_fetch):
     with pytest.raises(HTTPClientError) as err:
         await jp_fetch("api/fileid/id")
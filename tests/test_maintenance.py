@@ -0,0 +1,110 @@
+import time
+
+import pytest
+from traitlets import TraitError
+
+from jupyter_server_fileid.maintenance import MaintenanceScheduler
+from jupyter_server_fileid.manager import ArbitraryFileIdManager, LocalFileIdManager
+
+
+@pytest.fixture
+def wal_fid_manager(fid_db_path, jp_root_dir):
+    return ArbitraryFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), db_journal_mode="WAL"
+    )
+
+
+@pytest.fixture
+def scheduler(wal_fid_manager):
+    return MaintenanceScheduler(
+        manager=wal_fid_manager, idle_threshold=60, wal_checkpoint_threshold=0
+    )
+
+
+def make_idle(fid_manager):
+    fid_manager._last_operation = -3600.0
+
+
+def test_tick_waits_for_idle(scheduler, wal_fid_manager):
+    wal_fid_manager.index("a.txt")
+    assert scheduler.tick() is None
+
+
+def test_tick_runs_one_task_at_a_time(scheduler, wal_fid_manager):
+    for i in range(100):
+        wal_fid_manager.index(f"{i}.txt")
+    assert wal_fid_manager.disk_usage()[1] > 0
+    make_idle(wal_fid_manager)
+
+    assert scheduler.tick() == "wal_checkpoint"
+    assert wal_fid_manager.disk_usage()[1] == 0
+
+    assert scheduler.tick() == "optimize"
+    stats = wal_fid_manager.con.execute("SELECT tbl FROM sqlite_stat1").fetchall()
+    assert ("Files",) in stats
+
+    # analyzing writes to the WAL, which is checkpointed again. statistics are
+    # refreshed at most every `optimize_interval` seconds.
+    assert scheduler.tick() == "wal_checkpoint"
+    assert scheduler.tick() is None
+
+
+def test_tick_vacuum(scheduler, wal_fid_manager):
+    scheduler.wal_checkpoint_threshold = 1 << 30
+    scheduler.vacuum = True
+    scheduler.vacuum_interval = 1e-6
+    scheduler._last_optimize = time.monotonic()
+    make_idle(wal_fid_manager)
+    assert scheduler.tick() == "vacuum"
+
+
+def test_tick_vacuum_bounded(scheduler, wal_fid_manager):
+    for i in range(1000):
+        wal_fid_manager.index("a" * 200 + str(i))
+    with wal_fid_manager.store.transaction():
+        wal_fid_manager.store.delete_children("", "/")
+    scheduler.wal_checkpoint_threshold = 1 << 30
+    scheduler.vacuum = True
+    scheduler.vacuum_interval = 3600
+    scheduler._last_optimize = time.monotonic()
+    scheduler._last_vacuum = -3600.0
+    wal_fid_manager.store.vacuum_pages = 1
+    make_idle(wal_fid_manager)
+
+    def freelist_count():
+        return wal_fid_manager.con.execute("PRAGMA freelist_count").fetchone()[0]
+
+    # each tick frees at most `vacuum_pages` pages, and the vacuum continues
+    # on the next tick until no free pages remain
+    free = freelist_count()
+    assert free > 1
+    assert scheduler.tick() == "vacuum"
+    assert freelist_count() == free - 1
+    wal_fid_manager.store.vacuum_pages = 0
+    assert scheduler.tick() == "vacuum"
+    assert freelist_count() == 0
+    assert scheduler.tick() is None
+
+
+def test_tick_ino_filter(fid_db_path, jp_root_dir):
+    manager = LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), ino_filter=True
+    )
+    scheduler = MaintenanceScheduler(manager=manager, wal_checkpoint_threshold=1 << 30)
+    assert manager._ino_filter is not None
+    manager._ino_filter.capacity = 0
+    make_idle(manager)
+    assert scheduler.tick() == "ino_filter"
+    assert not manager.ino_filter_full()
+    assert scheduler.tick() == "optimize"
+
+
+def test_tick_hashmap(hashmap_fid_manager):
+    scheduler = MaintenanceScheduler(manager=hashmap_fid_manager)
+    make_idle(hashmap_fid_manager)
+    assert scheduler.tick() is None
+
+
+def test_intervals_validated(wal_fid_manager):
+    with pytest.raises(TraitError):
+        MaintenanceScheduler(manager=wal_fid_manager, idle_threshold=0)
@@ -1,17 +1,29 @@
+import io
+import json
+import logging
 import ntpath
 import os
 import posixpath
+import sqlite3
+import subprocess
 import sys
+import textwrap
+from typing import List
 from unittest.mock import patch
 
 import pytest
+from jupyter_events.logger import EventLogger
 from traitlets import TraitError
+from traitlets.config import Config
 
 from jupyter_server_fileid.manager import (
+    EVENT_SCHEMA_PATH,
     ArbitraryFileIdManager,
     BaseFileIdManager,
+    HashMapFileIdManager,
     LocalFileIdManager,
 )
+from jupyter_server_fileid.storage import FileRecord
 
 
 @pytest.fixture
@@ -98,17 +110,16 @@ def get_id_nosync(fid_manager, path):
     else:
         path = _normalize_path_arbitrary(fid_manager, path)
 
-    row = fid_manager.con.execute(
-        "SELECT id FROM Files WHERE path = ?", (path,)
-    ).fetchone()
-    return row and row[0]
+    if isinstance(fid_manager, HashMapFileIdManager):
+        return fid_manager._id_by_path.get(path)
+
+    record = fid_manager.store.get_by_path(path)
+    return record and record.id
 
 
 def get_path_nosync(fid_manager, id):
-    row = fid_manager.con.execute(
-        "SELECT path FROM Files WHERE id = ?", (id,)
-    ).fetchone()
-    path = row and row[0]
+    record = fid_manager.store.get(id)
+    path = record and record.path
 
     if path is None:
         return None
@@ -432,6 +443,234 @@ def test_get_path_oob_move_back_to_original_path(
     assert fid_manager.get_path(id) == old_path
 
 
+def test_stats(any_fid_manager, fs_helpers):
+    for path in ["a.txt", "b.txt"]:
+        fs_helpers.touch(path)
+        any_fid_manager.index(path)
+
+    stats = any_fid_manager.stats()
+    assert stats["manager"] == type(any_fid_manager).__name__
+    assert stats["records"] == any_fid_manager.count()
+    assert stats["db_size"] >= 0
+    assert stats["wal_size"] >= 0
+
+
+def test_stats_sync(
+    fid_manager, old_path, old_path_child, new_path, new_path_child, fs_helpers
+):
+    id = fid_manager.index(old_path)
+    child_id = fid_manager.index(old_path_child)
+    assert fid_manager.get_path(id) == old_path
+    fs_helpers.move(old_path, new_path)
+    assert fid_manager.get_path(child_id) == new_path_child
+
+    stats = fid_manager.stats()
+    assert stats["dirs"] >= 1
+    assert stats["sync"]["last_dirs_visited"] >= 1
+    assert stats["sync"]["last_dirs_synced"] >= 1
+    assert stats["sync"]["last_duration"] > 0
+    assert 0 <= stats["sync"]["seconds_since_last"] < 60
+    assert stats["path_cache"] == {"hits": 1, "misses": 1}
+
+
+def test_ino_filter(fid_db_path, jp_root_dir, fid_store_class, fs_helpers):
+    fs_helpers.touch("a.txt")
+    LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), store_class=fid_store_class
+    ).index("a.txt")
+    # built from the records on startup
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path,
+        root_dir=str(jp_root_dir),
+        store_class=fid_store_class,
+        ino_filter=True,
+    )
+    a_id = fid_manager.get_id("a.txt")
+    assert a_id is not None
+
+    fs_helpers.touch("b.txt")
+    with patch.object(fid_manager.store, "get_by_ino") as get_by_ino:
+        assert fid_manager.get_id("b.txt") is None
+    get_by_ino.assert_not_called()
+
+    # and updated on writes
+    b_id = fid_manager.index("b.txt")
+    assert fid_manager.get_id("b.txt") == b_id
+    fs_helpers.move("a.txt", "c.txt")
+    assert fid_manager.get_id("c.txt") == a_id
+
+    stats = fid_manager.stats()["ino_filter"]
+    assert stats["entries"] >= 3
+    assert stats["negatives"] == 1
+    assert stats["bytes"] > 0
+    assert 0 <= stats["estimated_fp_rate"] < 0.01
+
+
+def test_ino_filter_rebuild(fid_db_path, jp_root_dir, fs_helpers):
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), ino_filter=True
+    )
+    ids = {}
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        fs_helpers.touch(name)
+        ids[name] = fid_manager.index(name)
+    # re-adding inode numbers does not count them again
+    entries = fid_manager.stats()["ino_filter"]["entries"]
+    fid_manager.index("a.txt")
+    fs_helpers.move("a.txt", "e.txt")
+    assert fid_manager.get_id("e.txt") == ids.pop("a.txt")
+    assert fid_manager.stats()["ino_filter"]["entries"] == entries
+    assert not fid_manager.ino_filter_full()
+
+    # lookups keep using the full filter, which is rebuilt in steps
+    assert fid_manager._ino_filter is not None
+    fid_manager._ino_filter.capacity = 2
+    assert fid_manager.ino_filter_full()
+    with patch.object(fid_manager, "_build_ino_filter") as build_ino_filter:
+        assert fid_manager.get_id("b.txt") == ids["b.txt"]
+    build_ino_filter.assert_not_called()
+    assert not fid_manager.rebuild_ino_filter(limit=2)
+    # writes during the rebuild are added to the new filter
+    fs_helpers.touch("d.txt")
+    ids["d.txt"] = fid_manager.index("d.txt")
+    # five records including the root directory, read two at a time
+    assert not fid_manager.rebuild_ino_filter(limit=2)
+    assert fid_manager.rebuild_ino_filter(limit=2)
+    assert not fid_manager.ino_filter_full()
+    assert fid_manager.stats()["ino_filter"]["capacity"] == 1024
+    for name, id in ids.items():
+        assert fid_manager.get_id(name) == id
+
+
+def test_ino_filter_validated(fid_db_path, jp_root_dir):
+    with pytest.raises(TraitError):
+        LocalFileIdManager(
+            db_path=fid_db_path, root_dir=str(jp_root_dir), ino_filter_fp_rate=1
+        )
+
+
+def test_sync_all_skips_synced_dirs(fid_manager, fs_helpers):
+    fs_helpers.touch("dir", dir=True)
+    fid_manager.index("dir")
+    fs_helpers.touch("dir/a.txt")
+
+    fid_manager._sync_all()
+    assert fid_manager.stats()["sync"]["last_dirs_synced"] >= 1
+    fid_manager._sync_all()
+    assert fid_manager.stats()["sync"]["last_dirs_synced"] == 0
+
+
+def test_collect_garbage(fid_manager, fs_helpers):
+    for path in ["a.txt", "b.txt", "dir", "dir/c.txt", "kept.txt"]:
+        fs_helpers.touch(path, dir=path == "dir")
+    ids = {path: fid_manager.index(path) for path in ["a.txt", "b.txt", "dir/c.txt"]}
+    kept_id = fid_manager.index("kept.txt")
+    count = fid_manager.count()
+
+    fs_helpers.delete("a.txt")
+    fs_helpers.delete("dir")
+    fs_helpers.move("b.txt", "moved.txt")
+
+    # the moved file is re-identified rather than removed
+    assert fid_manager.collect_garbage(budget=60) == 2
+    assert fid_manager.count() == count - 2
+    assert fid_manager.get_path(ids["b.txt"]) == "moved.txt"
+    assert fid_manager.get_path(ids["a.txt"]) is None
+    assert fid_manager.get_path(ids["dir/c.txt"]) is None
+    assert fid_manager.get_path(kept_id) == "kept.txt"
+
+
+def test_collect_garbage_budget(fid_manager, fs_helpers):
+    paths = [f"{i}.txt" for i in range(5)]
+    for path in paths:
+        fs_helpers.touch(path)
+        fid_manager.index(path)
+    count = fid_manager.count()
+    for path in paths:
+        fs_helpers.delete(path)
+
+    # each slice checks at least one record, and resumes from the last one
+    removed = [fid_manager.collect_garbage(budget=0) for _ in range(count)]
+    assert all(n <= 1 for n in removed)
+    assert sum(removed) == len(paths)
+    assert fid_manager.count() == count - len(paths)
+
+
+def test_reindex(fid_manager, fs_helpers):
+    for i in range(3):
+        fs_helpers.touch(f"dir{i}", dir=True)
+        fs_helpers.touch(f"dir{i}/sub", dir=True)
+        for j in range(5):
+            fs_helpers.touch(f"dir{i}/sub/{j}.txt")
+    old_id = fid_manager.index("dir0/sub/0.txt")
+    fs_helpers.move("dir0/sub/0.txt", "dir0/moved.txt")
+    progress = []
+
+    stats = fid_manager.reindex(
+        workers=2, batch_size=4, progress=lambda *args: progress.append(args)
+    )
+
+    # the root, 6 directories and 15 files
+    assert stats.files == 22
+    assert stats.dirs == 7
+    assert progress[-1] == (22, 7)
+    assert len(progress) == 6
+    # the moved file keeps its ID
+    assert fid_manager.get_id("dir0/moved.txt") == old_id
+    # all but the root and the moved file are new
+    assert stats.created == 20
+    for i in range(3):
+        for j in range(5):
+            path = f"dir{i}/sub/{j}.txt"
+            if path != "dir0/sub/0.txt":
+                assert fid_manager.get_path(fid_manager.get_id(path)) == path
+
+    # reindexing again creates no records, and leaves directories clean
+    assert fid_manager.reindex().created == 0
+    fid_manager._sync_all()
+    assert fid_manager._last_sync_dirs_synced == 0
+
+
+def test_check(fid_manager, fs_helpers):
+    for path in ["a.txt", "b.txt", "c.txt", "e.txt"]:
+        fs_helpers.touch(path)
+    ids = {path: fid_manager.index(path) for path in ["a.txt", "b.txt", "c.txt"]}
+    e_id = fid_manager.index("e.txt")
+    assert fid_manager.check().ok
+
+    fs_helpers.touch("d", dir=True)
+    fs_helpers.delete("a.txt")
+    fs_helpers.delete("c.txt")
+    fs_helpers.move("b.txt", "c.txt")
+    e_path = fid_manager._normalize_path("e.txt")
+    with fid_manager.store.transaction():
+        fid_manager.store.update(e_id, crtime=123)
+        fid_manager.store.insert(FileRecord("dup", e_path, 1 << 40, None, 0, False))
+
+    # records are read in slices rather than all at once
+    with (
+        patch.object(fid_manager, "CHECK_BATCH_SIZE", 2),
+        patch.object(fid_manager.store, "dump", side_effect=AssertionError),
+    ):
+        report = fid_manager.check(workers=2)
+    assert not report.ok
+    # including the root directory
+    assert report.records == 6
+    assert sorted(report.stale) == ["a.txt", "b.txt", "e.txt"]
+    assert report.duplicates == ["e.txt"]
+    assert report.missing_dirs == ["d"]
+    assert report.ino_collisions == ["c.txt"]
+    assert report.crtime_mismatches == ["e.txt"]
+    # checking does not modify records
+    assert fid_manager.count() == 6
+
+    report = fid_manager.check(repair=True)
+    assert report.repaired > 0
+    assert fid_manager.check().ok
+    assert fid_manager.get_id("c.txt") == ids["b.txt"]
+    assert fid_manager.get_id("d") is not None
+
+
 # move file into an indexed-but-moved directory
 # this test should work regardless of whether crtime is supported on platform
 @pytest.mark.parametrize(
@@ -655,3 +894,401 @@ def test_db_journal_mode(
         cursor = fid_manager.con.execute("PRAGMA journal_mode")
         actual_journal_mode = cursor.fetchone()
         assert actual_journal_mode[0].upper() == expected_journal_mode
+
+
+def test_db_in_memory(any_fid_manager_class, fid_db_path, jp_root_dir, test_path):
+    fid_manager = any_fid_manager_class(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), db_in_memory=True
+    )
+    id = fid_manager.index(test_path)
+
+    # nothing is written to disk until the next checkpoint
+    disk_con = sqlite3.connect(fid_db_path)
+    tables = disk_con.execute("SELECT name FROM sqlite_master").fetchall()
+    assert ("Files",) not in tables
+
+    fid_manager.checkpoint()
+    assert disk_con.execute("SELECT id FROM Files WHERE id = ?", (id,)).fetchone()
+    disk_con.close()
+
+    # records checkpointed to disk are loaded into memory on startup
+    fid_manager_2 = any_fid_manager_class(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), db_in_memory=True
+    )
+    assert fid_manager_2.get_id(test_path) == id
+
+
+def test_db_in_memory_checkpoints_on_cleanup(
+    any_fid_manager_class, fid_db_path, jp_root_dir, test_path
+):
+    fid_manager = any_fid_manager_class(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), db_in_memory=True
+    )
+    id = fid_manager.index(test_path)
+    del fid_manager
+
+    fid_manager = any_fid_manager_class(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert fid_manager.get_id(test_path) == id
+
+
+@pytest.mark.parametrize("db_checkpoint_interval", [0, -1, 3601])
+def test_db_checkpoint_interval_bounds(
+    any_fid_manager_class, fid_db_path, jp_root_dir, db_checkpoint_interval
+):
+    with pytest.raises(TraitError, match="must be between"):
+        any_fid_manager_class(
+            db_path=fid_db_path,
+            root_dir=str(jp_root_dir),
+            db_in_memory=True,
+            db_checkpoint_interval=db_checkpoint_interval,
+        )
+
+
+def test_get_changes(any_fid_manager_class, fid_db_path, jp_root_dir, fs_helpers):
+    fid_manager = any_fid_manager_class(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    cursor = fid_manager.get_changes()["cursor"]
+    fs_helpers.touch("a", dir=True)
+    fs_helpers.touch("a/b.txt")
+    dir_id = fid_manager.index("a")
+    file_id = fid_manager.index("a/b.txt")
+
+    # new records are not recorded
+    changes = fid_manager.get_changes(cursor)
+    assert changes["changes"] == {}
+    assert not changes["more"]
+    cursor = changes["cursor"]
+
+    fs_helpers.move("a", "c")
+    fid_manager.move("a", "c")
+    fs_helpers.copy("c/b.txt", "d.txt")
+    copy_id = fid_manager.copy("c/b.txt", "d.txt")
+    fs_helpers.delete("d.txt")
+    fid_manager.delete("d.txt")
+
+    # changes of the same file ID are coalesced
+    changes = fid_manager.get_changes(cursor, limit=1)
+    assert changes["changes"] == {dir_id: "c"}
+    assert changes["more"]
+    changes = fid_manager.get_changes(cursor)
+    assert changes["changes"] == {dir_id: "c", file_id: "c/b.txt", copy_id: None}
+    assert fid_manager.get_changes(changes["cursor"])["changes"] == {}
+    assert fid_manager.get_changes(changes["cursor"] + 1) is None
+
+
+def test_search(any_fid_manager_class, fid_db_path, jp_root_dir, fs_helpers):
+    fid_manager = any_fid_manager_class(
+        db_path=fid_db_path,
+        root_dir=str(jp_root_dir),
+        config=Config({"SqliteFileIdStore": {"search_index": True}}),
+    )
+    fs_helpers.touch("notebooks", dir=True)
+    fs_helpers.touch("notebooks/analysis.ipynb")
+    fid_manager.index("notebooks")
+    id = fid_manager.index("notebooks/analysis.ipynb")
+
+    assert fid_manager.search("analysis") == [
+        {"id": id, "path": "notebooks/analysis.ipynb"}
+    ]
+    fs_helpers.move("notebooks", "old")
+    fid_manager.move("notebooks", "old")
+    assert fid_manager.search("analysis") == [{"id": id, "path": "old/analysis.ipynb"}]
+
+
+def test_list_ids(any_fid_manager, fs_helpers):
+    paths = ["a", "a/b", "a/b/c.txt", "a/b0.txt", "a/b-c.txt", "a/d.txt", "e.txt"]
+    for path in paths:
+        fs_helpers.touch(path, dir=path in ("a", "a/b"))
+    ids = {path: any_fid_manager.index(path) for path in paths}
+
+    def list_paths(dir_path, recursive=False, limit=100):
+        files: List[str] = []
+        cursor = None
+        while True:
+            page = any_fid_manager.list_ids(dir_path, recursive, limit, cursor)
+            for file in page["files"]:
+                assert file["id"] == ids[file["path"]]
+            files.extend(file["path"] for file in page["files"])
+            cursor = page["cursor"]
+            if cursor is None:
+                return files
+
+    assert list_paths("a") == ["a/b", "a/b-c.txt", "a/b0.txt", "a/d.txt"]
+    assert list_paths("a", limit=1) == ["a/b", "a/b-c.txt", "a/b0.txt", "a/d.txt"]
+    assert list_paths("a", recursive=True, limit=2) == [
+        "a/b",
+        "a/b-c.txt",
+        "a/b/c.txt",
+        "a/b0.txt",
+        "a/d.txt",
+    ]
+    assert list_paths("") == ["a", "e.txt"]
+
+    page = any_fid_manager.list_ids("a", limit=1)
+    is_dir = page["files"][0]["is_dir"]
+    assert is_dir is (True if any_fid_manager.count_dirs() is not None else None)
+
+
+def test_lazy_copy(any_fid_manager_class, fid_db_path, jp_root_dir, fs_helpers):
+    fid_manager = any_fid_manager_class(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), lazy_copy=True
+    )
+    paths = ["a", "a/b", "a/b/c.txt", "a/d.txt"]
+    for path in paths:
+        fs_helpers.touch(path, dir=path in ("a", "a/b"))
+        fid_manager.index(path)
+
+    def list_paths(dir_path):
+        files = fid_manager.list_ids(dir_path, recursive=True)["files"]
+        return [file["path"] for file in files]
+
+    # only the copied directory itself is recorded
+    fs_helpers.copy("a", "x")
+    fid_manager.copy("a", "x")
+    assert list_paths("x") == []
+
+    # files below it are given a file ID when first looked up
+    d_id = fid_manager.get_id("x/d.txt")
+    assert d_id is not None
+    assert d_id != fid_manager.get_id("a/d.txt")
+    assert fid_manager.get_id("x/d.txt") == d_id
+    assert fid_manager.get_path(d_id) == "x/d.txt"
+    assert list_paths("x") == ["x/d.txt"]
+
+    # lazy copies follow moves of the copy and of its source
+    fs_helpers.move("x", "y")
+    fid_manager.move("x", "y")
+    fs_helpers.move("a", "s")
+    fid_manager.move("a", "s")
+    c_id = fid_manager.get_id("y/b/c.txt")
+    assert c_id is not None
+
+    # lazy copies of lazy copies resolve to the indexed source
+    fs_helpers.copy("y", "z")
+    fid_manager.copy("y", "z")
+    assert fid_manager.get_id("z/b/c.txt") not in (None, c_id)
+
+    # lazy copies are materialized before their source is deleted
+    fs_helpers.delete("s")
+    fid_manager.delete("s")
+    assert list_paths("y") == ["y/b", "y/b/c.txt", "y/d.txt"]
+    assert fid_manager.get_id("y/d.txt") == d_id
+    assert fid_manager.get_id("y/b/c.txt") == c_id
+
+    # and all remaining ones on export
+    assert fid_manager.materialize_copies() == 2
+    assert list_paths("z") == ["z/b", "z/b/c.txt", "z/d.txt"]
+    assert fid_manager.store.get_copies() == []
+
+
+def test_get_changes_hashmap(hashmap_fid_manager):
+    with pytest.raises(NotImplementedError):
+        hashmap_fid_manager.get_changes()
+
+
+def test_events(any_fid_manager, fs_helpers):
+    sink = io.StringIO()
+    event_logger = EventLogger(handlers=[logging.StreamHandler(sink)])
+    event_logger.register_event_schema(EVENT_SCHEMA_PATH)
+    any_fid_manager.event_logger = event_logger
+
+    def events():
+        lines = sink.getvalue().splitlines()
+        sink.seek(0)
+        sink.truncate()
+        return [
+            {key: event[key] for key in ("action", "id", "old_path", "new_path")}
+            for event in map(json.loads, lines)
+        ]
+
+    fs_helpers.touch("a", dir=True)
+    for path in ["a/b.txt", "a/c.txt"]:
+        fs_helpers.touch(path)
+        any_fid_manager.index(path)
+    id = any_fid_manager.index("a")
+    assert events() == []
+
+    # subtree operations emit a single event
+    fs_helpers.move("a", "d")
+    any_fid_manager.move("a", "d")
+    assert events() == [{"action": "move", "id": id, "old_path": "a", "new_path": "d"}]
+
+    fs_helpers.copy("d", "e")
+    copy_id = any_fid_manager.copy("d", "e")
+    assert events() == [
+        {"action": "copy", "id": copy_id, "old_path": "d", "new_path": "e"}
+    ]
+
+    fs_helpers.delete("e")
+    any_fid_manager.delete("e")
+    assert events() == [
+        {"action": "delete", "id": copy_id, "old_path": "e", "new_path": None}
+    ]
+
+    if isinstance(any_fid_manager, LocalFileIdManager):
+        # so are moves detected by syncing with the filesystem
+        fs_helpers.move("d", "f")
+        assert any_fid_manager.get_path(id) == "f"
+        assert events() == [
+            {"action": "move", "id": id, "old_path": "d", "new_path": "f"}
+        ]
+
+
+def test_hashmap_closes_log_on_failed_open(fid_db_path, jp_root_dir):
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    manager.close()
+    opened = []
+    open_log_file = manager._open_log_file
+
+    def record_open(mode):
+        opened.append(open_log_file(mode))
+        return opened[-1]
+
+    def fail(entry):
+        raise OSError("disk full")
+
+    patches = patch.multiple(manager, _open_log_file=record_open, _append=fail)
+    with patches, pytest.raises(OSError):
+        manager._open_log(1)
+    assert manager._log is None
+    assert len(opened) == 1
+    assert opened[0].closed
+
+
+def test_hashmap_persists_records(fid_db_path, jp_root_dir):
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    moved_id = manager.index("a/b")
+    manager.move("a", "c")
+    copied_id = manager.copy("c", "d")
+    deleted_id = manager.index("e")
+    manager.delete("e")
+    log_file = manager._log
+    assert log_file is not None
+    manager.close()
+    assert log_file.closed
+    del manager
+
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert manager.get_path(moved_id) == "c/b"
+    assert copied_id is not None
+    assert manager.get_path(copied_id) == "d"
+    assert manager.get_id("d/b") not in (None, moved_id)
+    assert manager.get_path(deleted_id) is None
+
+
+@pytest.mark.parametrize("wait", [True, False])
+def test_hashmap_compaction(fid_db_path, jp_root_dir, wait):
+    manager = HashMapFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), compaction_threshold=10
+    )
+    ids = {manager.index(f"dir/file{i}"): f"dir/file{i}" for i in range(5)}
+    manager.move("dir", "new_dir")
+    manager.compact(wait=wait)
+    ids[manager.index("other")] = "other"
+    del manager
+
+    with open(fid_db_path, encoding="utf-8") as f:
+        # header plus the single operation appended after compaction
+        assert len(f.readlines()) == 2
+
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    for id, path in ids.items():
+        assert manager.get_path(id) == path.replace("dir", "new_dir", 1)
+
+
+def test_hashmap_ignores_truncated_entry(fid_db_path, jp_root_dir):
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    id = manager.index("a")
+    del manager
+    with open(fid_db_path, "a", encoding="utf-8") as f:
+        f.write('["s","some-id","tru')
+
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert manager.get_path(id) == "a"
+    assert manager.get_path("some-id") is None
+    b_id = manager.index("b")
+    del manager
+
+    manager = HashMapFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert manager.get_path(b_id) == "b"
+
+
+def test_hashmap_move_recursive_siblings(hashmap_fid_manager):
+    """Paths sharing a prefix with a moved directory must not be moved."""
+    paths = ["a", "a/b", "a/b/c", "a b", "a.txt", "a0", "ab/c"]
+    ids = {path: hashmap_fid_manager.index(path) for path in paths}
+
+    hashmap_fid_manager.move("a", "z/a")
+
+    for path in ["a b", "a.txt", "a0", "ab/c"]:
+        assert hashmap_fid_manager.get_path(ids[path]) == path
+    for path in ["a", "a/b", "a/b/c"]:
+        assert hashmap_fid_manager.get_path(ids[path]) == "z/" + path
+    assert hashmap_fid_manager._sorted_paths == sorted(hashmap_fid_manager._id_by_path)
+
+
+STRESS_WORKER = textwrap.dedent(
+    """
+    import sys
+
+    from traitlets.config import Config
+
+    from jupyter_server_fileid.manager import ArbitraryFileIdManager
+
+    db_path, journal_mode, worker, n_ops = sys.argv[1:]
+    config = Config()
+    # wait briefly for locks so that retries are exercised
+    config.SqliteFileIdStore.busy_timeout = 0.001
+    config.SqliteFileIdStore.busy_retries = 100
+    config.SqliteFileIdStore.busy_retry_backoff = 0.001
+    manager = ArbitraryFileIdManager(
+        config=config, db_path=db_path, root_dir="/", db_journal_mode=journal_mode
+    )
+    # start all workers at once
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    ids = []
+    for i in range(int(n_ops)):
+        ids.append(manager.index(f"/{worker}/{i}"))
+        if i % 2:
+            manager.move(f"/{worker}/{i}", f"/{worker}/moved_{i}")
+    print(*ids, flush=True)
+    """
+)
+
+
+@pytest.mark.parametrize("journal_mode", ["DELETE", "WAL"])
+def test_concurrent_managers(fid_db_path, journal_mode):
+    """Managers in separate processes sharing a database must not lose any
+    writes when contending for locks."""
+    n_workers, n_ops = 3, 200
+    # create the database upfront so that workers do not race to create it
+    manager = ArbitraryFileIdManager(
+        db_path=fid_db_path, root_dir="/", db_journal_mode=journal_mode
+    )
+    del manager
+
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", STRESS_WORKER, fid_db_path, journal_mode]
+            + [str(worker), str(n_ops)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for worker in range(n_workers)
+    ]
+    for worker in workers:
+        assert worker.stdout is not None
+        assert worker.stdout.readline().strip() == "ready"
+    outputs = [worker.communicate("go\n", timeout=60)[0] for worker in workers]
+    assert all(worker.returncode == 0 for worker in workers)
+
+    manager = ArbitraryFileIdManager(db_path=fid_db_path, root_dir="/")
+    assert manager.store.count() == n_workers * n_ops
+    for n, output in enumerate(outputs):
+        ids = output.split()
+        assert len(ids) == n_ops
+        for i, id in enumerate(ids):
+            name = f"moved_{i}" if i % 2 else str(i)
+            assert manager.get_path(id) == f"{n}/{name}"
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+
+from jupyter_server_fileid.storage import SqliteFileIdStore
+
+
+@pytest.fixture
+def jp_server_config(fid_db_path):
+    return {
+        "ServerApp": {"jpserver_extensions": {"jupyter_server_fileid": True}},
+        "BaseFileIdManager": {"db_path": fid_db_path},
+    }
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def operation_count(manager, operation):
+    return sample(
+        "jupyter_server_fileid_operation_duration_seconds_count",
+        manager=type(manager).__name__,
+        operation=operation,
+    )
+
+
+def test_operation_metrics(any_fid_manager):
+    before = operation_count(any_fid_manager, "index")
+    any_fid_manager.index("a.txt")
+    any_fid_manager.index("b.txt")
+    assert operation_count(any_fid_manager, "index") == before + 2
+
+
+def test_sync_metrics(fid_manager, fs_helpers):
+    fs_helpers.touch("dir", dir=True)
+    fs_helpers.touch("dir/a.txt")
+    id = fid_manager.index("dir/a.txt")
+    fid_manager.index("dir")
+
+    hits = sample("jupyter_server_fileid_path_cache_total", result="hit")
+    assert fid_manager.get_path(id) == "dir/a.txt"
+    assert sample("jupyter_server_fileid_path_cache_total", result="hit") == hits + 1
+
+    misses = sample("jupyter_server_fileid_path_cache_total", result="miss")
+    runs = sample("jupyter_server_fileid_sync_runs_total")
+    visited = sample("jupyter_server_fileid_sync_dirs_visited_total")
+    reidentified = sample("jupyter_server_fileid_sync_files_reidentified_total")
+    get_paths = operation_count(fid_manager, "get_path")
+    sync_alls = operation_count(fid_manager, "sync_all")
+    indexes = operation_count(fid_manager, "index")
+
+    fs_helpers.move("dir/a.txt", "dir/b.txt")
+    assert fid_manager.get_path(id) == "dir/b.txt"
+    assert sample("jupyter_server_fileid_path_cache_total", result="miss") == misses + 1
+    assert sample("jupyter_server_fileid_sync_runs_total") == runs + 1
+    assert sample("jupyter_server_fileid_sync_dirs_visited_total") > visited
+    assert (
+        sample("jupyter_server_fileid_sync_files_reidentified_total")
+        == reidentified + 1
+    )
+    # the sync and the indexing it performs count towards get_path() only
+    assert operation_count(fid_manager, "get_path") == get_paths + 1
+    assert operation_count(fid_manager, "sync_all") == sync_alls
+    assert operation_count(fid_manager, "index") == indexes
+
+    # files found at a new path by lookups rather than syncs are not counted
+    fs_helpers.move("dir/b.txt", "dir/c.txt")
+    assert fid_manager.get_id("dir/c.txt") == id
+    assert (
+        sample("jupyter_server_fileid_sync_files_reidentified_total")
+        == reidentified + 1
+    )
+
+
+def test_disk_usage(any_fid_manager):
+    for i in range(10):
+        any_fid_manager.index(f"{i}.txt")
+    db_size, wal_size = any_fid_manager.disk_usage()
+    assert db_size >= 0
+    assert wal_size >= 0
+
+
+@pytest.mark.parametrize("fid_store_class", [SqliteFileIdStore])
+def test_disk_usage_sqlite(fid_manager):
+    fid_manager.index("a.txt")
+    db_size, _ = fid_manager.disk_usage()
+    assert db_size > 0
+
+
+async def test_metrics_endpoint(jp_fetch, jp_root_dir, jp_serverapp):
+    fid_manager = jp_serverapp.web_app.settings["file_id_manager"]
+    (jp_root_dir / "a.txt").touch()
+    fid_manager.index("a.txt")
+    renames = sample(
+        "jupyter_server_fileid_event_duration_seconds_count", action="rename"
+    )
+
+    await jp_fetch(
+        "api/contents", "a.txt", method="PATCH", body=json.dumps({"path": "b.txt"})
+    )
+    # listeners are scheduled as tasks by the event logger
+    await asyncio.sleep(0.1)
+    assert (
+        sample("jupyter_server_fileid_event_duration_seconds_count", action="rename")
+        == renames + 1
+    )
+
+    response = await jp_fetch("metrics")
+    metrics = response.body.decode()
+    assert f"jupyter_server_fileid_records {float(fid_manager.count())}" in metrics
+    assert "jupyter_server_fileid_db_size_bytes" in metrics
+    assert "jupyter_server_fileid_wal_size_bytes" in metrics
@@ -0,0 +1,131 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+from traitlets import TraitError
+from traitlets.config import Config
+
+from jupyter_server_fileid.manager import ArbitraryFileIdManager
+from jupyter_server_fileid.push import ChangePublisher, PrefixIndex, Subscription
+from jupyter_server_fileid.storage import SqliteFileIdStore
+
+
+@pytest.fixture
+def jp_server_config(fid_db_path):
+    return {
+        "ServerApp": {"jpserver_extensions": {"jupyter_server_fileid": True}},
+        "BaseFileIdManager": {"db_path": fid_db_path},
+    }
+
+
+@pytest.fixture
+def publisher(arbitrary_fid_manager):
+    return ChangePublisher(manager=arbitrary_fid_manager)
+
+
+def subscription():
+    messages: List[Dict[str, Any]] = []
+    sub = Subscription(messages.append)
+    return sub, messages
+
+
+def test_prefix_index():
+    index = PrefixIndex()
+    a, _ = subscription()
+    b, _ = subscription()
+    index.add("", a)
+    index.add("dir/sub", b)
+
+    assert index.match("other.txt") == {a}
+    assert index.match("dir/sub") == {a, b}
+    assert index.match("dir/sub/a.txt") == {a, b}
+    assert index.match("dir/subway") == {a}
+
+    index.discard("dir/sub", b)
+    assert index.match("dir/sub/a.txt") == {a}
+    # empty nodes are pruned
+    assert index._root.children == {}
+
+
+@pytest.mark.parametrize("fid_store_class", [SqliteFileIdStore])
+def test_publisher(publisher, arbitrary_fid_manager):
+    manager = arbitrary_fid_manager
+    by_id, by_id_messages = subscription()
+    by_prefix, by_prefix_messages = subscription()
+    a_id = manager.index("dir/a.txt")
+    b_id = manager.index("b.txt")
+    publisher.subscribe(by_id, ids=[b_id])
+    publisher.subscribe(by_prefix, prefixes=["dir"])
+    assert publisher.tick() == 0
+
+    # moves into, within, and out of the prefix are pushed
+    manager.move("b.txt", "dir/b.txt")
+    manager.move("dir/a.txt", "dir/c.txt")
+    manager.move("dir/c.txt", "out.txt")
+    manager.index("other.txt")
+    assert publisher.tick() == 2
+    assert by_id_messages == [
+        {"changes": [{"id": b_id, "old_path": "b.txt", "path": "dir/b.txt"}]}
+    ]
+    # changes of the same file ID are coalesced
+    assert by_prefix_messages == [
+        {
+            "changes": [
+                {"id": b_id, "old_path": "b.txt", "path": "dir/b.txt"},
+                {"id": a_id, "old_path": "dir/a.txt", "path": "out.txt"},
+            ]
+        }
+    ]
+
+    publisher.unsubscribe(by_prefix, prefixes=["dir"])
+    manager.delete("dir")
+    assert publisher.tick() == 1
+    assert by_id_messages[-1] == {
+        "changes": [{"id": b_id, "old_path": "dir/b.txt", "path": None}]
+    }
+
+
+def test_publisher_reset(fid_db_path, jp_root_dir):
+    manager = ArbitraryFileIdManager(
+        db_path=fid_db_path,
+        root_dir=str(jp_root_dir),
+        config=Config({"SqliteFileIdStore": {"change_log_retention": 10}}),
+    )
+    publisher = ChangePublisher(manager=manager)
+    sub, messages = subscription()
+    publisher.subscribe(sub, prefixes=[""])
+    manager.index("0.txt")
+    for i in range(200):
+        manager.move(f"{i}.txt", f"{i + 1}.txt")
+    assert publisher.tick() == 1
+    assert messages == [{"reset": True}]
+
+
+def test_publisher_hashmap(hashmap_fid_manager):
+    with pytest.raises(NotImplementedError):
+        ChangePublisher(manager=hashmap_fid_manager)
+
+
+@pytest.mark.parametrize("fid_store_class", [SqliteFileIdStore])
+def test_publisher_validated(arbitrary_fid_manager):
+    with pytest.raises(TraitError):
+        ChangePublisher(manager=arbitrary_fid_manager, interval=0)
+
+
+async def test_push_handler(jp_ws_fetch, jp_serverapp):
+    ext_pkg = jp_serverapp.extension_manager.extensions["jupyter_server_fileid"]
+    extension = ext_pkg.extension_points["jupyter_server_fileid"].app
+    manager = extension.file_id_manager
+    id = manager.index("a.txt")
+
+    ws = await jp_ws_fetch("api/fileid/changes/ws")
+    await ws.write_message(json.dumps({"action": "subscribe", "ids": [id]}))
+    await ws.write_message(json.dumps({"action": "unknown"}))
+    assert json.loads(await ws.read_message()) == {"error": "Unknown action: unknown."}
+
+    manager.move("a.txt", "b.txt")
+    extension._publisher.tick()
+    assert json.loads(await ws.read_message()) == {
+        "changes": [{"id": id, "old_path": "a.txt", "path": "b.txt"}]
+    }
+    ws.close()
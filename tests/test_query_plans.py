@@ -0,0 +1,101 @@
+"""Guards against statements issued by the SQLite-backed managers regressing
+to full scans of the Files table. Every statement issued during a workload is
+captured with `set_trace_callback()`, and `EXPLAIN QUERY PLAN` is run on each
+once the workload completes."""
+
+import pytest
+
+from jupyter_server_fileid.manager import BaseFileIdManager
+from jupyter_server_fileid.storage import SqliteFileIdStore
+
+# statements that must scan the Files table by design. these are matched by
+# prefix against the traced SQL.
+ALLOWED_SCANS = ("SELECT COUNT(*) FROM Files",)
+
+# names of directories containing characters that are special in GLOB and
+# LIKE patterns, which may prevent prefix queries from using an index.
+DIR_NAMES = ["dir", "dir[1]", "dir*?", "dir_%"]
+
+
+@pytest.fixture
+def fid_store_class():
+    """Overrides the storage backend of the `fid_manager` fixtures, since the
+    other SQLite storage backends issue the same statements."""
+    return SqliteFileIdStore
+
+
+def trace(fid_manager: BaseFileIdManager) -> list:
+    statements: list = []
+    fid_manager.con.set_trace_callback(statements.append)
+    return statements
+
+
+def plan_scans(fid_manager: BaseFileIdManager, statements: list) -> dict:
+    """Returns each statement in `statements` that scans the Files table,
+    mapped to its query plan."""
+    fid_manager.con.set_trace_callback(None)
+    scans = {}
+    for sql in set(statements):
+        if not sql.upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+            continue
+        if sql.startswith(ALLOWED_SCANS):
+            continue
+        plan = [row[-1] for row in fid_manager.con.execute("EXPLAIN QUERY PLAN " + sql)]
+        if any(detail.startswith("SCAN Files") for detail in plan):
+            scans[sql] = plan
+    return scans
+
+
+def test_local_query_plans(fid_manager, fs_helpers):
+    for name in DIR_NAMES:
+        fs_helpers.touch(name, dir=True)
+        fs_helpers.touch(f"{name}/child")
+    statements = trace(fid_manager)
+
+    for name in DIR_NAMES:
+        id = fid_manager.index(f"{name}/child")
+        fid_manager.get_id(f"{name}/child")
+        fid_manager.get_path(id)
+
+        fs_helpers.move(name, f"{name}_moved")
+        fid_manager.move(name, f"{name}_moved")
+        fs_helpers.copy(f"{name}_moved", f"{name}_copied")
+        fid_manager.copy(f"{name}_moved", f"{name}_copied")
+        fs_helpers.edit(f"{name}_copied/child")
+        fid_manager.save(f"{name}_copied/child")
+        fs_helpers.delete(f"{name}_copied")
+        fid_manager.delete(f"{name}_copied")
+
+        # move out of band, such that the move is detected by syncing
+        fs_helpers.move(f"{name}_moved", name)
+        fid_manager.get_id(f"{name}/child")
+    fid_manager.get_path("missing")
+    fid_manager._sync_all()
+
+    assert statements
+    assert plan_scans(fid_manager, statements) == {}
+
+
+def test_arbitrary_query_plans(arbitrary_fid_manager):
+    fid_manager = arbitrary_fid_manager
+    statements = trace(fid_manager)
+
+    for name in DIR_NAMES:
+        fid_manager.index(name)
+        id = fid_manager.index(f"{name}/child")
+        fid_manager.get_id(f"{name}/child")
+        fid_manager.get_path(id)
+
+        fid_manager.move(name, f"{name}_moved")
+        fid_manager.copy(f"{name}_moved", f"{name}_copied")
+        fid_manager.save(f"{name}_copied/child")
+        fid_manager.delete(f"{name}_copied")
+    fid_manager.get_path("missing")
+
+    assert statements
+    assert plan_scans(fid_manager, statements) == {}
+
+
+def test_query_plans_detect_scans(fid_manager):
+    sql = "SELECT id FROM Files WHERE crtime = 1"
+    assert list(plan_scans(fid_manager, [sql])) == [sql]
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from jupyter_server_fileid.cli import main
+from jupyter_server_fileid.manager import ArbitraryFileIdManager
+from jupyter_server_fileid.replay import EventRecorder, read_events, replay
+
+
+@pytest.fixture
+def events_path(tmp_path):
+    return str(tmp_path / "events.ndjson")
+
+
+@pytest.fixture
+def jp_server_config(events_path):
+    return {
+        "ServerApp": {"jpserver_extensions": {"jupyter_server_fileid": True}},
+        "FileIdExtension": {"record_events_path": events_path},
+    }
+
+
+def record(events_path, events):
+    recorder = EventRecorder(path=events_path)
+    for event in events:
+        recorder.record(event)
+    recorder.close()
+
+
+EVENTS = [
+    {"action": "get", "path": "a.txt"},
+    {"action": "rename", "source_path": "a.txt", "path": "b.txt"},
+    {"action": "copy", "source_path": "b.txt", "path": "c.txt"},
+    {"action": "delete", "path": "b.txt"},
+]
+
+
+async def test_record_events(jp_fetch, jp_root_dir, events_path):
+    (jp_root_dir / "a.txt").touch()
+    await jp_fetch(
+        "api/contents", "a.txt", method="PATCH", body=json.dumps({"path": "b.txt"})
+    )
+    # listeners are scheduled as tasks by the event logger
+    await asyncio.sleep(0.1)
+
+    # the contents API also emits a get event for the renamed file
+    events = list(read_events(events_path))
+    assert events[0]["action"] == "rename"
+    assert events[0]["source_path"] == "a.txt"
+    assert events[0]["path"] == "b.txt"
+    assert isinstance(events[0]["t"], float)
+
+
+def test_read_events_skips_truncated_lines(events_path):
+    record(events_path, EVENTS[:2])
+    with open(events_path, "a", encoding="utf-8") as f:
+        f.write('{"t":1,"action":"dele')
+
+    assert [event["action"] for event in read_events(events_path)] == ["get", "rename"]
+
+
+def test_replay(events_path, arbitrary_fid_manager):
+    arbitrary_fid_manager.index("a.txt")
+    record(events_path, EVENTS)
+
+    stats = replay(arbitrary_fid_manager, read_events(events_path))
+    assert stats.events == 4
+    assert stats.skipped == 1
+    assert stats.records == 1
+    assert set(stats.actions) == {"rename", "copy", "delete"}
+    assert all(action.events == 1 for action in stats.actions.values())
+    assert all(action.errors == 0 for action in stats.actions.values())
+    assert arbitrary_fid_manager.get_id("c.txt") is not None
+
+
+def test_replay_errors(events_path, arbitrary_fid_manager):
+    record(events_path, EVENTS[1:2])
+
+    # database errors are counted, other errors propagate
+    with patch.object(
+        arbitrary_fid_manager, "move", side_effect=sqlite3.OperationalError
+    ):
+        stats = replay(arbitrary_fid_manager, read_events(events_path))
+    assert stats.actions["rename"].errors == 1
+    with (
+        patch.object(arbitrary_fid_manager, "move", side_effect=RuntimeError),
+        pytest.raises(RuntimeError),
+    ):
+        replay(arbitrary_fid_manager, read_events(events_path))
+
+
+def test_replay_cli(events_path, jp_root_dir, fid_db_path):
+    record(events_path, EVENTS)
+
+    result = CliRunner().invoke(
+        main,
+        ["replay", events_path, "--root-dir", str(jp_root_dir), "--json"]
+        + ["--db-path", fid_db_path],
+    )
+    assert result.exit_code == 0, result.output
+    stats = json.loads(result.output)
+    assert stats["events"] == 4
+    assert stats["skipped"] == 1
+    assert stats["actions"]["copy"]["events"] == 1
+    # `a.txt` was never indexed, so the copy indexes only its destination
+    assert stats["records"] == 1
+
+    manager = ArbitraryFileIdManager(db_path=fid_db_path, root_dir=str(jp_root_dir))
+    assert manager.get_id("c.txt") is not None
+
+    result = CliRunner().invoke(main, ["replay", events_path])
+    assert result.exit_code == 0, result.output
+    assert "Replayed 3 of 4 events" in result.output
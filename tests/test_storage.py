@@ -0,0 +1,607 @@
+import os
+import sqlite3
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from traitlets import TraitError
+
+from jupyter_server_fileid.storage import (
+    DbmFileIdStore,
+    DuplicateRecordError,
+    FileRecord,
+    ShardedSqliteFileIdStore,
+    SqliteFileIdStore,
+)
+
+
+@pytest.fixture(params=[True, False], ids=["stat_info", "no_stat_info"])
+def stat_info(request):
+    return request.param
+
+
+@pytest.fixture
+def store(fid_store_class, fid_db_path, stat_info):
+    store = fid_store_class(db_path=fid_db_path, stat_info=stat_info)
+    yield store
+    store.close()
+
+
+def make_record(store, id, path, ino=None, is_dir=False):
+    if not store.stat_info:
+        return FileRecord(id, path)
+    return FileRecord(id, path, ino or hash(id) % 100000, 1, 2, is_dir)
+
+
+def test_get(store):
+    record = make_record(store, "id", "/a", ino=1)
+    with store.transaction():
+        store.insert(record)
+
+    assert store.get("id") == record
+    assert store.get_by_path("/a") == record
+    assert store.get("other") is None
+    assert store.get_by_path("/b") is None
+    if store.stat_info:
+        assert store.get_by_ino(1) == record
+        assert store.get_by_ino(2) is None
+
+
+def test_update(store):
+    with store.transaction():
+        store.insert(make_record(store, "id", "/a", ino=1))
+        store.update("id", path="/b")
+
+    assert store.get("id").path == "/b"
+    assert store.get_by_path("/a") is None
+    assert store.get_by_path("/b").id == "id"
+
+    if store.stat_info:
+        with store.transaction():
+            store.update("id", ino=3, mtime=4)
+        assert store.get("id").mtime == 4
+        assert store.get_by_ino(1) is None
+        assert store.get_by_ino(3).id == "id"
+
+
+def test_delete(store):
+    with store.transaction():
+        store.insert(make_record(store, "id_1", "/a"))
+        store.insert(make_record(store, "id_2", "/b"))
+        store.delete("id_1")
+        store.delete_by_path("/b")
+
+    assert store.get("id_1") is None
+    assert store.get("id_2") is None
+    assert store.get_by_path("/a") is None
+    assert store.count() == 0
+
+
+def test_paths_unique_without_stat_info(store):
+    with store.transaction():
+        store.insert(make_record(store, "id_1", "/a"))
+
+    if store.stat_info:
+        # records of deleted files may occupy the same path
+        with store.transaction():
+            store.insert(make_record(store, "id_2", "/a"))
+        with store.transaction():
+            store.delete_by_path("/a")
+        assert store.count() == 0
+    else:
+        with (
+            pytest.raises((sqlite3.IntegrityError, DuplicateRecordError)),
+            store.transaction(),
+        ):
+            store.insert(make_record(store, "id_2", "/a"))
+        assert store.count() == 1
+
+
+def test_transaction_rollback(store):
+    with store.transaction():
+        store.insert(make_record(store, "id_1", "/a"))
+
+    with pytest.raises(ValueError), store.transaction():
+        store.insert(make_record(store, "id_2", "/b"))
+        store.delete("id_1")
+        raise ValueError()
+
+    assert store.get("id_1") is not None
+    assert store.get("id_2") is None
+
+
+def test_children(store):
+    paths = ["/a", "/a/b", "/a/b/c", "/a b", "/a0", "/ab/c"]
+    with store.transaction():
+        store.insert_many(
+            make_record(store, f"id_{i}", path) for i, path in enumerate(paths)
+        )
+
+    children = store.get_children("/a", "/")
+    assert sorted(record.path for record in children) == ["/a/b", "/a/b/c"]
+
+    with store.transaction():
+        store.move_children("/a", "/z", "/")
+    assert store.get("id_1").path == "/z/b"
+    assert store.get("id_2").path == "/z/b/c"
+    assert store.get("id_0").path == "/a"
+    assert store.get("id_3").path == "/a b"
+
+    with store.transaction():
+        store.delete_children("/z", "/")
+    assert store.get("id_1") is None
+    assert store.get("id_2") is None
+    assert store.count() == 4
+
+
+def test_children_special_characters(store):
+    """Characters that are wildcards in GLOB and LIKE patterns must be matched
+    literally."""
+    paths = ["/[a]", "/[a]/b", "/a/b", "/*", "/*/b", "/_%", "/_%/b", "/x%/b"]
+    with store.transaction():
+        store.insert_many(
+            make_record(store, f"id_{i}", path) for i, path in enumerate(paths)
+        )
+
+    for path in ["/[a]", "/*", "/_%"]:
+        children = store.get_children(path, "/")
+        assert [record.path for record in children] == [path + "/b"]
+
+    with store.transaction():
+        store.move_children("/*", "/moved", "/")
+        store.delete_children("/_%", "/")
+    assert store.get("id_4").path == "/moved/b"
+    assert store.get("id_6") is None
+    assert store.count() == 7
+
+
+def test_get_dirs(store):
+    if not store.stat_info:
+        pytest.skip("Requires stat info.")
+
+    with store.transaction():
+        store.insert(make_record(store, "id_1", "/a", is_dir=True))
+        store.insert(make_record(store, "id_2", "/a/b"))
+
+    assert list(store.get_dirs()) == [("/a", 2)]
+
+
+def test_scan(store):
+    ids = [f"id_{i:02}" for i in range(10)]
+    with store.transaction():
+        store.insert_many(make_record(store, id, f"/{id}") for id in reversed(ids))
+
+    scanned: List[str] = []
+    records = store.scan("", 3)
+    while records:
+        assert len(records) <= 3
+        scanned.extend(record.id for record in records)
+        records = store.scan(records[-1].id, 3)
+    assert scanned == ids
+
+
+def test_dump(store):
+    records = [make_record(store, f"id_{i}", f"/{i}") for i in range(5)]
+    with store.transaction():
+        store.insert_many(records)
+    assert sorted(store.dump()) == records
+
+
+def test_replace_many(store):
+    with store.transaction():
+        store.insert_many(
+            [make_record(store, "a", "/a"), make_record(store, "b", "/b")]
+        )
+    replacement = make_record(store, "c", "/b", ino=store.get("b").ino)
+    with store.transaction():
+        store.replace_many([make_record(store, "a", "/moved"), replacement])
+    assert store.get("a").path == "/moved"
+    assert store.get("b") is None
+    assert store.get("c") == replacement
+    assert store.count() == 2
+
+
+def test_sqlite_vacuum(fid_db_path):
+    store = SqliteFileIdStore(db_path=fid_db_path, stat_info=True)
+    with store.transaction():
+        store.insert_many(
+            FileRecord(f"id_{i}", "/" + "a" * 200 + str(i), i, 1, 2, False)
+            for i in range(1000)
+        )
+    with store.transaction():
+        store.delete_children("", "/")
+
+    def freelist_count():
+        return store.con.execute("PRAGMA freelist_count").fetchone()[0]
+
+    size = os.path.getsize(fid_db_path)
+    free = freelist_count()
+    assert free > 2
+    # each vacuum frees at most `vacuum_pages` pages
+    store.vacuum_pages = 2
+    assert not store.vacuum()
+    assert freelist_count() == free - 2
+    store.vacuum_pages = 0
+    assert store.vacuum()
+    assert freelist_count() == 0
+    assert os.path.getsize(fid_db_path) < size
+    store.close()
+
+
+def test_sqlite_change_log(fid_db_path, stat_info):
+    store = SqliteFileIdStore(db_path=fid_db_path, stat_info=stat_info)
+    assert store.last_change() == 0
+    assert store.get_changes(0, 10) == []
+    with store.transaction():
+        store.insert_many(
+            [make_record(store, "a", "/a", ino=1), make_record(store, "b", "/a/b", 2)]
+        )
+        store.move_children("/a", "/c", "/")
+        store.update("a", path="/c")
+        store.delete_children("/c", "/")
+        if stat_info:
+            # updates leaving the path unchanged are not recorded
+            store.update("a", mtime=3)
+
+    # inserts are not recorded
+    assert store.get_changes(0, 10) == [
+        (1, "b", "/a/b", "/c/b"),
+        (2, "a", "/a", "/c"),
+        (3, "b", "/c/b", None),
+    ]
+    assert store.get_changes(1, 1) == [(2, "a", "/a", "/c")]
+    assert store.last_change() == 3
+    # cursors from the future, e.g. of a recreated database, are expired
+    assert store.get_changes(4, 10) is None
+
+    # records replaced by file ID are recorded as moves, and records replaced
+    # by inode number or path as deletes
+    with store.transaction():
+        store.replace_many(
+            [make_record(store, "a", "/d", ino=1), make_record(store, "e", "/d", 1)]
+        )
+    assert store.get_changes(3, 10) == [
+        (4, "a", "/c", "/d"),
+        (5, "a", "/d", None),
+    ]
+    assert [record.id for record in store.dump()] == ["e"]
+    store.close()
+
+
+def test_sqlite_change_log_retention(fid_db_path):
+    store = SqliteFileIdStore(db_path=fid_db_path, change_log_retention=150)
+    with store.transaction():
+        store.insert(FileRecord("id", "/0"))
+        for i in range(300):
+            store.update("id", path=f"/{i + 1}")
+
+    assert store.last_change() == 300
+    assert store.get_changes(0, 10) is None
+    assert store.get_changes(149, 10) is None
+    assert store.get_changes(150, 1) == [(151, "id", "/150", "/151")]
+    store.close()
+
+    store = SqliteFileIdStore(db_path=fid_db_path, change_log_retention=0)
+    with pytest.raises(NotImplementedError):
+        store.get_changes(0, 10)
+    store.close()
+
+
+def test_sqlite_search(fid_db_path, stat_info):
+    store = SqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=stat_info, search_index=True
+    )
+    with store.transaction():
+        store.insert_many(
+            [
+                make_record(store, "a", "/root/notebooks/Analysis.ipynb", ino=1),
+                make_record(store, "b", "/root/analysis/data.csv", ino=2),
+                make_record(store, "c", "/root/an.py", ino=3),
+                make_record(store, "d", "/root/rootless.txt", ino=4),
+            ]
+        )
+        store.update("c", path="/root/scripts/analysis.py")
+
+    def search(query):
+        return [record.id for record in store.search(query, 10)]
+
+    # matches in file names rank first, ignoring case
+    assert search("analysis") == ["c", "a", "b"]
+    assert search("ts/ana") == ["c"]
+    # the root directory is not indexed
+    assert search("root") == ["d"]
+    # short queries match the start of file names
+    assert search("an") == ["a", "c"]
+    assert search("%") == []
+
+    with store.transaction():
+        store.delete("c")
+    assert search("analysis") == ["a", "b"]
+    store.close()
+
+    # the index is built from existing records when enabled, and dropped when
+    # disabled
+    store = SqliteFileIdStore(db_path=fid_db_path, root_dir="/", stat_info=stat_info)
+    with pytest.raises(NotImplementedError):
+        store.search("analysis", 10)
+    store.close()
+    store = SqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=stat_info, search_index=True
+    )
+    assert search("data") == ["b"]
+    store.close()
+
+
+@pytest.mark.parametrize("profile", list(SqliteFileIdStore.PROFILES))
+def test_sqlite_profile(fid_db_path, profile):
+    store = SqliteFileIdStore(db_path=fid_db_path, profile=profile)
+    settings = SqliteFileIdStore.PROFILES[profile]
+
+    def pragma(name):
+        return store.con.execute(f"PRAGMA {name}").fetchone()[0]
+
+    synchronous_modes = SqliteFileIdStore.SYNCHRONOUS_MODES
+    assert synchronous_modes[pragma("synchronous")] == settings["synchronous"]
+    assert pragma("cache_size") == settings["cache_size"]
+    assert pragma("mmap_size") == settings["mmap_size"]
+    assert SqliteFileIdStore.TEMP_STORES[pragma("temp_store")] == settings["temp_store"]
+    store.close()
+
+
+def test_sqlite_profile_overrides(fid_db_path):
+    store = SqliteFileIdStore(
+        db_path=fid_db_path, profile="balanced", synchronous="full", mmap_size=0
+    )
+    assert store.con.execute("PRAGMA synchronous").fetchone()[0] == 2
+    assert store.con.execute("PRAGMA mmap_size").fetchone()[0] == 0
+    assert store.con.execute("PRAGMA cache_size").fetchone()[0] == -16384
+    store.close()
+
+
+def test_sqlite_read_only(fid_db_path):
+    # the database is not created
+    with pytest.raises(sqlite3.OperationalError):
+        SqliteFileIdStore(db_path=fid_db_path, read_only=True)
+    assert not os.path.exists(fid_db_path)
+
+    store = SqliteFileIdStore(db_path=fid_db_path)
+    with store.transaction():
+        store.insert(FileRecord("id", "/a"))
+    store.close()
+    with open(fid_db_path, "rb") as f:
+        contents = f.read()
+
+    store = SqliteFileIdStore(db_path=fid_db_path, read_only=True)
+    assert store.get("id") == FileRecord("id", "/a")
+    assert [record.id for record in store.scan("", 10)] == ["id"]
+    with pytest.raises(sqlite3.OperationalError, match="readonly"), store.transaction():
+        store.insert(FileRecord("id_2", "/b"))
+    store.close()
+    with open(fid_db_path, "rb") as f:
+        assert f.read() == contents
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"profile": "reckless"},
+        {"synchronous": "SOMETIMES"},
+        {"temp_store": "DISK"},
+        {"mmap_size": -1},
+        {"cached_statements": -1},
+    ],
+)
+def test_sqlite_profile_validated(fid_db_path, kwargs):
+    with pytest.raises(TraitError):
+        SqliteFileIdStore(db_path=fid_db_path, **kwargs)
+
+
+def test_persistence(fid_store_class, fid_db_path, stat_info):
+    store = fid_store_class(db_path=fid_db_path, stat_info=stat_info)
+    record = make_record(store, "id", "/a")
+    with store.transaction():
+        store.insert(record)
+    store.close()
+
+    store = fid_store_class(db_path=fid_db_path, stat_info=stat_info)
+    assert store.get("id") == record
+    store.close()
+
+
+def test_dbm_index(fid_db_path, stat_info):
+    store = DbmFileIdStore(db_path=fid_db_path, stat_info=stat_info)
+    paths = ["/a", "/a/b", "/a/b/c", "/d"]
+    with store.transaction():
+        store.insert_many(
+            make_record(store, f"id_{i}", path) for i, path in enumerate(paths)
+        )
+    # remove the index, as in databases created before it was maintained
+    for key in list(store._db.keys()):
+        if key.startswith((b"c/", b"n/")):
+            del store._db[key]
+    store.close()
+
+    store = DbmFileIdStore(db_path=fid_db_path, stat_info=stat_info)
+    assert store.count() == 4
+    children = store.get_children("/a", "/")
+    assert sorted(record.path for record in children) == ["/a/b", "/a/b/c"]
+
+    with store.transaction():
+        store.delete_children("/a", "/")
+        store.delete_by_path("/a")
+    assert store.count() == 1
+    # paths without records or descendants holding records are pruned
+    keys = [key for key in map(bytes.decode, store._db.keys()) if key[:2] == "c/"]
+    assert [key for key in keys if store._get(key) is not None] == ["c/"]
+    store.close()
+
+
+def test_dbm_scan(fid_db_path, stat_info):
+    store = DbmFileIdStore(db_path=fid_db_path, stat_info=stat_info)
+    with store.transaction():
+        store.insert_many(make_record(store, f"id_{i}", f"/{i}") for i in range(8))
+
+    with patch.object(store, "_keys", wraps=store._keys) as keys:
+        records = store.scan("", 3)
+        assert [record.id for record in records] == ["id_0", "id_1", "id_2"]
+        # writes between pages are reflected by later pages
+        with store.transaction():
+            store.insert(make_record(store, "id_1a", "/1a"))
+            store.insert(make_record(store, "id_3a", "/3a"))
+            store.delete("id_4")
+            store.delete("id_5")
+            store.insert(make_record(store, "id_5", "/5a"))
+        scanned: List[str] = []
+        while records:
+            records = store.scan(records[-1].id, 3)
+            scanned.extend(record.id for record in records)
+        # keys are only listed at the start of the pass
+        keys.assert_called_once()
+    assert scanned == ["id_3", "id_3a", "id_5", "id_6", "id_7"]
+    record = store.get("id_5")
+    assert record is not None
+    assert record.path == "/5a"
+    store.close()
+
+
+@pytest.fixture
+def sharded_store(fid_db_path, stat_info):
+    store = ShardedSqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=stat_info
+    )
+    yield store
+    store.close()
+
+
+def test_sharded_ids_encode_shard(sharded_store):
+    assert "." not in sharded_store.new_id("/root/a")
+    assert sharded_store.new_id("/root/a/b").startswith(
+        sharded_store.shard_name("/root/a/b") + "."
+    )
+    assert sharded_store.shard_name("/root/a/b") == sharded_store.shard_name(
+        "/root/a/c/d"
+    )
+    assert sharded_store.shard_name("/root/a/b") != sharded_store.shard_name(
+        "/root/b/c"
+    )
+
+
+def test_sharded_creates_shards_on_write(sharded_store, fid_db_path):
+    shards_dir = fid_db_path + ".shards"
+    assert sharded_store.get_by_path("/root/a/b") is None
+    assert sharded_store.get("0123456789abcdef.id") is None
+    assert not os.path.exists(shards_dir)
+
+    record = make_record(sharded_store, sharded_store.new_id("/root/a/b"), "/root/a/b")
+    with sharded_store.transaction():
+        sharded_store.insert(record)
+
+    assert os.listdir(shards_dir) == [
+        sharded_store.shard_name("/root/a/b") + ShardedSqliteFileIdStore.SHARD_SUFFIX
+    ]
+    assert sharded_store.get(record.id) == record
+    assert sharded_store.get("../" + record.id) is None
+
+
+def test_sharded_cross_shard_move(sharded_store, fid_db_path):
+    paths = ["/root/a", "/root/a/b", "/root/a/b/c"]
+    records = [
+        make_record(sharded_store, sharded_store.new_id(path), path) for path in paths
+    ]
+    with sharded_store.transaction():
+        sharded_store.insert_many(records)
+
+    with sharded_store.transaction():
+        sharded_store.update(records[0].id, path="/root/z")
+        sharded_store.move_children("/root/a", "/root/z", "/")
+        sharded_store.update(records[1].id, path="/root/y")
+
+    assert sharded_store.get(records[0].id).path == "/root/z"
+    assert sharded_store.get(records[1].id).path == "/root/y"
+    assert sharded_store.get(records[2].id).path == "/root/z/b/c"
+    assert sharded_store.get_by_path("/root/a/b/c") is None
+    assert sharded_store.get_by_path("/root/z/b/c").id == records[2].id
+    assert sharded_store.count() == 3
+
+    # file IDs of moved records are resolved after reopening the store
+    sharded_store.close()
+    store = ShardedSqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=sharded_store.stat_info
+    )
+    record = store.get(records[2].id)
+    assert record is not None
+    assert record.path == "/root/z/b/c"
+    store.delete(records[2].id)
+    store.commit()
+    assert store.get(records[2].id) is None
+    store.close()
+
+
+def test_sharded_recovers_interrupted_move(sharded_store, fid_db_path, stat_info):
+    record = make_record(sharded_store, sharded_store.new_id("/root/a/b"), "/root/a/b")
+    with sharded_store.transaction():
+        sharded_store.insert(record)
+
+    # simulate a move interrupted after committing its intent
+    src = sharded_store.shard_name("/root/a/b")
+    dst = sharded_store.shard_name("/root/z/b")
+    sharded_store.con.execute(
+        "INSERT INTO Relocations (id, src, dst, path) VALUES (?, ?, ?, ?)",
+        (record.id, src, dst, "/root/z/b"),
+    )
+    sharded_store.commit()
+    sharded_store.close()
+
+    store = ShardedSqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=stat_info
+    )
+    moved = store.get(record.id)
+    assert moved is not None
+    assert moved.path == "/root/z/b"
+    assert store.get_by_path("/root/a/b") is None
+    assert store.count() == 1
+    assert store.con.execute("SELECT COUNT(*) FROM Relocations").fetchone()[0] == 0
+    store.close()
+
+
+def test_sharded_rolls_back_failed_move(sharded_store, fid_db_path):
+    paths = ["/root/a", "/root/a/b", "/root/a/c"]
+    records = [
+        make_record(sharded_store, sharded_store.new_id(path), path) for path in paths
+    ]
+    with sharded_store.transaction():
+        sharded_store.insert_many(records)
+
+    # fail once the records are inserted into the destination shard, but not
+    # yet deleted from the source shard
+    src = sharded_store._shard(sharded_store.shard_name("/root/a/b"))
+    with (
+        patch.object(src, "executemany", side_effect=sqlite3.OperationalError),
+        pytest.raises(sqlite3.OperationalError),
+        sharded_store.transaction(),
+    ):
+        sharded_store.update(records[0].id, path="/root/z")
+        with sharded_store.transaction():
+            sharded_store.move_children("/root/a", "/root/z", "/")
+
+    sharded_store.close()
+    store = ShardedSqliteFileIdStore(
+        db_path=fid_db_path, root_dir="/root", stat_info=sharded_store.stat_info
+    )
+    assert [store.get(record.id) for record in records] == records
+    assert store.get_by_path("/root/z/b") is None
+    assert store.count() == 3
+    for table in ("Relocations", "Forwarding"):
+        assert store.con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    store.close()
+
+
+def test_sharded_shard_function(fid_db_path):
+    store = ShardedSqliteFileIdStore(
+        db_path=fid_db_path,
+        root_dir="/root",
+        shard_function=lambda path: "tenants" if path.startswith("home/") else None,
+    )
+    assert store.shard_name("/root/home/a/b") == store.shard_name("/root/home/c")
+    assert store.shard_name("/root/shared/a/b") == store.MAIN_SHARD
+    store.close()
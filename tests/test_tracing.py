@@ -0,0 +1,91 @@
+import logging
+
+import pytest
+
+from jupyter_server_fileid.manager import HashMapFileIdManager, LocalFileIdManager
+from jupyter_server_fileid.pytest_plugin import _disable_journal
+from jupyter_server_fileid.storage import SqliteFileIdStore
+
+
+@pytest.fixture
+def traced_fid_manager(fid_db_path, jp_root_dir):
+    fid_manager = LocalFileIdManager(
+        db_path=fid_db_path,
+        root_dir=str(jp_root_dir),
+        store_class=SqliteFileIdStore,
+        slow_operation_threshold=0,
+    )
+    _disable_journal(fid_manager)
+    return fid_manager
+
+
+def test_trace_breakdown(traced_fid_manager, fs_helpers, caplog):
+    fs_helpers.touch("dir", dir=True)
+    fs_helpers.touch("dir/a.txt")
+    traced_fid_manager.index("dir")
+    id = traced_fid_manager.index("dir/a.txt")
+    fs_helpers.move("dir/a.txt", "dir/b.txt")
+    caplog.clear()
+
+    with caplog.at_level(logging.WARNING):
+        assert traced_fid_manager.get_path(id) == "dir/b.txt"
+
+    # the sync performed by get_path() is part of its trace
+    trace = traced_fid_manager._tracer.last_trace
+    assert trace.operation == "get_path"
+    assert trace.args == (id,)
+    assert sum(trace.statements.values()) > 0
+    assert trace.stats > 1
+    assert 0 < trace.db_time < trace.duration
+    assert 0 < trace.fs_time < trace.duration
+    messages = [
+        record.getMessage()
+        for record in caplog.records
+        if record.getMessage().startswith("Slow operation")
+    ]
+    assert len(messages) == 1
+    assert messages[0].startswith(f"Slow operation: get_path('{id}') took ")
+    assert "Most frequent statement" in messages[0]
+
+
+def test_trace_threshold(traced_fid_manager, caplog):
+    traced_fid_manager._tracer.threshold = 60
+    with caplog.at_level(logging.WARNING):
+        traced_fid_manager.index("a.txt")
+    assert traced_fid_manager._tracer.last_trace.operation == "index"
+    assert not caplog.records
+
+
+def test_trace_disabled(fid_manager):
+    assert fid_manager._tracer is None
+    assert "get_path" not in vars(fid_manager)
+    assert "get" not in vars(fid_manager.store)
+
+
+def test_trace_all_managers(
+    any_fid_manager_class, fid_store_class, fid_db_path, jp_root_dir, fs_helpers
+):
+    fs_helpers.touch("a.txt")
+    fid_manager = any_fid_manager_class(
+        db_path=fid_db_path,
+        root_dir=str(jp_root_dir),
+        store_class=fid_store_class,
+        slow_operation_threshold=0,
+    )
+    id = fid_manager.index("a.txt")
+    fid_manager.get_path(id)
+    trace = fid_manager._tracer.last_trace
+    assert trace.operation == "get_path"
+    assert trace.db_time > 0
+
+
+def test_trace_hashmap(fid_db_path, jp_root_dir):
+    fid_manager = HashMapFileIdManager(
+        db_path=fid_db_path, root_dir=str(jp_root_dir), slow_operation_threshold=0
+    )
+    fid_manager.move("a.txt", "b.txt")
+    assert fid_manager._tracer is not None
+    trace = fid_manager._tracer.last_trace
+    assert trace is not None
+    assert trace.operation == "move"
+    assert trace.stats == 0
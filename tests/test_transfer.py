@@ -0,0 +1,108 @@
+import io
+import shutil
+
+import pytest
+
+from jupyter_server_fileid.manager import LocalFileIdManager
+from jupyter_server_fileid.storage import FileRecord
+from jupyter_server_fileid.transfer import read_records, write_records
+
+PATHS = ["dir", "dir/a.txt", "dir/sub", "dir/sub/b.txt", "c.txt"]
+
+
+@pytest.fixture
+def indexed_paths(fs_helpers):
+    for path in PATHS:
+        fs_helpers.touch(path, dir="." not in path)
+    return PATHS
+
+
+@pytest.mark.parametrize("format", ["ndjson", "binary"])
+def test_export_import(any_fid_manager, indexed_paths, jp_root_dir, tmp_path, format):
+    ids = {path: any_fid_manager.index(path) for path in indexed_paths}
+    buffer = io.BytesIO()
+    count = any_fid_manager.export_records(buffer, format)
+    assert count == any_fid_manager.count()
+
+    # import into a manager of the same class on another root
+    root_dir = tmp_path / "other_root"
+    shutil.copytree(jp_root_dir, root_dir)
+    other = type(any_fid_manager)(
+        db_path=str(tmp_path / "other.db"),
+        root_dir=str(root_dir),
+        store_class=any_fid_manager.store_class,
+    )
+    buffer.seek(0)
+    assert other.import_records(buffer) == count
+    for path, id in ids.items():
+        assert other.get_path(id) == path
+        assert other.get_id(path) == id
+
+
+def test_import_local_skips_missing_files(fid_manager, indexed_paths, tmp_path):
+    ids = {path: fid_manager.index(path) for path in indexed_paths}
+    buffer = io.BytesIO()
+    fid_manager.export_records(buffer, "binary")
+
+    root_dir = tmp_path / "other_root"
+    (root_dir / "dir").mkdir(parents=True)
+    (root_dir / "dir" / "a.txt").touch()
+    other = LocalFileIdManager(
+        db_path=str(tmp_path / "other.db"), root_dir=str(root_dir)
+    )
+    buffer.seek(0)
+    other.import_records(buffer)
+
+    # the imported records replace the records created by the new manager, and
+    # hold the stat info of the files at the new root
+    assert other.get_id("dir") == ids["dir"]
+    assert other.get_path(ids["dir/a.txt"]) == "dir/a.txt"
+    assert other.get_path(ids["c.txt"]) is None
+    assert other.count() == 3
+
+
+def test_import_from_root(arbitrary_fid_manager):
+    buffer = io.BytesIO()
+    header = {"root_dir": "/old/root", "sep": "/", "stat_info": False}
+    records = [FileRecord("1", "/old/root/a.txt"), FileRecord("2", "/elsewhere/b.txt")]
+    write_records(buffer, header, records)
+
+    buffer.seek(0)
+    assert arbitrary_fid_manager.import_records(buffer) == 1
+    assert arbitrary_fid_manager.get_path("1") == "a.txt"
+
+    buffer.seek(0)
+    assert arbitrary_fid_manager.import_records(buffer, root_dir="/elsewhere") == 1
+    assert arbitrary_fid_manager.get_path("2") == "b.txt"
+
+
+@pytest.mark.parametrize("format", ["ndjson", "binary"])
+def test_read_records(format):
+    records = [
+        FileRecord("1", "/root/dir", 10, None, 3, True),
+        FileRecord("2", "/root/dir/é.txt", 11, 2, 4, False),
+    ]
+    buffer = io.BytesIO()
+    header = {"root_dir": "/root", "sep": "/", "stat_info": True}
+    assert write_records(buffer, header, records, format) == 2
+
+    buffer.seek(0)
+    read_header, read = read_records(buffer)
+    assert read_header["root_dir"] == "/root"
+    assert list(read) == records
+
+
+@pytest.mark.parametrize("format", ["ndjson", "binary"])
+def test_read_records_truncated(format):
+    buffer = io.BytesIO()
+    header = {"root_dir": "", "sep": "/", "stat_info": False}
+    write_records(buffer, header, [FileRecord("1", "a"), FileRecord("2", "b")], format)
+
+    _, read = read_records(io.BytesIO(buffer.getvalue()[:-3]))
+    with pytest.raises(ValueError, match="truncated"):
+        list(read)
+
+
+def test_read_records_invalid():
+    with pytest.raises(ValueError):
+        read_records(io.BytesIO(b"not an export\n"))